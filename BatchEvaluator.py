@@ -0,0 +1,169 @@
+# Description: Scores many Quoridor positions at once with NumPy. Positions come in as an (n, 28) array of GameState
+# records and the shortest paths of every position are found together by a breadth first search over the whole batch.
+# Needs numpy.
+import numpy as np
+from GameState import GameState, RECORD_SIZE
+from Moves import SIZE, CELLS
+
+# byte ranges of the fence bitmasks in a GameState record, and the offsets of the fields after them
+_FENCE_BYTES = (CELLS + 7) // 8
+_VERT = slice(2, 2 + _FENCE_BYTES)
+_HORIZ = slice(2 + _FENCE_BYTES, 2 + 2 * _FENCE_BYTES)
+_LEFT = 2 + 2 * _FENCE_BYTES
+_TURN = _LEFT + 2
+_WINNER = _TURN + 1
+
+# path length of a pawn that can't reach its goal row, which legal positions never have
+UNREACHABLE = 255
+
+# names of the columns features returns, in order
+FEATURES = ('path', 'fences', 'tempo', 'progress')
+
+
+def encode(positions):
+    """
+    Turns positions into the array BatchEvaluator takes.
+    :param positions: Iterable of GameState objects, state bytes or 9x9 two player QuoridorGame objects.
+    :return: Returns an (n, 28) uint8 array with one GameState record per row.
+    """
+    records = []
+    for position in positions:
+        if isinstance(position, GameState):
+            records.append(position.to_bytes())
+        elif isinstance(position, (bytes, bytearray)):
+            records.append(bytes(position))
+        else:
+            records.append(position.get_state().to_bytes())
+
+    return np.frombuffer(b''.join(records), dtype=np.uint8).reshape(-1, RECORD_SIZE)
+
+
+def fence_arrays(records):
+    """
+    Unpacks the fence bitmasks of a batch.
+    :param records: (n, 28) uint8 array of GameState records.
+    :return: Returns the (n, 9, 9) boolean vertical and horizontal fence arrays indexed [position, y, x], with the
+    same fence coordinates as place_fence.
+    """
+    def unpack(columns):
+        fences = np.unpackbits(records[:, columns], axis=1, bitorder='little')[:, :CELLS]
+        return fences.reshape(-1, SIZE, SIZE).astype(bool)
+
+    return unpack(_VERT), unpack(_HORIZ)
+
+
+def path_lengths(vert, horiz, squares, goal_rows):
+    """
+    Finds the shortest path length from a square of every board to a goal row, ignoring the pawns. The search runs out
+    of the goal row of every board at once, one step per loop, and stops when every square has been reached.
+    :param vert: (n, 9, 9) boolean array of vertical fences.
+    :param horiz: (n, 9, 9) boolean array of horizontal fences.
+    :param squares: (n,) array of the square y * 9 + x to measure from on each board.
+    :param goal_rows: (n,) array of the row to measure to on each board, or one row for every board.
+    :return: Returns an (n,) int16 array of path lengths, UNREACHABLE where there is no path.
+    """
+    count = len(squares)
+    rows = np.arange(count)
+    ys, xs = np.divmod(squares.astype(np.intp), SIZE)
+    open_up = ~horiz[:, 1:, :]
+    open_left = ~vert[:, :, 1:]
+
+    reached = np.zeros((count, SIZE, SIZE), dtype=bool)
+    reached[rows, goal_rows, :] = True
+    frontier = reached.copy()
+    lengths = np.full(count, UNREACHABLE, dtype=np.int16)
+    found = reached[rows, ys, xs]
+    lengths[found] = 0
+
+    step = 0
+    while not found.all() and frontier.any():
+        step += 1
+        grown = np.zeros_like(frontier)
+        grown[:, :-1, :] |= frontier[:, 1:, :] & open_up
+        grown[:, 1:, :] |= frontier[:, :-1, :] & open_up
+        grown[:, :, :-1] |= frontier[:, :, 1:] & open_left
+        grown[:, :, 1:] |= frontier[:, :, :-1] & open_left
+        frontier = grown & ~reached
+        reached |= frontier
+
+        hit = frontier[rows, ys, xs]
+        lengths[hit] = step
+        found |= hit
+
+    return lengths
+
+
+class BatchEvaluator:
+    """
+        This class scores a batch of 9x9 two player positions with array operations. The score is a weighted sum of
+        the features below, each taken as the player's value less the opponent's:
+            path      the opponent's shortest path length less the player's
+            fences    fences the player has left less the opponent's
+            tempo     1 if it is the player's turn, -1 otherwise
+            progress  rows the player's pawn has advanced from its home row less the opponent's
+        With the default weights the score of an unfinished position is the same as QuoridorEngine.evaluate. Won
+        positions score win_score for the winner.
+    """
+
+    def __init__(self, path_weight=100, fence_weight=10, tempo_weight=0, progress_weight=0, win_score=100000):
+        """
+        Creates an evaluator.
+        :param path_weight: Score of each step of shortest path length the opponent needs more than the player.
+        :param fence_weight: Score of each fence the player has left more than the opponent.
+        :param tempo_weight: Score of it being the player's turn.
+        :param progress_weight: Score of each row the player's pawn has advanced more than the opponent's.
+        :param win_score: Score of a won position, negated for a lost one.
+        """
+        self._weights = np.array([path_weight, fence_weight, tempo_weight, progress_weight], dtype=np.float64)
+        self._win_score = win_score
+
+    def get_weights(self):
+        """Returns the weights as a dict by feature name, along with 'win'."""
+        weights = dict(zip(FEATURES, self._weights.tolist()))
+        weights['win'] = self._win_score
+        return weights
+
+    def features(self, records):
+        """
+        Computes the features of a batch from player 1's point of view.
+        :param records: (n, 28) uint8 array of GameState records, see encode.
+        :return: Returns an (n, 4) float64 array with the columns in FEATURES order.
+        """
+        records = np.asarray(records, dtype=np.uint8)
+        vert, horiz = fence_arrays(records)
+        squares = records[:, :2].astype(np.intp)
+        left = records[:, _LEFT:_LEFT + 2].astype(np.float64)
+
+        # both players' searches run as one batch of twice the size
+        count = len(records)
+        lengths = path_lengths(np.concatenate((vert, vert)), np.concatenate((horiz, horiz)),
+                               np.concatenate((squares[:, 0], squares[:, 1])),
+                               np.repeat(np.array([SIZE - 1, 0]), count)).astype(np.float64)
+        rows = squares // SIZE
+
+        columns = np.empty((count, len(FEATURES)), dtype=np.float64)
+        columns[:, 0] = lengths[count:] - lengths[:count]
+        columns[:, 1] = left[:, 0] - left[:, 1]
+        columns[:, 2] = np.where(records[:, _TURN] == 1, 1.0, -1.0)
+        columns[:, 3] = rows[:, 0] - (SIZE - 1 - rows[:, 1])
+        return columns
+
+    def evaluate(self, records, player=None):
+        """
+        Scores a batch.
+        :param records: (n, 28) uint8 array of GameState records, see encode.
+        :param player: 1 or 2 to score every position from that player's point of view, or None to score each one from
+        the point of view of the player whose turn it is, as QuoridorEngine.evaluate does.
+        :return: Returns an (n,) float64 array of scores.
+        """
+        records = np.asarray(records, dtype=np.uint8)
+        scores = self.features(records) @ self._weights
+
+        winner = records[:, _WINNER]
+        scores[winner == 1] = self._win_score
+        scores[winner == 2] = -self._win_score
+
+        if player is None:
+            return np.where(records[:, _TURN] == 1, scores, -scores)
+
+        return scores if player == 1 else -scores
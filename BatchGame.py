@@ -0,0 +1,257 @@
+# Description: A NumPy version of QuoridorGame that plays many 9x9 games in lockstep. Needs numpy.
+import numpy as np
+from Moves import SIZE, CELLS, VERTICAL, HORIZONTAL
+
+# candidate pawn steps, jumps and diagonals from any square
+_OFFSETS = [(0, -1), (0, 1), (-1, 0), (1, 0), (0, -2), (0, 2), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+
+class BatchQuoridorGame:
+    """
+        This class keeps n games as arrays and applies one move to every game at a time with array operations, using
+        the same rules and move codes as QuoridorGame on a BitBoard. Pawns are an (n, 2, 2) array of (x, y) per
+        player, fences are (n, 9, 9) boolean arrays indexed [game, y, x] with the same fence coordinates as
+        place_fence, fences left are (n, 2), the turn is (n,) holding 1 or 2, and finished games are flagged in (n,).
+    """
+
+    def __init__(self, games, fences=10):
+        """
+        Creates games at their starting position.
+        :param games: Number of games.
+        :param fences: Number of fences each player starts with.
+        """
+        self._fences = fences
+        self._pawns = np.zeros((games, 2, 2), dtype=np.int8)
+        self._vert_fences = np.zeros((games, SIZE, SIZE), dtype=bool)
+        self._horiz_fences = np.zeros((games, SIZE, SIZE), dtype=bool)
+        self._fences_left = np.zeros((games, 2), dtype=np.int8)
+        self._turn = np.ones(games, dtype=np.int8)
+        self._finished = np.zeros(games, dtype=bool)
+        self._winner = np.zeros(games, dtype=np.int8)
+        self.reset()
+
+    def reset(self, games=None):
+        """
+        Puts games back at their starting position.
+        :param games: Boolean array or indices of the games to reset, or None for every game.
+        :return: None
+        """
+        if games is None:
+            games = slice(None)
+
+        self._pawns[games, 0] = (4, 0)
+        self._pawns[games, 1] = (4, SIZE - 1)
+        self._vert_fences[games] = False
+        self._horiz_fences[games] = False
+        self._fences_left[games] = self._fences
+        self._turn[games] = 1
+        self._finished[games] = False
+        self._winner[games] = 0
+
+    def __len__(self):
+        return len(self._turn)
+
+    def get_pawns(self):
+        """Returns the (n, 2, 2) array of pawn locations."""
+        return self._pawns
+
+    def get_fences(self):
+        """Returns the (n, 9, 9) vertical and horizontal fence arrays."""
+        return self._vert_fences, self._horiz_fences
+
+    def get_fences_left(self):
+        """Returns the (n, 2) array of fences each player has left."""
+        return self._fences_left
+
+    def get_turn(self):
+        """Returns the (n,) array of the player whose turn it is."""
+        return self._turn
+
+    def get_finished(self):
+        """Returns the (n,) array flagging the games that have been won."""
+        return self._finished
+
+    def get_winner(self):
+        """Returns the (n,) array of the winning player, 0 while a game is unfinished."""
+        return self._winner
+
+    def step(self, actions):
+        """
+        Validates and makes one move in every game, for the player whose turn it is. Moves in finished games are
+        ignored.
+        :param actions: Array of n move codes (see Moves.py).
+        :return: Returns an (n,) boolean array of the moves that were made.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        made = np.zeros(len(self), dtype=bool)
+        active = ~self._finished
+
+        games = np.nonzero(active & (actions < VERTICAL))[0]
+        if len(games):
+            made[games] = self._move_pawns(games, actions[games])
+
+        games = np.nonzero(active & (actions >= VERTICAL) & (actions < HORIZONTAL + CELLS))[0]
+        if len(games):
+            made[games] = self._place_fences(games, actions[games])
+
+        self._turn[made] = 3 - self._turn[made]
+        return made
+
+    def legal_pawn_moves(self):
+        """
+        Returns an (n, 81) boolean array of the squares the pawn whose turn it is can move to.
+        """
+        games = np.arange(len(self))
+        mover = self._turn - 1
+        x = self._pawns[games, mover, 0].astype(np.int64)
+        y = self._pawns[games, mover, 1].astype(np.int64)
+        legal = np.zeros((len(self), CELLS), dtype=bool)
+
+        for dx, dy in _OFFSETS:
+            valid = self._pawn_move_valid(games, mover, x, y, x + dx, y + dy) & ~self._finished
+            legal[games[valid], ((y + dy) * SIZE + x + dx)[valid]] = True
+
+        return legal
+
+    def sample_actions(self, rng, fence_rate=0.2):
+        """
+        Picks a random move for every game: a random fence slot with probability fence_rate, otherwise a random legal
+        pawn move. A fence slot may turn out not to be legal, in which case step doesn't make it.
+        :param rng: A numpy random Generator.
+        :param fence_rate: Chance of picking a fence.
+        :return: Returns an (n,) array of move codes.
+        """
+        legal = self.legal_pawn_moves()
+        scores = rng.random(legal.shape) * legal
+        actions = scores.argmax(axis=1)
+        fences = rng.random(len(self)) < fence_rate
+        actions[fences] = rng.integers(VERTICAL, HORIZONTAL + CELLS, fences.sum())
+        return actions
+
+    def _occupied(self, games, x, y):
+        """Returns which of the squares (x, y) hold a pawn, for each of the games."""
+        pawns = self._pawns[games]
+        return ((pawns[:, :, 0] == x[:, None]) & (pawns[:, :, 1] == y[:, None])).any(axis=1)
+
+    def _pawn_move_valid(self, games, mover, x, y, new_x, new_y):
+        """Applies the pawn move rules of BitBoard to the moves from (x, y) to (new_x, new_y) in each of the games."""
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        dx = new_x - x
+        dy = new_y - y
+
+        def fence(fences, fx, fy):
+            # fences off the board are never there
+            inside = (fx >= 0) & (fx < SIZE) & (fy >= 0) & (fy < SIZE)
+            return inside & fences[games, np.clip(fy, 0, SIZE - 1), np.clip(fx, 0, SIZE - 1)]
+
+        on_board = (new_x >= 0) & (new_x < SIZE) & (new_y >= 0) & (new_y < SIZE)
+        free = on_board & ~self._occupied(games, new_x, new_y)
+        step = np.sign(dy)
+
+        up = (dx == 0) & (dy == -1) & ~fence(horiz, x, y)
+        down = (dx == 0) & (dy == 1) & ~fence(horiz, x, y + 1)
+        left = (dy == 0) & (dx == -1) & ~fence(vert, x, y)
+        right = (dy == 0) & (dx == 1) & ~fence(vert, x + 1, y)
+        # the jumped fence is looked up with x and y swapped, as Board does
+        jump = (dx == 0) & (np.abs(dy) == 2) & self._occupied(games, x, y + step) & ~fence(horiz, y + step, x)
+        behind = np.where(dy < 0, y - 1, y + 2)
+        diagonal = ((np.abs(dx) == 1) & (np.abs(dy) == 1) & ~fence(vert, new_x, new_y) &
+                    self._occupied(games, x, y + step) & fence(horiz, x, behind))
+
+        # a jump or diagonal can cross a fence the checks above don't look at, so the pawn must land where it can still
+        # reach its goal row
+        hops = np.nonzero(free & (jump | diagonal))[0]
+        if len(hops):
+            free[hops] = self._reaches_goal(games[hops], mover[hops], new_x[hops], new_y[hops])
+
+        return free & (up | down | left | right | jump | diagonal)
+
+    def _move_pawns(self, games, actions):
+        """Makes the pawn moves that are valid and checks for winners."""
+        mover = self._turn[games] - 1
+        x = self._pawns[games, mover, 0].astype(np.int64)
+        y = self._pawns[games, mover, 1].astype(np.int64)
+        new_x = actions % SIZE
+        new_y = actions // SIZE
+        valid = self._pawn_move_valid(games, mover, x, y, new_x, new_y)
+
+        moved = games[valid]
+        mover = mover[valid]
+        self._pawns[moved, mover, 0] = new_x[valid]
+        self._pawns[moved, mover, 1] = new_y[valid]
+
+        won = np.where(mover == 0, new_y[valid] == SIZE - 1, new_y[valid] == 0)
+        self._finished[moved[won]] = True
+        self._winner[moved[won]] = mover[won] + 1
+
+        return valid
+
+    def _place_fences(self, games, actions):
+        """Places the fences that are valid, leaving out any that would cut a pawn off from its goal row."""
+        mover = self._turn[games] - 1
+        vertical = actions < HORIZONTAL
+        sq = np.where(vertical, actions - VERTICAL, actions - HORIZONTAL)
+        x = sq % SIZE
+        y = sq // SIZE
+
+        valid = np.where(vertical, x > 0, y > 0) & (self._fences_left[games, mover] > 0)
+        valid &= ~np.where(vertical, self._vert_fences[games, y, x], self._horiz_fences[games, y, x])
+
+        # places the fences, then takes back those that leave a pawn without a path
+        placed = games[valid]
+        self._vert_fences[placed, y[valid], x[valid]] |= vertical[valid]
+        self._horiz_fences[placed, y[valid], x[valid]] |= ~vertical[valid]
+
+        sealed = ~self._has_paths(placed)
+        self._vert_fences[placed[sealed], y[valid][sealed], x[valid][sealed]] &= ~vertical[valid][sealed]
+        self._horiz_fences[placed[sealed], y[valid][sealed], x[valid][sealed]] &= vertical[valid][sealed]
+        valid[np.nonzero(valid)[0][sealed]] = False
+
+        self._fences_left[games[valid], mover[valid]] -= 1
+        return valid
+
+    def _reaches_goal(self, games, mover, x, y):
+        """Returns which of the squares (x, y) the mover's pawn could reach its goal row from, for each of the games."""
+        result = np.zeros(len(games), dtype=bool)
+        for player, goal in ((0, SIZE - 1), (1, 0)):
+            own = np.nonzero(mover == player)[0]
+            if len(own):
+                reach = reachable(self._vert_fences[games[own]], self._horiz_fences[games[own]], goal)
+                result[own] = reach[np.arange(len(own)), y[own], x[own]]
+
+        return result
+
+    def _has_paths(self, games):
+        """Returns which of the games still have a path to the goal row for both pawns."""
+        result = np.ones(len(games), dtype=bool)
+        for player, goal in ((0, SIZE - 1), (1, 0)):
+            reach = reachable(self._vert_fences[games], self._horiz_fences[games], goal)
+            pawns = self._pawns[games, player]
+            result &= reach[np.arange(len(games)), pawns[:, 1], pawns[:, 0]]
+
+        return result
+
+
+def reachable(vert, horiz, goal_row):
+    """
+    Floods out of the goal row of every board at once.
+    :param vert: (m, 9, 9) boolean array of vertical fences.
+    :param horiz: (m, 9, 9) boolean array of horizontal fences.
+    :param goal_row: The row to flood from.
+    :return: Returns an (m, 9, 9) boolean array of the squares that can reach the goal row.
+    """
+    reach = np.zeros(vert.shape, dtype=bool)
+    reach[:, goal_row, :] = True
+    open_up = ~horiz[:, 1:, :]
+    open_left = ~vert[:, :, 1:]
+
+    while True:
+        grown = reach.copy()
+        grown[:, :-1, :] |= reach[:, 1:, :] & open_up
+        grown[:, 1:, :] |= reach[:, :-1, :] & open_up
+        grown[:, :, :-1] |= reach[:, :, 1:] & open_left
+        grown[:, :, 1:] |= reach[:, :, :-1] & open_left
+        if (grown == reach).all():
+            return reach
+        reach = grown
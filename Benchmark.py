@@ -0,0 +1,281 @@
+# Description: Reproducible benchmarks of the rules engine. Random games are generated from a seed, and the board
+# operations and whole games are timed on both Board and BitBoard. Results are written as JSON and can be compared
+# against a stored baseline.
+import argparse
+import copy
+import json
+import platform
+import random
+import sys
+from time import perf_counter_ns
+from Board import Board
+from BitBoard import BitBoard
+from Moves import VERTICAL, decode_move
+from Quoridor import QuoridorGame
+
+BOARDS = {'Board': Board, 'BitBoard': BitBoard}
+
+
+def random_games(count, seed, max_moves=200):
+    """
+    Generates random games. Pawns move towards their goal half of the time and to a random legal square otherwise,
+    and three turns in ten place a random legal fence when one is left.
+    :param count: Number of games.
+    :param seed: Seed of the random choices.
+    :param max_moves: Longest game to generate.
+    :return: Returns a list of games, each a list of move codes.
+    """
+    rng = random.Random(seed)
+    games = []
+
+    for _ in range(count):
+        game = QuoridorGame()
+        moves = []
+        while not game.is_finished() and len(moves) < max_moves:
+            turn = game.get_turn()
+            fences = []
+            if rng.random() < 0.3:
+                fences = [move for move in game.legal_moves() if move >= VERTICAL]
+
+            if fences:
+                move = rng.choice(fences)
+            else:
+                pawn_moves = game.legal_pawn_moves()
+                if not pawn_moves:
+                    break
+                move = rng.choice(pawn_moves)
+                if rng.random() < 0.5:
+                    move = min(pawn_moves, key=lambda pawn_move: _length_after(game, turn, pawn_move))
+
+            game.push(move)
+            moves.append(move)
+        games.append(moves)
+
+    return games
+
+
+def _length_after(game, turn, move):
+    """Returns the player's shortest path length after the move."""
+    game.push(move)
+    length = -1 if game.is_finished() else game.shortest_path_length(turn)
+    game.pop()
+    return length
+
+
+def _play(game, move):
+    """Makes a move code through the public QuoridorGame interface."""
+    kind, location = decode_move(move)
+    if kind == 'p':
+        return game.move_pawn(game.get_turn(), location)
+
+    return game.place_fence(game.get_turn(), kind, location)
+
+
+def _branch(current, new):
+    """Names the make_move branch a pawn move from current to new goes through."""
+    if current[0] == new[0]:
+        return 'vertical' if abs(current[1] - new[1]) == 1 else 'jump'
+    if current[1] == new[1]:
+        return 'horizontal'
+
+    return 'diagonal'
+
+
+def _cases(games, limit):
+    """
+    Picks the positions to time. Every legal pawn move of every position is sorted by its make_move branch, and the
+    positions before each fence are grouped by how many fences are on the board.
+    :return: Returns a dict of case name to a list of (game index, ply, move code), at most limit of each.
+    """
+    cases = {}
+    for index, moves in enumerate(games):
+        game = QuoridorGame()
+        for ply, move in enumerate(moves):
+            pawn = game.get_player(game.get_turn())
+            current = game._board.get_current_location(pawn.get_name())
+            for pawn_move in game.legal_pawn_moves():
+                new = decode_move(pawn_move)[1]
+                cases.setdefault('make_move.' + _branch(current, new), []).append((index, ply, pawn_move))
+
+            if move >= VERTICAL:
+                placed = 20 - game.get_player(1).get_pieces_left() - game.get_player(2).get_pieces_left()
+                cases.setdefault('place_fence.%02d_fences' % (placed // 5 * 5), []).append((index, ply, move))
+
+            game.push(move)
+
+    rng = random.Random(len(games))
+    return {name: rng.sample(found, min(limit, len(found))) for name, found in sorted(cases.items())}
+
+
+def _snapshots(games, board_class, wanted):
+    """Replays the games on board_class and returns a copy of the game at every (game index, ply) in wanted."""
+    snapshots = {}
+    for index, moves in enumerate(games):
+        plies = {ply for game_index, ply in wanted if game_index == index}
+        if not plies:
+            continue
+
+        game = QuoridorGame(board_class)
+        for ply, move in enumerate(moves):
+            if ply in plies:
+                snapshots[(index, ply)] = copy.deepcopy(game)
+            _play(game, move)
+
+    return snapshots
+
+
+def _measure(run, prepare, rounds):
+    """Runs prepare then times run on what it returns, and keeps the fastest round in nanoseconds per operation."""
+    best = None
+    for _ in range(rounds):
+        cases = prepare()
+        start = perf_counter_ns()
+        run(cases)
+        elapsed = (perf_counter_ns() - start) / max(len(cases), 1)
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def _run_make_move(cases):
+    for board, player, location in cases:
+        board.make_move(player, location)
+
+
+def _run_place_fence(cases):
+    for board, player, fence, location in cases:
+        board.place_fence(player, fence, location)
+
+
+def _run_check_win(cases):
+    for board, player in cases:
+        board.check_win(player)
+
+
+def _run_get_current_location(cases):
+    for board, name in cases:
+        board.get_current_location(name)
+
+
+def _run_games(cases):
+    for board_class, moves in cases:
+        game = QuoridorGame(board_class)
+        for move in moves:
+            _play(game, move)
+
+
+def run(games=50, seed=0, limit=500, rounds=3):
+    """
+    Runs every benchmark.
+    :param games: Number of random games to generate.
+    :param seed: Seed of the random games.
+    :param limit: Most positions timed per case.
+    :param rounds: Times each case is run, the fastest is kept.
+    :return: Returns a dict with 'meta' describing the run and 'results' mapping each benchmark name to its
+    nanoseconds per operation and number of operations.
+    """
+    played = random_games(games, seed)
+    cases = _cases(played, limit)
+    wanted = {(index, ply) for found in cases.values() for index, ply, move in found}
+    results = {}
+
+    def record(name, run_cases, prepare, size):
+        ns = _measure(run_cases, prepare, rounds)
+        results[name] = {'ns_per_op': ns, 'ops_per_second': 1e9 / ns if ns else None, 'ops': size}
+
+    for board_name, board_class in BOARDS.items():
+        snapshots = _snapshots(played, board_class, wanted)
+
+        for name, found in cases.items():
+            def prepare(found=found):
+                prepared = []
+                for index, ply, move in found:
+                    game = copy.deepcopy(snapshots[(index, ply)])
+                    kind, location = decode_move(move)
+                    pawn = game.get_player(game.get_turn())
+                    if kind == 'p':
+                        prepared.append((game._board, pawn, location))
+                    else:
+                        prepared.append((game._board, pawn, kind, location))
+                return prepared
+
+            runner = _run_make_move if name.startswith('make_move') else _run_place_fence
+            record('%s.%s' % (board_name, name), runner, prepare, len(found))
+
+        positions = [snapshots[key] for key in sorted(snapshots)]
+        record(board_name + '.check_win', _run_check_win,
+               lambda: [(game._board, game.get_player(game.get_turn())) for game in positions], len(positions))
+        record(board_name + '.get_current_location', _run_get_current_location,
+               lambda: [(game._board, 'P%d' % game.get_turn()) for game in positions], len(positions))
+        record(board_name + '.game', _run_games, lambda: [(board_class, moves) for moves in played], len(played))
+        results[board_name + '.game']['games_per_second'] = results[board_name + '.game'].pop('ops_per_second')
+
+    return {
+        'meta': {
+            'games': games,
+            'seed': seed,
+            'limit': limit,
+            'rounds': rounds,
+            'moves': sum(len(moves) for moves in played),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.1):
+    """
+    Compares two benchmark runs.
+    :param current: The dict returned by run.
+    :param baseline: A dict returned by an earlier run.
+    :param threshold: Fraction slower than the baseline that counts as a regression.
+    :return: Returns a list of (name, baseline ns, current ns, ratio, regressed) for the benchmarks in both runs.
+    """
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        if name not in baseline['results']:
+            continue
+
+        before = baseline['results'][name]['ns_per_op']
+        ratio = result['ns_per_op'] / before if before else float('inf')
+        rows.append((name, before, result['ns_per_op'], ratio, ratio > 1 + threshold))
+
+    return rows
+
+
+def main(argv=None):
+    """Command line entry point. Exits with status 1 if a comparison finds a regression."""
+    parser = argparse.ArgumentParser(description="Benchmarks the Quoridor rules engine.")
+    parser.add_argument('--games', type=int, default=50, help="number of random games to generate")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the random games")
+    parser.add_argument('--limit', type=int, default=500, help="most positions timed per case")
+    parser.add_argument('--rounds', type=int, default=3, help="rounds per case, the fastest is kept")
+    parser.add_argument('--output', help="file to write the JSON results to, printed when left out")
+    parser.add_argument('--compare', help="baseline JSON file to compare the results against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    current = run(args.games, args.seed, args.limit, args.rounds)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    elif not args.compare:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        regressed = False
+        for name, before, after, ratio, slower in compare(current, baseline, args.threshold):
+            print('%-45s %12.0f %12.0f %7.2fx%s' % (name, before, after, ratio, '  REGRESSION' if slower else ''))
+            regressed = regressed or slower
+
+        return 1 if regressed else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,787 @@
+from array import array
+from heapq import heappush, heappop
+from Moves import SIZE
+from Zobrist import keys_for
+
+
+def bits(mask):
+    """Yields the index of every set bit in the mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _pawn_rules(sq, size):
+    """
+    Builds the candidate pawn moves from a square. Each candidate is a tuple of the destination square and four masks:
+    bits that must be occupied, horizontal fences that must be present, and vertical and horizontal fences that must be
+    absent. These are the same checks make_vertical_moves, make_horizontal_moves and make_diagonal_moves do.
+    """
+    x, y = sq % size, sq // size
+    rules = []
+
+    def add(dx, dy, need_occupied=0, need_horiz=0, clear_vert=0, clear_horiz=0):
+        if 0 <= x + dx < size and 0 <= y + dy < size:
+            rules.append((sq + dy * size + dx, need_occupied, need_horiz, clear_vert, clear_horiz))
+
+    add(0, -1, clear_horiz=1 << sq)
+    add(0, 1, clear_horiz=1 << (sq + size))
+    add(-1, 0, clear_vert=1 << sq)
+    add(1, 0, clear_vert=1 << (sq + 1))
+    for step in (-1, 1):
+        if 0 <= y + 2 * step < size:
+            add(0, 2 * step, need_occupied=1 << (sq + step * size), clear_horiz=1 << (x * size + y + step))
+
+    # the fence behind the pawn in front has to exist on the board for a diagonal move to be possible
+    if y >= 2:
+        for dx in (-1, 1):
+            add(dx, -1, need_occupied=1 << (sq - size), need_horiz=1 << (sq - size), clear_vert=1 << (sq - size + dx))
+    if y + 2 < size:
+        for dx in (-1, 1):
+            add(dx, 1, need_occupied=1 << (sq + size), need_horiz=1 << (sq + 2 * size), clear_vert=1 << (sq + size + dx))
+
+    return tuple(rules)
+
+
+def _neighbours(sq, size):
+    """
+    Builds the squares next to a square. Each neighbour is a tuple of its square and the vertical and horizontal fence
+    masks that close the edge between them.
+    """
+    x, y = sq % size, sq // size
+    neighbours = []
+    if y > 0:
+        neighbours.append((sq - size, 0, 1 << sq))
+    if y < size - 1:
+        neighbours.append((sq + size, 0, 1 << (sq + size)))
+    if x > 0:
+        neighbours.append((sq - 1, 1 << sq, 0))
+    if x < size - 1:
+        neighbours.append((sq + 1, 1 << (sq + 1), 0))
+
+    return tuple(neighbours)
+
+
+class Geometry:
+    """
+        The lookup tables of one board size, built the first time a board of that size is made and shared by every
+        board of that size. Squares are numbered y * size + x, and move codes follow Moves.py with size in place of 9.
+    """
+    __slots__ = ('size', 'cells', 'vertical', 'horizontal', 'coords', 'vert_slots', 'horiz_slots', 'pawn_rules',
+                 'neighbours', 'starts', 'goals', 'inf', 'open_distances', 'pawn_keys', 'fence_keys', 'placed_keys')
+
+    def __init__(self, size):
+        """
+        Builds the tables.
+        :param size: Number of squares along a side of the board, at least 3.
+        """
+        if size < 3:
+            raise ValueError("a board needs at least 3 squares a side")
+
+        cells = size * size
+        self.size = size
+        self.cells = cells
+        self.vertical = cells
+        self.horizontal = 2 * cells
+        # (x, y) coordinates of every square, indexed by square number
+        self.coords = [(sq % size, sq // size) for sq in range(cells)]
+        # squares that can have a fence on their left (vertical) or top (horizontal) edge
+        self.vert_slots = sum(1 << sq for sq in range(cells) if sq % size > 0)
+        self.horiz_slots = sum(1 << sq for sq in range(cells) if sq >= size)
+        self.pawn_rules = [_pawn_rules(sq, size) for sq in range(cells)]
+        self.neighbours = [_neighbours(sq, size) for sq in range(cells)]
+        # start square and goal edge mask of each seat: the bottom and top players of the two player game, then the
+        # left and right players of the four player game
+        middle, last = size // 2, size - 1
+        rows = [sum(1 << (y * size + x) for x in range(size)) for y in (last, 0)]
+        columns = [sum(1 << (y * size + x) for y in range(size)) for x in (last, 0)]
+        self.starts = (middle, last * size + middle, middle * size, middle * size + last)
+        self.goals = (rows[0], rows[1], columns[0], columns[1])
+        # distance of a square that can't reach its goal edge; distance maps are bytearrays while every distance fits
+        # in a byte
+        self.inf = 255 if cells < 255 else 65535
+        # distance maps of the board without fences, by goal edge mask
+        self.open_distances = {}
+        self.pawn_keys, self.fence_keys, self.placed_keys = keys_for(size)
+
+    def __reduce__(self):
+        # pickles and copies stand for the shared tables of their size
+        return get_geometry, (self.size,)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def new_distances(self):
+        """Returns a distance map with every square at inf."""
+        if self.inf == 255:
+            return bytearray([255]) * self.cells
+
+        return array('H', [self.inf]) * self.cells
+
+
+_GEOMETRIES = {}
+
+
+def get_geometry(size):
+    """Returns the shared Geometry of a board size."""
+    geometry = _GEOMETRIES.get(size)
+    if geometry is None:
+        geometry = _GEOMETRIES[size] = Geometry(size)
+
+    return geometry
+
+
+# tables of the standard 9x9 board
+_STANDARD = get_geometry(SIZE)
+INF = _STANDARD.inf
+COORDS = _STANDARD.coords
+VERT_SLOTS = _STANDARD.vert_slots
+HORIZ_SLOTS = _STANDARD.horiz_slots
+PAWN_RULES = _STANDARD.pawn_rules
+NEIGHBOURS = _STANDARD.neighbours
+
+# goal edge masks and Zobrist key tables of each set of pawn names and board size, shared by every board with those
+# names and size
+_PAWN_TABLES = {}
+
+
+class BitBoard:
+    """
+        This class is a drop-in replacement for Board that keeps pawns and fences as integer bitmasks instead of a
+        nested list. Bit y * size + x stands for the cell (x, y), on a board of any size (see Geometry). A set bit in
+        the vertical fence mask is a fence on the left edge of that cell and a set bit in the horizontal fence mask is
+        a fence on the top edge of that cell, which are the same coordinates place_fence uses. The legal fences are kept
+        as one mask with bit sq for the vertical fence on sq and bit size * size + sq for the horizontal one, so fence
+        move codes are size * size plus the bit number. Moves are validated with
+        the same rules as Board, except that unknown fence types are rejected instead of being accepted. Every pawn
+        moves by the same rules and blocks the others in the same way, so the checks stay a few mask tests per move
+        whether there are two pawns or four.
+    """
+    __slots__ = ('_geo', '_locations', '_goals', '_occupied', '_vert_fences', '_horiz_fences', '_grid', '_distances',
+                 '_pawn_keys', '_placed', '_key', '_legal_fences')
+
+    def __init__(self, player1, player2, size=SIZE, player3=None, player4=None):
+        """
+        Instantiates a board object
+        :param size: Number of squares along a side of the board. Each pawn starts in the middle of its home edge.
+        :param player3: Name of the third pawn in a four player game, which starts on the left edge.
+        :param player4: Name of the fourth pawn in a four player game, which starts on the right edge.
+        """
+        geo = self._geo = get_geometry(size)
+        pawns = (player1, player2) if player3 is None else (player1, player2, player3, player4)
+        tables = _PAWN_TABLES.get((pawns, size))
+        if tables is None:
+            tables = _PAWN_TABLES[(pawns, size)] = (
+                dict(zip(pawns, geo.goals)),
+                {pawn: (geo.pawn_keys[seat], geo.placed_keys[seat]) for seat, pawn in enumerate(pawns)},
+            )
+
+        self._locations = dict(zip(pawns, geo.starts))
+        self._goals = tables[0]
+        self._occupied = 0
+        for sq in self._locations.values():
+            self._occupied |= 1 << sq
+        self._vert_fences = 0
+        self._horiz_fences = 0
+        self._grid = None
+        # number of steps from every square to each pawn's goal edge, ignoring the pawns
+        self._distances = {pawn: self._distance_map(goal) for pawn, goal in self._goals.items()}
+        # Zobrist keys of each pawn, and how many fences each pawn's player has placed
+        self._pawn_keys = tables[1]
+        self._placed = dict.fromkeys(pawns, 0)
+        self._key = self.compute_key()
+        # mask of the fences that can be placed, None until legal_fence_mask is asked for after a change
+        self._legal_fences = None
+
+    def clone(self):
+        """Returns a copy of the board that shares nothing a move changes."""
+        board = BitBoard.__new__(BitBoard)
+        board._geo = self._geo
+        board._locations = dict(self._locations)
+        board._goals = self._goals
+        board._occupied = self._occupied
+        board._vert_fences = self._vert_fences
+        board._horiz_fences = self._horiz_fences
+        board._grid = None
+        board._distances = {pawn: distances[:] for pawn, distances in self._distances.items()}
+        board._pawn_keys = self._pawn_keys
+        board._placed = dict(self._placed)
+        board._key = self._key
+        board._legal_fences = self._legal_fences
+        return board
+
+    def get_size(self):
+        """Returns the number of squares along a side of the board."""
+        return self._geo.size
+
+    def get_geometry(self):
+        """Returns the board's Geometry, whose tables give the move codes of its size."""
+        return self._geo
+
+    def get_fences(self):
+        """Returns the vertical and horizontal fence bitmasks."""
+        return self._vert_fences, self._horiz_fences
+
+    def has_fence(self, fence, location):
+        """
+        Checks if a fence has been placed.
+        :param fence: String 'v' or 'h' representing the type of fence.
+        :param location: Tuple representing where the fence is.
+        :return: Returns True if the fence is on the board, False otherwise.
+        """
+        size = self._geo.size
+        if not (0 <= location[0] < size and 0 <= location[1] < size):
+            return False
+
+        fences = self._vert_fences if fence == 'v' else self._horiz_fences
+        return bool(fences >> (location[1] * size + location[0]) & 1)
+
+    def set_position(self, locations, vert_fences, horiz_fences, placed):
+        """
+        Sets the board up in a position without validating it.
+        :param locations: Dict of each pawn name to the square it stands on.
+        :param vert_fences: Bitmask of the vertical fences.
+        :param horiz_fences: Bitmask of the horizontal fences.
+        :param placed: Dict of each pawn name to the number of fences its player has placed.
+        :return: None
+        """
+        self._locations = dict(locations)
+        self._occupied = 0
+        for sq in self._locations.values():
+            self._occupied |= 1 << sq
+        self._vert_fences = vert_fences
+        self._horiz_fences = horiz_fences
+        self._grid = None
+        self._distances = {pawn: self._distance_map(goal) for pawn, goal in self._goals.items()}
+        self._placed = dict(placed)
+        self._key = self.compute_key()
+        self._legal_fences = None
+
+    def get_key(self):
+        """Returns the Zobrist key of the pawns, the fences and the number of fences each player has placed."""
+        return self._key
+
+    def compute_key(self):
+        """Computes the Zobrist key from scratch, get_key returns the same value kept up to date move by move."""
+        geo = self._geo
+        key = 0
+        for pawn, sq in self._locations.items():
+            square_keys, placed_keys = self._pawn_keys[pawn]
+            key ^= square_keys[sq] ^ placed_keys[self._placed[pawn]]
+
+        for sq in bits(self._vert_fences):
+            key ^= geo.fence_keys[geo.vertical + sq]
+        for sq in bits(self._horiz_fences):
+            key ^= geo.fence_keys[geo.horizontal + sq]
+
+        return key
+
+    def get_board(self):
+        """Returns the current state of the board, built from the pawn locations the first time it is asked for."""
+        if self._grid is None:
+            size = self._geo.size
+            grid = [[" "] * size for _ in range(size)]
+            for pawn, sq in self._locations.items():
+                grid[sq // size][sq % size] = pawn
+            self._grid = grid
+
+        return self._grid
+
+    def make_move(self, player, new_loc):
+        """
+        Validates the move and then makes a move accordingly.
+        @param player: The Player object making the move.
+        @param new_loc: Tuple representing the location the player wishes to move.
+        @return: Returns a True/False based on whether or not it was able to successfully make a move.
+        """
+        size = self._geo.size
+        if new_loc[0] < 0 or new_loc[0] >= size or new_loc[1] < 0 or new_loc[1] >= size:
+            return False
+
+        pawn_name = player.get_name()
+        current_loc = self.get_current_location(pawn_name)
+        new_sq = new_loc[1] * size + new_loc[0]
+        is_valid = False
+
+        # the pawn's own square is occupied, so this also rejects staying in place
+        if current_loc == 0 or self._occupied >> new_sq & 1:
+            return False
+
+        if current_loc[0] == new_loc[0]:
+            is_valid = self.make_vertical_moves(current_loc, new_loc)
+
+        elif current_loc[1] == new_loc[1]:
+            is_valid = self.make_horizontal_moves(current_loc, new_loc)
+
+        elif current_loc[0] + 1 == new_loc[0] or current_loc[0] - 1 == new_loc[0]:
+            if current_loc[1] + 1 == new_loc[1] or current_loc[1] - 1 == new_loc[1]:
+                is_valid = self.make_diagonal_moves(current_loc, new_loc)
+
+        # a jump or diagonal can cross a fence the checks above don't look at, so the pawn must land where it can still
+        # reach its goal edge
+        if is_valid and self._distances[pawn_name][new_sq] < self._geo.inf:
+            self._move(pawn_name, new_sq)
+            return True
+
+        return False
+
+    def _move(self, pawn_name, new_sq):
+        """Moves the pawn to the square without any validation."""
+        old_sq = self._locations[pawn_name]
+        self._occupied ^= (1 << old_sq) | (1 << new_sq)
+        self._locations[pawn_name] = new_sq
+        self._grid = None
+        self._legal_fences = None
+        square_keys = self._pawn_keys[pawn_name][0]
+        self._key ^= square_keys[old_sq] ^ square_keys[new_sq]
+
+    def get_current_location(self, pawn):
+        """
+        Retrieves the current location of the inputted pawn.
+        @param pawn: String representing the player (i.e. 'P1' or 'P2').
+        @return: Returns a tuple of the current location, or 0 if the pawn is not on the board.
+        """
+        sq = self._locations.get(pawn)
+        if sq is None:
+            return 0
+
+        return self._geo.coords[sq]
+
+    def make_vertical_moves(self, current_loc, new_loc):
+        """
+        Checks if a vertical move is valid.
+        @param current_loc: Tuple representing the current location of the player.
+        @param new_loc: Tuple representing where the player wants to move to.
+        @return: Returns True or False depending on if the move is valid or not.
+        """
+        size = self._geo.size
+        sq = current_loc[1] * size + current_loc[0]
+        step = new_loc[1] - current_loc[1]
+
+        if step == -1:
+            return not self._horiz_fences >> sq & 1
+
+        if step == 1:
+            return not self._horiz_fences >> (sq + size) & 1
+
+        if step == 2 or step == -2:
+            middle = sq + step // 2 * size
+            # Board looks the jumped fence up as (row, column) of the jumped pawn, so the same edge is tested here to
+            # keep both boards in agreement
+            fence = current_loc[0] * size + current_loc[1] + step // 2
+            return bool(self._occupied >> middle & 1) and not self._horiz_fences >> fence & 1
+
+        return False
+
+    def make_horizontal_moves(self, current_loc, new_loc):
+        """
+        Checks if a horizontal move is valid.
+        @param current_loc: Tuple representing the current location of the player.
+        @param new_loc: Tuple representing where the player wants to move to.
+        @return: Returns True or False depending on if the move is valid or not.
+        """
+        sq = current_loc[1] * self._geo.size + current_loc[0]
+        step = new_loc[0] - current_loc[0]
+
+        if step == -1:
+            return not self._vert_fences >> sq & 1
+
+        if step == 1:
+            return not self._vert_fences >> (sq + 1) & 1
+
+        return False
+
+    def make_diagonal_moves(self, current_loc, new_loc):
+        """
+        Checks if a diagonal move is valid. The pawn in front has to be backed by a horizontal fence and, as in Board,
+        the destination square must not have a vertical fence on its left edge.
+        @param current_loc: Tuple representing the current location of the player.
+        @param new_loc: Tuple representing where the player wants to move to.
+        @return: Returns True or False depending on if the move is valid or not.
+        """
+        size = self._geo.size
+        sq = current_loc[1] * size + current_loc[0]
+        new_sq = new_loc[1] * size + new_loc[0]
+
+        if self._vert_fences >> new_sq & 1:
+            return False
+
+        # checks the up diagonal, the fence behind the pawn is the top edge of its square
+        if new_loc[1] == current_loc[1] - 1:
+            middle = sq - size
+            return bool(self._occupied >> middle & 1 and self._horiz_fences >> middle & 1)
+
+        # checks the down diagonal, the fence behind the pawn is the top edge of the square below it
+        middle = sq + size
+        return bool(self._occupied >> middle & 1 and self._horiz_fences >> (middle + size) & 1)
+
+    def place_fence(self, player, fence, location):
+        """
+        This method validates the move and then places the fence accordingly. A fence that would cut any pawn off
+        from its goal edge is not allowed.
+        :param player: The Player object making the move.
+        :param fence: A string object representing the type of fence being placed.
+        :param location: A tuple representing where the player wants to place the fence.
+        :return: Makes the move and then returns True if it is valid and returns False otherwise.
+        """
+        if player.get_pieces_left() == 0:
+            return False
+
+        geo = self._geo
+        size = geo.size
+        if fence == 'v':
+            if location[0] < 1 or location[0] >= size or location[1] < 0 or location[1] >= size:
+                return False
+
+            sq = location[1] * size + location[0]
+            if self._vert_fences >> sq & 1:
+                return False
+            if self._legal_fences is not None and not self._legal_fences >> sq & 1:
+                return False
+
+            self._vert_fences |= 1 << sq
+            if not self._close_edge(sq - 1, sq):
+                self._vert_fences ^= 1 << sq
+                self._open_edge(sq - 1, sq)
+                return False
+
+            self._key ^= geo.fence_keys[geo.vertical + sq]
+
+        elif fence == 'h':
+            if location[0] < 0 or location[0] >= size or location[1] < 1 or location[1] >= size:
+                return False
+
+            sq = location[1] * size + location[0]
+            if self._horiz_fences >> sq & 1:
+                return False
+            if self._legal_fences is not None and not self._legal_fences >> (geo.cells + sq) & 1:
+                return False
+
+            self._horiz_fences |= 1 << sq
+            if not self._close_edge(sq - size, sq):
+                self._horiz_fences ^= 1 << sq
+                self._open_edge(sq - size, sq)
+                return False
+
+            self._key ^= geo.fence_keys[geo.horizontal + sq]
+
+        else:
+            return False
+
+        self._count_fence(player.get_name(), 1)
+        self._legal_fences = None
+        player.sub_pieces()
+        return True
+
+    def _count_fence(self, pawn_name, change):
+        """Adds change to the number of fences the pawn's player has placed and updates the key to match."""
+        placed_keys = self._pawn_keys[pawn_name][1]
+        placed = self._placed[pawn_name]
+        self._placed[pawn_name] = placed + change
+        self._key ^= placed_keys[placed] ^ placed_keys[placed + change]
+
+    def shortest_path_length(self, player):
+        """
+        Returns the number of steps the player's pawn needs to reach its goal edge, ignoring the other pawns.
+        :param player: The Player object to look up.
+        :return: Returns the length of the shortest path.
+        """
+        pawn_name = player.get_name()
+        return self._distances[pawn_name][self._locations[pawn_name]]
+
+    def _distance_map(self, goal):
+        """Runs a breadth first search out of the goal edge mask and returns the distance of every square to it."""
+        geo = self._geo
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        if not (vert or horiz) and goal in geo.open_distances:
+            return geo.open_distances[goal][:]
+
+        neighbours = geo.neighbours
+        distances = geo.new_distances()
+        queue = list(bits(goal))
+        for sq in queue:
+            distances[sq] = 0
+
+        for sq in queue:
+            step = distances[sq] + 1
+            for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                if distances[neighbour] > step and not (vert & vert_mask or horiz & horiz_mask):
+                    distances[neighbour] = step
+                    queue.append(neighbour)
+
+        if not (vert or horiz):
+            geo.open_distances[goal] = distances[:]
+
+        return distances
+
+    def _close_edge(self, a, b):
+        """
+        Updates the distance maps after a fence was placed between squares a and b. Only the squares whose every
+        shortest path crossed that edge are searched again.
+        :return: Returns True if every pawn can still reach its goal edge, False otherwise.
+        """
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        neighbours = self._geo.neighbours
+        inf = self._geo.inf
+
+        for distances in self._distances.values():
+            if distances[a] == distances[b] + 1:
+                far = a
+            elif distances[b] == distances[a] + 1:
+                far = b
+            else:
+                continue
+
+            # squares that lost every neighbour one step closer to the goal, found level by level
+            affected = {far}
+            queue = [far]
+            for sq in queue:
+                level = distances[sq]
+                for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                    if distances[neighbour] != level + 1 or neighbour in affected or vert & vert_mask or horiz & horiz_mask:
+                        continue
+
+                    for other, other_vert, other_horiz in neighbours[neighbour]:
+                        if distances[other] == level and other not in affected and not (vert & other_vert or horiz & other_horiz):
+                            break
+                    else:
+                        affected.add(neighbour)
+                        queue.append(neighbour)
+
+            # relaxes the affected squares again from their unaffected neighbours
+            heap = []
+            for sq in affected:
+                best = inf
+                for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                    if neighbour not in affected and distances[neighbour] < best and not (vert & vert_mask or horiz & horiz_mask):
+                        best = distances[neighbour]
+                distances[sq] = inf
+                if best < inf:
+                    heappush(heap, (best + 1, sq))
+
+            while heap:
+                step, sq = heappop(heap)
+                if step >= distances[sq]:
+                    continue
+
+                distances[sq] = step
+                for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                    if distances[neighbour] > step + 1 and not (vert & vert_mask or horiz & horiz_mask):
+                        heappush(heap, (step + 1, neighbour))
+
+        return all(self._distances[pawn][sq] < inf for pawn, sq in self._locations.items())
+
+    def _open_edge(self, a, b):
+        """Updates the distance maps after the fence between squares a and b was removed."""
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        neighbours = self._geo.neighbours
+
+        for distances in self._distances.values():
+            if distances[a] > distances[b] + 1:
+                start = a
+                distances[a] = distances[b] + 1
+            elif distances[b] > distances[a] + 1:
+                start = b
+                distances[b] = distances[a] + 1
+            else:
+                continue
+
+            queue = [start]
+            for sq in queue:
+                step = distances[sq] + 1
+                for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                    if distances[neighbour] > step and not (vert & vert_mask or horiz & horiz_mask):
+                        distances[neighbour] = step
+                        queue.append(neighbour)
+
+    def _seals(self, fence, sq):
+        """
+        Checks if placing a fence would cut a pawn off from its goal edge, leaving the board as it was.
+        :param fence: String 'v' or 'h' representing the type of fence.
+        :param sq: Integer square the fence is placed on.
+        :return: Returns True if the fence is not allowed, False otherwise.
+        """
+        if fence == 'v':
+            self._vert_fences ^= 1 << sq
+            sealed = not self._close_edge(sq - 1, sq)
+            self._vert_fences ^= 1 << sq
+            self._open_edge(sq - 1, sq)
+        else:
+            self._horiz_fences ^= 1 << sq
+            sealed = not self._close_edge(sq - self._geo.size, sq)
+            self._horiz_fences ^= 1 << sq
+            self._open_edge(sq - self._geo.size, sq)
+
+        return sealed
+
+    def make(self, player, move):
+        """
+        Validates and makes a move given as a move code.
+        :param player: The Player object making the move.
+        :param move: Integer move code (see Moves.py).
+        :return: Returns the undo record to pass to unmake if the move was made, None otherwise.
+        """
+        geo = self._geo
+        pieces_left = player.get_pieces_left()
+        from_sq = self._locations[player.get_name()]
+        legal_fences = self._legal_fences
+
+        if move < 0 or move >= geo.horizontal + geo.cells:
+            return None
+
+        if move < geo.vertical:
+            if not self.make_move(player, geo.coords[move]):
+                return None
+
+        elif move < geo.horizontal:
+            if not self.place_fence(player, 'v', geo.coords[move - geo.vertical]):
+                return None
+
+        elif not self.place_fence(player, 'h', geo.coords[move - geo.horizontal]):
+            return None
+
+        return move, from_sq, pieces_left, legal_fences
+
+    def unmake(self, player, record):
+        """
+        Takes back a move made with make.
+        :param player: The Player object that made the move.
+        :param record: The undo record returned by make.
+        :return: None
+        """
+        geo = self._geo
+        move, from_sq, pieces_left, legal_fences = record
+
+        if move < geo.vertical:
+            self._move(player.get_name(), from_sq)
+
+        elif move < geo.horizontal:
+            sq = move - geo.vertical
+            self._vert_fences ^= 1 << sq
+            self._open_edge(sq - 1, sq)
+            self._key ^= geo.fence_keys[move]
+            self._count_fence(player.get_name(), -1)
+
+        else:
+            sq = move - geo.horizontal
+            self._horiz_fences ^= 1 << sq
+            self._open_edge(sq - geo.size, sq)
+            self._key ^= geo.fence_keys[move]
+            self._count_fence(player.get_name(), -1)
+
+        # the board is back where it was, and so are its legal fences
+        self._legal_fences = legal_fences
+        player.set_pieces_left(pieces_left)
+
+    def legal_pawn_moves(self, player):
+        """
+        Lists the squares the player's pawn can move to.
+        :param player: The Player object to generate moves for.
+        :return: Returns a list of pawn move codes, which are the destination square numbers.
+        """
+        occupied = self._occupied
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        pawn_name = player.get_name()
+        distances = self._distances[pawn_name]
+        inf = self._geo.inf
+        moves = []
+
+        rules = self._geo.pawn_rules[self._locations[pawn_name]]
+        for to, need_occupied, need_horiz, clear_vert, clear_horiz in rules:
+            if occupied >> to & 1 or occupied & need_occupied != need_occupied or horiz & need_horiz != need_horiz:
+                continue
+            if vert & clear_vert or horiz & clear_horiz or distances[to] >= inf:
+                continue
+            moves.append(to)
+
+        return moves
+
+    def legal_fence_placements(self, player):
+        """
+        Lists the fences the player can place.
+        :param player: The Player object to generate moves for.
+        :return: Returns a list of fence move codes.
+        """
+        if player.get_pieces_left() == 0:
+            return []
+
+        cells = self._geo.cells
+        return [cells + bit for bit in bits(self.legal_fence_mask())]
+
+    def legal_fence_mask(self):
+        """
+        Returns the mask of the fences that can be placed: free slots whose fence cuts no pawn off from its goal edge.
+        Bit sq stands for the vertical fence on square sq and bit size * size + sq for the horizontal one.
+
+        Only a fence on every path from a pawn to its goal can cut it off, so a fence off one path of each pawn is
+        legal as soon as its slot is free, and only the few slots along those paths are tested. The mask is kept until
+        a move changes the board, and unmake puts back the mask from before the move.
+        """
+        legal = self._legal_fences
+        if legal is not None:
+            return legal
+
+        geo = self._geo
+        cells = geo.cells
+        free = (geo.vert_slots & ~self._vert_fences) | (geo.horiz_slots & ~self._horiz_fences) << cells
+        on_paths = 0
+        for pawn in self._locations:
+            on_paths |= self._path(pawn)
+
+        legal = free & ~on_paths
+        for bit in bits(free & on_paths):
+            if bit < cells:
+                if not self._seals('v', bit):
+                    legal |= 1 << bit
+            elif not self._seals('h', bit - cells):
+                legal |= 1 << bit
+
+        self._legal_fences = legal
+        return legal
+
+    def _path(self, pawn):
+        """
+        Returns the fence mask, laid out as in legal_fence_mask, of the edges along a shortest path of the pawn. A pawn
+        that is already cut off, which only a position set up with set_position can have, has no path, and every slot
+        is returned so each one is tested for a seal.
+        """
+        geo = self._geo
+        cells = geo.cells
+        neighbours = geo.neighbours
+        vert = self._vert_fences
+        horiz = self._horiz_fences
+        distances = self._distances[pawn]
+        sq = self._locations[pawn]
+        if distances[sq] >= geo.inf:
+            return geo.vert_slots | geo.horiz_slots << cells
+
+        path = 0
+
+        # every square short of the goal has a neighbour one step closer through an open edge
+        while distances[sq]:
+            step = distances[sq] - 1
+            for neighbour, vert_mask, horiz_mask in neighbours[sq]:
+                if distances[neighbour] == step and not (vert & vert_mask or horiz & horiz_mask):
+                    path |= vert_mask | horiz_mask << cells
+                    sq = neighbour
+                    break
+
+        return path
+
+    def check_win(self, pawn):
+        """
+        Used to see if there is a winner!
+        :param pawn: Represents the Player object to check if they won the game.
+        :return: Modifies the Player object's state if they won and then returns True, but returns False otherwise.
+        """
+        pawn_name = pawn.get_name()
+        if not self._goals[pawn_name] >> self._locations[pawn_name] & 1:
+            return False
+
+        pawn.set_winner_state(True)
+        return True
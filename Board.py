@@ -4,24 +4,47 @@ class Board:
         stored and where player moves are validated.
     """
 
-    def __init__(self, player1, player2):
-        """Instantiates a board object"""
-        self._board = [
-            [" ", " ", " ", " ", player1, " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", " ", " ", " ", " ", " "],
-            [" ", " ", " ", " ", player2, " ", " ", " ", " "]
-        ]
+    def __init__(self, player1, player2, size=9, player3=None, player4=None):
+        """
+        Instantiates a board object
+        :param size: Number of squares along a side of the board. Each pawn starts in the middle of its home edge.
+        :param player3: Name of the third pawn in a four player game, which starts on the left edge.
+        :param player4: Name of the fourth pawn in a four player game, which starts on the right edge.
+        """
+        self._size = size
+        middle, last = size // 2, size - 1
+        pawns = (player1, player2) if player3 is None else (player1, player2, player3, player4)
+        starts = ((middle, 0), (middle, last), (0, middle), (last, middle))
+        # each pawn's goal edge as (axis, line): the pawn wins when location[axis] == line
+        goals = ((1, last), (1, 0), (0, last), (0, 0))
+
+        # the pawn locations are the source of truth, the grid is only built when get_board asks for it
+        self._locations = dict(zip(pawns, starts))
+        self._goals = dict(zip(pawns, goals))
+        self._squares = dict(zip(starts, pawns))
+        self._board = None
         self._vert_fences = []
         self._horiz_fences = []
 
+    def clone(self):
+        """Returns a copy of the board that shares nothing a move changes."""
+        board = Board.__new__(Board)
+        board._size = self._size
+        board._locations = dict(self._locations)
+        board._goals = self._goals
+        board._squares = dict(self._squares)
+        board._board = None
+        board._vert_fences = list(self._vert_fences)
+        board._horiz_fences = list(self._horiz_fences)
+        return board
+
     def get_board(self):
         """Returns the current state of the board."""
+        if self._board is None:
+            self._board = [[" "] * self._size for _ in range(self._size)]
+            for pawn, location in self._locations.items():
+                self._board[location[1]][location[0]] = pawn
+
         return self._board
 
     def make_move(self, player, new_loc):
@@ -32,14 +55,15 @@ class Board:
         @return: Returns a True/False based on whether or not it was able to successfully make a move.
         """
         # first checks to see if the new location is off the playing board
-        if new_loc[0] < 0 or new_loc[1] > 8:
+        last = self._size - 1
+        if new_loc[0] < 0 or new_loc[0] > last or new_loc[1] < 0 or new_loc[1] > last:
             return False
 
         pawn_name = player.get_name()
         current_loc = self.get_current_location(pawn_name)
         is_valid = False
 
-        if current_loc == 0 or current_loc == new_loc or self._board[new_loc[1]][new_loc[0]] != " ":
+        if current_loc == 0 or current_loc == new_loc or new_loc in self._squares:
             return False
 
         # used to validate vertical moves
@@ -56,8 +80,19 @@ class Board:
                 is_valid = self.make_diagonal_moves(current_loc, new_loc)
 
         if is_valid:
-            self._board[new_loc[1]][new_loc[0]] = pawn_name
-            self._board[current_loc[1]][current_loc[0]] = " "
+            del self._squares[current_loc]
+            self._squares[new_loc] = pawn_name
+            self._locations[pawn_name] = new_loc
+            self._board = None
+
+            # a jump or diagonal can cross a fence the checks above don't look at, so the pawn must land where it can
+            # still reach its goal edge
+            if abs(new_loc[0] - current_loc[0]) + abs(new_loc[1] - current_loc[1]) > 1 and not self.has_paths():
+                del self._squares[new_loc]
+                self._squares[current_loc] = pawn_name
+                self._locations[pawn_name] = current_loc
+                return False
+
             return True
 
         return False
@@ -66,15 +101,9 @@ class Board:
         """
         Retrieves the current location of the inputted pawn.
         @param pawn: String representing the player (i.e. 'P1' or 'P2').
-        @return: Returns a tuple of the current location.
+        @return: Returns a tuple of the current location, or 0 if the pawn is not on the board.
         """
-        current_loc = 0
-
-        for row in range(len(self._board)):
-            if pawn in self._board[row]:
-                current_loc = (self._board[row].index(pawn), row)
-
-        return current_loc
+        return self._locations.get(pawn, 0)
 
     def make_vertical_moves(self, current_loc, new_loc):
         """
@@ -92,11 +121,11 @@ class Board:
         elif current_loc[1] + 1 == new_loc[1] and new_loc not in self._horiz_fences:
             return True
 
-        elif current_loc[1] + 2 == new_loc[1] and self._board[current_loc[1] + 1][current_loc[0]] != " ":
+        elif current_loc[1] + 2 == new_loc[1] and (current_loc[0], current_loc[1] + 1) in self._squares:
             if (current_loc[1]+1, current_loc[0]) not in self._horiz_fences:
                 return True
 
-        elif current_loc[1] - 2 == new_loc[1] and self._board[current_loc[1] - 1][current_loc[0]] != " ":
+        elif current_loc[1] - 2 == new_loc[1] and (current_loc[0], current_loc[1] - 1) in self._squares:
             if (current_loc[1]-1, current_loc[0]) not in self._horiz_fences:
                 return True
 
@@ -142,12 +171,12 @@ class Board:
         type_of_diag_move = left_diag if right_diag == 0 else right_diag
 
         # checks the up diagonal
-        if new_loc[1] == current_loc[1] - 1 and self._board[current_loc[1]-1][current_loc[0]] != " ":
+        if new_loc[1] == current_loc[1] - 1 and (current_loc[0], current_loc[1] - 1) in self._squares:
             if (current_loc[0], current_loc[1]-1) in self._horiz_fences:
                 return type_of_diag_move
 
         # checks the down diagonal
-        if new_loc[1] == current_loc[1] + 1 and self._board[current_loc[1]+1][current_loc[0]] != " ":
+        if new_loc[1] == current_loc[1] + 1 and (current_loc[0], current_loc[1] + 1) in self._squares:
             if (current_loc[0], current_loc[1] + 2) in self._horiz_fences:
                 return type_of_diag_move
 
@@ -155,7 +184,8 @@ class Board:
 
     def place_fence(self, player, fence, location):
         """
-        This method validates the move and then places the fence accordingly.
+        This method validates the move and then places the fence accordingly. A fence that would cut any pawn off
+        from its goal edge is not allowed.
         :param player: The Player object making the move.
         :param fence: A string object representing the type of fence being placed.
         :param location: A tuple representing where the player wants to place the fence.
@@ -165,21 +195,77 @@ class Board:
         if player.get_pieces_left() == 0:
             return False
 
+        last = self._size - 1
         if fence == 'v':
-            if location[0] < 1 or location[0] > 8 or location[1] < 0 or location[1] > 8 or location in self._vert_fences:
+            if location[0] < 1 or location[0] > last or location[1] < 0 or location[1] > last or location in self._vert_fences:
                 return False
 
             self._vert_fences.append(location)
 
+            if not self.has_paths():
+                self._vert_fences.pop()
+                return False
+
         elif fence == 'h':
-            if location[0] < 0 or location[0] > 8 or location[1] < 1 or location[1] > 8 or location in self._horiz_fences:
+            if location[0] < 0 or location[0] > last or location[1] < 1 or location[1] > last or location in self._horiz_fences:
                 return False
 
             self._horiz_fences.append(location)
 
+            if not self.has_paths():
+                self._horiz_fences.pop()
+                return False
+
         player.sub_pieces()
         return True
 
+    def get_size(self):
+        """Returns the number of squares along a side of the board."""
+        return self._size
+
+    def has_fence(self, fence, location):
+        """
+        Checks if a fence has been placed.
+        :param fence: String 'v' or 'h' representing the type of fence.
+        :param location: Tuple representing where the fence is.
+        :return: Returns True if the fence is on the board, False otherwise.
+        """
+        fences = self._vert_fences if fence == 'v' else self._horiz_fences
+        return tuple(location) in fences
+
+    def has_paths(self):
+        """
+        Searches the board to see if every pawn can still reach its goal edge, ignoring the other pawns.
+        :return: Returns True if every pawn has a path, False otherwise.
+        """
+        for pawn, start in self._locations.items():
+            axis, goal = self._goals[pawn]
+            seen = {start}
+            queue = [start]
+
+            for x, y in queue:
+                if (x, y)[axis] == goal:
+                    break
+
+                steps = []
+                if (x, y) not in self._horiz_fences:
+                    steps.append((x, y - 1))
+                if (x, y + 1) not in self._horiz_fences:
+                    steps.append((x, y + 1))
+                if (x, y) not in self._vert_fences:
+                    steps.append((x - 1, y))
+                if (x + 1, y) not in self._vert_fences:
+                    steps.append((x + 1, y))
+
+                for step in steps:
+                    if 0 <= step[0] < self._size and 0 <= step[1] < self._size and step not in seen:
+                        seen.add(step)
+                        queue.append(step)
+            else:
+                return False
+
+        return True
+
     def check_win(self, pawn):
         """
         Used to see if there is a winner!
@@ -187,10 +273,8 @@ class Board:
         :return: Modifies the Player object's state if they won and then returns True, but returns False otherwise.
         """
         pawn_name = pawn.get_name()
-        if pawn_name == 'P1' and pawn_name not in self._board[-1]:
-            return False
-
-        elif pawn_name == 'P2' and pawn_name not in self._board[0]:
+        axis, goal = self._goals[pawn_name]
+        if self._locations[pawn_name][axis] != goal:
             return False
 
         pawn.set_winner_state(True)
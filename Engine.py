@@ -0,0 +1,241 @@
+# Description: A computer opponent for Quoridor built on QuoridorGame's move generation and push/pop.
+from time import perf_counter
+from TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER, NO_MOVE
+
+# score of a won position, shortened by one per ply so faster wins score higher
+WIN = 100000
+MAX_DEPTH = 64
+
+# half width of the window searched around the previous iteration's score
+ASPIRATION = 50
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the time budget runs out."""
+
+
+class QuoridorEngine:
+    """
+        This class picks moves with a negamax alpha-beta search. The search is iteratively deepened, each iteration
+        searching a narrow window around the last score first, and tries moves in the order: transposition table move,
+        killer moves, then moves with the best history. When the time budget runs out the best move of the last
+        completed iteration is played.
+    """
+
+    def __init__(self, table_megabytes=16, path_weight=100, fence_weight=10):
+        """
+        Creates an engine.
+        :param table_megabytes: Memory cap of the transposition table.
+        :param path_weight: Score of each step of shortest path length the opponent needs more than the side to move.
+        :param fence_weight: Score of each fence the side to move has left more than the opponent.
+        """
+        self._table = TranspositionTable(table_megabytes)
+        self._path_weight = path_weight
+        self._fence_weight = fence_weight
+        self._killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_DEPTH + 1)]
+        self._history = [[0] * 256, [0] * 256]
+        self._deadline = None
+        self._nodes = 0
+        self._root_move = None
+        self._cells = 0
+        self._info = {}
+
+    def clear(self):
+        """
+        Forgets earlier searches: empties the transposition table in place and resets the killer moves and history, so
+        the next search plays as a newly created engine would.
+        """
+        self._table.clear()
+        self._killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_DEPTH + 1)]
+        self._history = [[0] * 256, [0] * 256]
+
+    def get_info(self):
+        """
+        Returns details of the last search.
+        :return: Returns a dict with the depth completed, the score, the number of nodes searched and the time taken
+        in milliseconds.
+        """
+        return dict(self._info)
+
+    def evaluate(self, game):
+        """
+        Scores the position from the point of view of the player whose turn it is.
+        :param game: The QuoridorGame to score.
+        :return: Returns the integer score.
+        """
+        turn = game.get_turn()
+        other = 2 if turn == 1 else 1
+        paths = game.shortest_path_length(other) - game.shortest_path_length(turn)
+        fences = game.get_player(turn).get_pieces_left() - game.get_player(other).get_pieces_left()
+
+        return paths * self._path_weight + fences * self._fence_weight
+
+    def best_move(self, game, time_ms=None, depth=None):
+        """
+        Searches for the best move of the player whose turn it is. The game is left as it was.
+        :param game: The two player QuoridorGame to search, which must be on a BitBoard of at most 9x9 so that every
+        move code fits in the transposition table's move byte.
+        :param time_ms: Wall clock budget in milliseconds, or None for no limit.
+        :param depth: Deepest iteration to search, or None to search until the time runs out. When neither is given
+        the search stops after depth 2.
+        :return: Returns the move code of the best move, or None if the game is over or there are no legal moves.
+        """
+        self._cells = game.get_size() ** 2
+        if 3 * self._cells > NO_MOVE:
+            raise ValueError("QuoridorEngine plays on boards of at most 9x9")
+        if game.get_player_count() != 2:
+            raise ValueError("QuoridorEngine only plays two player games")
+
+        moves = game.legal_moves()
+        if not moves:
+            return None
+
+        if depth is None:
+            depth = MAX_DEPTH if time_ms is not None else 2
+
+        start = perf_counter()
+        self._deadline = start + time_ms / 1000 if time_ms is not None else None
+        self._nodes = 0
+        self._table.new_search()
+        self._killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_DEPTH + 1)]
+        for side in self._history:
+            for move in range(len(side)):
+                side[move] >>= 1
+
+        best = max(moves, key=self._order_key(game.get_turn(), NO_MOVE, self._killers[0]))
+        score = self.evaluate(game)
+        completed = 0
+
+        for current in range(1, min(depth, MAX_DEPTH) + 1):
+            try:
+                if current >= 3:
+                    alpha, beta = score - ASPIRATION, score + ASPIRATION
+                    result = self._negamax(game, current, alpha, beta, 0)
+                    if result <= alpha or result >= beta:
+                        result = self._negamax(game, current, -WIN - 1, WIN + 1, 0)
+                else:
+                    result = self._negamax(game, current, -WIN - 1, WIN + 1, 0)
+
+            except _Timeout:
+                break
+
+            best, score, completed = self._root_move, result, current
+            if abs(score) > WIN - MAX_DEPTH:
+                break
+
+        self._info = {
+            'depth': completed,
+            'score': score,
+            'nodes': self._nodes,
+            'time_ms': (perf_counter() - start) * 1000,
+        }
+        return best
+
+    def _order_key(self, turn, table_move, killers):
+        """Returns a sort key putting the table move first, then killer moves, then the best history."""
+        history = self._history[turn - 1]
+        cells = self._cells
+
+        def key(move):
+            if move == table_move:
+                return 1 << 40
+            if move in killers:
+                return 1 << 39
+            # pawn moves come before fences with the same history
+            return history[move] * 2 + (move < cells)
+
+        return key
+
+    def _negamax(self, game, depth, alpha, beta, ply):
+        """Searches the position to depth and returns its score for the player whose turn it is."""
+        self._nodes += 1
+        if self._deadline is not None and perf_counter() > self._deadline:
+            raise _Timeout
+
+        # the player who just moved has won
+        if game.is_finished():
+            return ply - WIN
+
+        key = game.get_key()
+        entry = self._table.probe(key)
+        table_move = NO_MOVE
+
+        if entry is not None:
+            table_move, bound, entry_depth, entry_score = entry
+            if entry_depth >= depth and ply > 0:
+                entry_score = _score_from_table(entry_score, ply)
+                if bound == EXACT:
+                    return entry_score
+                if bound == LOWER and entry_score >= beta:
+                    return entry_score
+                if bound == UPPER and entry_score <= alpha:
+                    return entry_score
+
+        if depth == 0:
+            return self.evaluate(game)
+
+        moves = game.legal_moves()
+        if not moves:
+            return self.evaluate(game)
+
+        turn = game.get_turn()
+        killers = self._killers[ply]
+        moves.sort(key=self._order_key(turn, table_move, killers), reverse=True)
+
+        original_alpha = alpha
+        best_score = -WIN - 1
+        best_move = NO_MOVE
+
+        for move in moves:
+            game.push(move)
+            try:
+                score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+
+                if score > alpha:
+                    alpha = score
+
+                    if alpha >= beta:
+                        if move != killers[0]:
+                            killers[1] = killers[0]
+                            killers[0] = move
+                        self._history[turn - 1][move] += depth * depth
+                        break
+
+        if ply == 0:
+            self._root_move = best_move
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+
+        self._table.store(key, best_move, bound, depth, _score_to_table(best_score, ply))
+        return best_score
+
+
+def _score_to_table(score, ply):
+    """Stores win scores as the distance from the position rather than from the root."""
+    if score > WIN - MAX_DEPTH * 2:
+        return score + ply
+    if score < MAX_DEPTH * 2 - WIN:
+        return score - ply
+
+    return score
+
+
+def _score_from_table(score, ply):
+    """Turns a stored win score back into the distance from the root."""
+    if score > WIN - MAX_DEPTH * 2:
+        return score - ply
+    if score < MAX_DEPTH * 2 - WIN:
+        return score + ply
+
+    return score
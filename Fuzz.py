@@ -0,0 +1,289 @@
+# Description: Differential fuzzing of the rules engine. Seeded random sequences of pawn moves and fence placements,
+# legal and illegal, are played through a reference board and a candidate board side by side, and every answer and
+# the position after every step have to agree. The first sequence that disagrees is cut down to a short reproducer
+# and written to disk as JSON.
+import argparse
+import importlib
+import json
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from time import perf_counter
+from Board import Board
+from BitBoard import BitBoard
+from Quoridor import QuoridorGame
+
+BOARDS = {'Board': Board, 'BitBoard': BitBoard}
+
+
+def board_class(name):
+    """
+    Looks up a board implementation.
+    :param name: 'Board', 'BitBoard' or 'module:Class' for any other class with the Board interface.
+    :return: Returns the class.
+    """
+    if name in BOARDS:
+        return BOARDS[name]
+
+    module, _, attribute = name.partition(':')
+    if not attribute:
+        raise ValueError("unknown board %r, expected Board, BitBoard or module:Class" % name)
+
+    return getattr(importlib.import_module(module), attribute)
+
+
+def _observe(game):
+    """Returns everything about a position both boards have to agree on."""
+    board = game._board
+    players = [game.get_player(number) for number in range(1, game.get_player_count() + 1)]
+    return (game.get_turn(), game.is_finished(),
+            tuple(board.get_current_location(pawn.get_name()) for pawn in players),
+            tuple(pawn.get_pieces_left() for pawn in players),
+            tuple(pawn.get_winner_state() for pawn in players))
+
+
+def _apply(game, step):
+    """Makes a step, a (kind, x, y) list, for the player whose turn it is and returns the game's answer."""
+    kind, x, y = step
+    if kind == 'p':
+        return game.move_pawn(game.get_turn(), (x, y))
+
+    return game.place_fence(game.get_turn(), kind, (x, y))
+
+
+def _random_step(rng, game):
+    """
+    Picks a step. Pawn moves go to a square within two of the pawn, which covers every step, jump and diagonal along
+    with the squares just past them, and fences go anywhere on the board or just off it.
+    """
+    size = game.get_size()
+    if rng.random() < 0.6:
+        x, y = game._board.get_current_location('P%d' % game.get_turn())
+        return ['p', x + rng.randint(-2, 2), y + rng.randint(-2, 2)]
+
+    return [rng.choice('vh'), rng.randint(-1, size), rng.randint(-1, size)]
+
+
+def compare(steps, reference=Board, candidate=BitBoard, size=9, players=2):
+    """
+    Plays steps on a game on each board and compares them after every step.
+    :param steps: List of (kind, x, y) steps, kind 'p' for a pawn move or 'v' or 'h' for a fence, each made for the
+    player whose turn it is.
+    :param reference: Board class whose answers are taken as right.
+    :param candidate: Board class under test.
+    :param size: Number of squares along a side of the board.
+    :param players: Number of players, 2 or 4.
+    :return: Returns None if the boards agree, otherwise a dict with the index of the first step they disagree on and
+    each board's answer and position after it.
+    """
+    games = (QuoridorGame(reference, size, players=players), QuoridorGame(candidate, size, players=players))
+    for index, step in enumerate(steps):
+        seen = [(_apply(game, step),) + _observe(game) for game in games]
+        if seen[0] != seen[1]:
+            return {'step': index, 'reference': seen[0], 'candidate': seen[1]}
+
+    return None
+
+
+def run_sequence(seed, length=80, reference=Board, candidate=BitBoard, size=9, players=2):
+    """
+    Generates and compares one random sequence. Steps are picked from the reference game's position as it is played.
+    :param seed: Seed of the sequence.
+    :param length: Number of steps, fewer if the game is won first.
+    :return: Returns a tuple of the steps played and the divergence found by compare, or None.
+    """
+    rng = random.Random(seed)
+    games = (QuoridorGame(reference, size, players=players), QuoridorGame(candidate, size, players=players))
+    steps = []
+
+    while len(steps) < length and not games[0].is_finished():
+        step = _random_step(rng, games[0])
+        steps.append(step)
+        seen = [(_apply(game, step),) + _observe(game) for game in games]
+        if seen[0] != seen[1]:
+            return steps, {'step': len(steps) - 1, 'reference': seen[0], 'candidate': seen[1]}
+
+    return steps, None
+
+
+def _run_batch(first, count, seed, length, reference, candidate, size, players):
+    """Worker task: runs sequences first to first + count - 1 and returns the first divergence, or None."""
+    for index in range(first, first + count):
+        steps, divergence = run_sequence(_sequence_seed(seed, index), length, reference, candidate, size, players)
+        if divergence is not None:
+            return index, steps
+
+    return None
+
+
+def _sequence_seed(seed, index):
+    """Returns the seed of sequence index of a run."""
+    return seed << 32 | index
+
+
+def minimize(steps, diverges):
+    """
+    Cuts a failing sequence down with delta debugging: chunks of steps are dropped for as long as the rest still
+    fails, halving the chunk size whenever no chunk can be dropped.
+    :param steps: List of steps that fails.
+    :param diverges: Called with a list of steps, returns True if it still fails.
+    :return: Returns the shortest failing list found, in which no single step can be dropped.
+    """
+    chunks = 2
+    while len(steps) > 1:
+        chunk = -(-len(steps) // chunks)
+        for start in range(0, len(steps), chunk):
+            smaller = steps[:start] + steps[start + chunk:]
+            if diverges(smaller):
+                steps = smaller
+                chunks = max(chunks - 1, 2)
+                break
+        else:
+            if chunk == 1:
+                break
+            chunks = min(2 * chunks, len(steps))
+
+    return steps
+
+
+def fuzz(sequences=1000, seed=0, length=80, reference=Board, candidate=BitBoard, size=9, players=2, workers=0,
+         batch=200, output=None, on_progress=None):
+    """
+    Compares the boards on random sequences until one disagrees, then minimizes it.
+    :param sequences: Number of sequences to run.
+    :param seed: Seed of the run, sequence i is seeded from seed and i so any one can be run again on its own.
+    :param length: Steps per sequence.
+    :param reference: Board class whose answers are taken as right. Board classes must be importable when workers
+    are used.
+    :param candidate: Board class under test.
+    :param size: Number of squares along a side of the board.
+    :param players: Number of players, 2 or 4.
+    :param workers: Number of worker processes, 0 to run every sequence in this process.
+    :param batch: Sequences per worker task.
+    :param output: File to write the reproducer to as JSON, if any.
+    :param on_progress: Called with the number of sequences run after every batch.
+    :return: Returns None if the boards agreed on every sequence, otherwise the reproducer dict.
+    """
+    settings = (seed, length, reference, candidate, size, players)
+    failure = None
+    done_count = 0
+
+    if not workers:
+        for first in range(0, sequences, batch):
+            failure = _run_batch(first, min(batch, sequences - first), *settings)
+            done_count += min(batch, sequences - first)
+            if on_progress is not None:
+                on_progress(done_count)
+            if failure is not None:
+                break
+    else:
+        pool = ProcessPoolExecutor(workers)
+        # first sequence of each running batch
+        pending = {}
+        first = 0
+        try:
+            while pending or (first < sequences and failure is None):
+                while failure is None and first < sequences and len(pending) < 2 * workers:
+                    pending[pool.submit(_run_batch, first, min(batch, sequences - first), *settings)] = first
+                    first += batch
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    done_count += min(batch, sequences - pending.pop(future))
+                    found = future.result()
+                    if found is not None and (failure is None or found[0] < failure[0]):
+                        failure = found
+                if on_progress is not None:
+                    on_progress(done_count)
+
+                # batches finish out of order, so the earlier ones are waited for to report the same failing sequence
+                # as a run without workers
+                if failure is not None:
+                    for future, start in list(pending.items()):
+                        if start > failure[0]:
+                            future.cancel()
+                            del pending[future]
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    if failure is None:
+        return None
+
+    index, steps = failure
+    steps = minimize(steps, lambda candidate_steps: compare(candidate_steps, reference, candidate, size, players)
+                     is not None)
+    divergence = compare(steps, reference, candidate, size, players)
+    reproducer = {
+        'reference': _class_name(reference),
+        'candidate': _class_name(candidate),
+        'size': size,
+        'players': players,
+        'seed': seed,
+        'sequence': index,
+        'steps': steps,
+        'divergence': divergence,
+    }
+    if output:
+        with open(output, 'w') as file:
+            json.dump(reproducer, file, indent=2)
+
+    return reproducer
+
+
+def _class_name(cls):
+    """Returns the name board_class looks a class up by."""
+    return cls.__name__ if BOARDS.get(cls.__name__) is cls else '%s:%s' % (cls.__module__, cls.__qualname__)
+
+
+def replay(path):
+    """
+    Runs a reproducer written by fuzz again.
+    :param path: The reproducer's JSON file.
+    :return: Returns the divergence found by compare, or None if the boards now agree.
+    """
+    with open(path) as file:
+        reproducer = json.load(file)
+
+    return compare(reproducer['steps'], board_class(reproducer['reference']), board_class(reproducer['candidate']),
+                   reproducer['size'], reproducer['players'])
+
+
+def main(argv=None):
+    """Command line entry point. Exits with status 1 if the boards disagree."""
+    parser = argparse.ArgumentParser(description="Fuzzes a Quoridor board implementation against the reference.")
+    parser.add_argument('--sequences', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--length', type=int, default=80, help="steps per sequence")
+    parser.add_argument('--reference', default='Board', help="Board, BitBoard or module:Class")
+    parser.add_argument('--candidate', default='BitBoard', help="Board, BitBoard or module:Class")
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--players', type=int, default=2, choices=(2, 4))
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--output', default='reproducer.json', help="file the minimized reproducer is written to")
+    parser.add_argument('--replay', help="reproducer file to run again instead of fuzzing")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        divergence = replay(args.replay)
+        print(json.dumps(divergence))
+        return 0 if divergence is None else 1
+
+    start = perf_counter()
+
+    def show(count):
+        print('%d sequences, %.0f per second' % (count, count / (perf_counter() - start)), file=sys.stderr)
+
+    reproducer = fuzz(args.sequences, args.seed, args.length, board_class(args.reference),
+                      board_class(args.candidate), args.size, args.players, args.workers, output=args.output,
+                      on_progress=show)
+    if reproducer is None:
+        print("no divergence in %d sequences" % args.sequences)
+        return 0
+
+    print(json.dumps(reproducer['divergence']))
+    print("%d step reproducer written to %s" % (len(reproducer['steps']), args.output))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
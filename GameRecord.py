@@ -0,0 +1,243 @@
+# Description: A compact binary file format for archiving games. Every move is stored as its one byte move code (see
+# Moves.py), so a game of n moves takes n + 3 bytes. A file is laid out as:
+#   header   magic b'QGRF', version byte, flags byte, 2 reserved bytes, 8 byte offset of the index (0 until closed)
+#   games    2 byte move count, winner byte (0 unfinished, 1 or 2), then one byte per move
+#   index    8 byte game count, then the 8 byte offset of every game
+# All numbers are little endian. A file that was never closed has no index, and is read by scanning its games. The
+# board size is not recorded, so record files hold 9x9 games.
+import mmap
+import os
+import struct
+import sys
+from array import array
+from Moves import HORIZONTAL, CELLS
+
+MAGIC = b'QGRF'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBBHQ')
+_GAME = struct.Struct('<HB')
+_COUNT = struct.Struct('<Q')
+
+# longest game a record can hold
+MAX_MOVES = 0xFFFF
+
+
+def _read_header(data):
+    """Checks the header and returns the index offset."""
+    if len(data) < _HEADER.size:
+        raise ValueError("not a game record file")
+
+    magic, version, flags, reserved, index_offset = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a game record file")
+    if version != VERSION:
+        raise ValueError("unsupported game record version %d" % version)
+
+    return index_offset
+
+
+def _scan(data, end):
+    """
+    Finds the games between the header and end, leaving out a game cut short by a crash.
+    :return: Returns the array of game offsets and the offset just past the last whole game.
+    """
+    offsets = array('Q')
+    offset = _HEADER.size
+    while offset + _GAME.size <= end:
+        length, winner = _GAME.unpack_from(data, offset)
+        if offset + _GAME.size + length > end:
+            break
+        offsets.append(offset)
+        offset += _GAME.size + length
+
+    return offsets, offset
+
+
+class GameRecordWriter:
+    """
+        This class writes games to a record file. Games are appended as they come, and the index is written when the
+        writer is closed, so use it as a context manager or call close().
+    """
+
+    def __init__(self, path, append=False):
+        """
+        Opens a record file for writing.
+        :param path: The file to write.
+        :param append: True to add games to an existing file, which is created if it doesn't exist or is empty.
+        """
+        self._offsets = array('Q')
+        if append and os.path.exists(path) and os.path.getsize(path):
+            self._file = open(path, 'r+b')
+            try:
+                end = self._read_offsets()
+            except Exception:
+                self._file.close()
+                raise
+            # drops the old index, which is written again on close, and any game cut short
+            self._file.seek(end)
+            self._file.truncate()
+            self._write_header(0)
+        else:
+            self._file = open(path, 'wb')
+            self._write_header(0)
+
+    def _read_offsets(self):
+        """
+        Reads the game offsets of the file being appended to from its index, or by scanning its game headers through a
+        memory map if it was never closed, without reading the games themselves.
+        :return: Returns the offset just past the last whole game.
+        """
+        index_offset = _read_header(self._file.read(_HEADER.size))
+        if not index_offset:
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                self._offsets, end = _scan(data, len(data))
+            return end
+
+        self._file.seek(index_offset)
+        count = _COUNT.unpack(self._file.read(_COUNT.size))[0]
+        index = self._file.read(count * _COUNT.size)
+        if len(index) != count * _COUNT.size:
+            raise ValueError("game record index is cut short")
+
+        self._offsets.frombytes(index)
+        if sys.byteorder == 'big':
+            self._offsets.byteswap()
+        return index_offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _write_header(self, index_offset):
+        """Writes the header with the given index offset and returns to the end of the file."""
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0, index_offset))
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, moves, winner=0):
+        """
+        Adds a game.
+        :param moves: Iterable of the game's move codes in order.
+        :param winner: 1 or 2 for the player who won, 0 if the game wasn't finished.
+        :return: Returns the index of the game in the file.
+        """
+        moves = bytes(moves)
+        if len(moves) > MAX_MOVES:
+            raise ValueError("a game can have at most %d moves" % MAX_MOVES)
+        if moves and max(moves) >= HORIZONTAL + CELLS:
+            raise ValueError("invalid move code %d" % max(moves))
+        if winner not in (0, 1, 2):
+            raise ValueError("winner must be 0, 1 or 2")
+
+        self._offsets.append(self._file.tell())
+        self._file.write(_GAME.pack(len(moves), winner))
+        self._file.write(moves)
+        return len(self._offsets) - 1
+
+    def close(self):
+        """Writes the index and closes the file."""
+        if self._file is None:
+            return
+
+        index_offset = self._file.tell()
+        self._file.write(_COUNT.pack(len(self._offsets)))
+        offsets = self._offsets
+        if sys.byteorder == 'big':
+            offsets = array('Q', offsets)
+            offsets.byteswap()
+        self._file.write(offsets.tobytes())
+        self._write_header(index_offset)
+        self._file.close()
+        self._file = None
+
+
+class GameRecordReader:
+    """
+        This class reads a record file through a memory map, so only the pages of the games read are loaded. Games
+        are returned as (moves, winner), where moves is a bytes object whose items are the move codes.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a record file for reading.
+        :param path: The file to read.
+        """
+        self._file = open(path, 'rb')
+        # an empty file can't be memory mapped, and anything shorter than a header isn't a record file
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size:
+            self._file.close()
+            raise ValueError("not a game record file")
+
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index_offset = _read_header(self._data)
+        except ValueError:
+            self.close()
+            raise
+        self._offsets = None
+        if self._index_offset:
+            self._count = _COUNT.unpack_from(self._data, self._index_offset)[0]
+        else:
+            self._offsets = _scan(self._data, len(self._data))[0]
+            self._count = len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the file."""
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = None
+
+    def __len__(self):
+        return self._count
+
+    def _offset(self, number):
+        """Returns the offset of game number."""
+        if self._offsets is not None:
+            return self._offsets[number]
+
+        return _COUNT.unpack_from(self._data, self._index_offset + _COUNT.size * (number + 1))[0]
+
+    def _game(self, offset):
+        """Returns the game at offset and the offset of the next one."""
+        length, winner = _GAME.unpack_from(self._data, offset)
+        start = offset + _GAME.size
+        return (self._data[start:start + length], winner), start + length
+
+    def __getitem__(self, number):
+        """Returns game number as (moves, winner), using the index."""
+        if number < 0:
+            number += self._count
+        if not 0 <= number < self._count:
+            raise IndexError("game record index out of range")
+
+        return self._game(self._offset(number))[0]
+
+    def __iter__(self):
+        """Yields every game in order as (moves, winner), reading straight through the file."""
+        offset = _HEADER.size
+        for _ in range(self._count):
+            game, offset = self._game(offset)
+            yield game
+
+
+def read_games(path):
+    """
+    Streams the games of a record file.
+    :param path: The file to read.
+    :return: Yields each game as (moves, winner).
+    """
+    with GameRecordReader(path) as reader:
+        yield from reader
@@ -0,0 +1,99 @@
+# Description: A fixed size record of a Quoridor position, for keeping many games in memory or on disk. The record is
+# 28 bytes: each pawn's square, the vertical and horizontal fence bitmasks (11 bytes each, little endian), the fences
+# each player has left, the player whose turn it is and the winner (0 while the game is unfinished).
+import struct
+from Moves import SIZE, CELLS
+
+# bytes of a fence bitmask, one bit per square
+_FENCE_BYTES = (CELLS + 7) // 8
+
+_RECORD = struct.Struct('<BB%ds%dsBBBB' % (_FENCE_BYTES, _FENCE_BYTES))
+
+# size of a record in bytes
+RECORD_SIZE = _RECORD.size
+
+
+class GameState:
+    """
+        This class is an immutable position backed by one bytes record. QuoridorGame.get_state() takes a state from a
+        game and QuoridorGame.from_state(state) turns it back into a game that can be played on. A live game keeps its
+        own working board, distance maps and undo history instead of a record, so states are the form games are kept
+        in while nothing is being played on them.
+    """
+    __slots__ = ('_record',)
+
+    def __init__(self, record):
+        """
+        Wraps a record.
+        :param record: The bytes of a record, as returned by to_bytes.
+        """
+        record = bytes(record)
+        if len(record) != RECORD_SIZE:
+            raise ValueError("a game state record is %d bytes" % RECORD_SIZE)
+
+        self._record = record
+
+    @classmethod
+    def pack(cls, squares, vert_fences, horiz_fences, pieces_left, turn, winner):
+        """
+        Builds a state from its fields.
+        :param squares: Tuple of the square of player 1's pawn and of player 2's pawn.
+        :param vert_fences: Bitmask of the vertical fences.
+        :param horiz_fences: Bitmask of the horizontal fences.
+        :param pieces_left: Tuple of the fences player 1 and player 2 have left.
+        :param turn: 1 or 2 for the player whose turn it is.
+        :param winner: 1 or 2 for the player who has won, 0 if nobody has.
+        :return: Returns the GameState.
+        """
+        return cls(_RECORD.pack(squares[0], squares[1], vert_fences.to_bytes(_FENCE_BYTES, 'little'),
+                                horiz_fences.to_bytes(_FENCE_BYTES, 'little'), pieces_left[0], pieces_left[1], turn,
+                                winner))
+
+    def unpack(self):
+        """Returns the fields in the order pack takes them."""
+        sq1, sq2, vert, horiz, left1, left2, turn, winner = _RECORD.unpack(self._record)
+        return ((sq1, sq2), int.from_bytes(vert, 'little'), int.from_bytes(horiz, 'little'), (left1, left2), turn,
+                winner)
+
+    def to_bytes(self):
+        """Returns the record."""
+        return self._record
+
+    def get_square(self, player):
+        """Returns the square the player's pawn stands on."""
+        return self._record[player - 1]
+
+    def get_location(self, player):
+        """Returns the (x, y) location of the player's pawn."""
+        sq = self._record[player - 1]
+        return sq % SIZE, sq // SIZE
+
+    def get_fences(self):
+        """Returns the vertical and horizontal fence bitmasks."""
+        return self.unpack()[1:3]
+
+    def get_pieces_left(self, player):
+        """Returns the number of fences the player has left."""
+        return self._record[RECORD_SIZE - 5 + player]
+
+    def get_turn(self):
+        """Returns the player whose turn it is."""
+        return self._record[RECORD_SIZE - 2]
+
+    def get_winner(self):
+        """Returns the player who has won, or 0 if nobody has."""
+        return self._record[RECORD_SIZE - 1]
+
+    def is_finished(self):
+        """Returns True if a player has won."""
+        return self._record[RECORD_SIZE - 1] != 0
+
+    def __eq__(self, other):
+        return isinstance(other, GameState) and self._record == other._record
+
+    def __hash__(self):
+        return hash(self._record)
+
+    def __repr__(self):
+        return 'GameState(%r)' % self._record
+
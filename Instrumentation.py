@@ -0,0 +1,203 @@
+# Description: Opt-in counters and timers for the rules engine. enable() swaps the board and game methods for wrappers
+# that count calls, time them in nanoseconds and record why moves are rejected, and disable() puts the original
+# methods back, so nothing is measured or slowed down while instrumentation is off.
+import functools
+from time import perf_counter_ns
+from Board import Board
+from BitBoard import BitBoard
+from Quoridor import QuoridorGame
+
+# methods wrapped by enable, by class
+METHODS = {
+    Board: ('make_move', 'make_vertical_moves', 'make_horizontal_moves', 'make_diagonal_moves', 'place_fence',
+            'check_win'),
+    BitBoard: ('make_move', 'make_vertical_moves', 'make_horizontal_moves', 'make_diagonal_moves', 'place_fence',
+               'check_win'),
+    QuoridorGame: ('move_pawn', 'place_fence', 'push', 'apply_moves'),
+}
+
+# why move_pawn and place_fence turn a move down
+PAWN_REASONS = ('game_over', 'wrong_turn', 'off_board', 'occupied', 'fence_blocked', 'not_reachable')
+FENCE_REASONS = ('game_over', 'wrong_turn', 'no_fences_left', 'bad_fence_type', 'off_board', 'occupied', 'seals_path')
+
+# original methods while instrumentation is on, by (class, name)
+_originals = {}
+
+# [calls, nanoseconds, calls that returned False] by 'Class.method'
+_counters = {}
+
+# counts by (call, reason)
+_rejections = {}
+
+
+def is_enabled():
+    """Returns True while instrumentation is on."""
+    return bool(_originals)
+
+
+def enable():
+    """Starts counting. The counts carry on from where they were, call reset to start from zero."""
+    if _originals:
+        return
+
+    for cls, names in METHODS.items():
+        for name in names:
+            method = cls.__dict__[name]
+            _originals[(cls, name)] = method
+            wrapper = _timed('%s.%s' % (cls.__name__, name), method)
+            if cls is QuoridorGame and name == 'move_pawn':
+                wrapper = _explained('move_pawn', wrapper, _pawn_rejection)
+            elif cls is QuoridorGame and name == 'place_fence':
+                wrapper = _explained('place_fence', wrapper, _fence_rejection)
+            setattr(cls, name, wrapper)
+
+
+def disable():
+    """Stops counting and puts the original methods back. The counts are kept."""
+    for (cls, name), method in _originals.items():
+        setattr(cls, name, method)
+    _originals.clear()
+
+
+def reset():
+    """Sets every count back to zero."""
+    # the wrappers hold on to their counters, so they are zeroed in place
+    for counter in _counters.values():
+        counter[:] = [0, 0, 0]
+    _rejections.clear()
+
+
+class instrumented:
+    """Context manager that turns instrumentation on inside a with block."""
+
+    def __enter__(self):
+        self._was_enabled = is_enabled()
+        enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._was_enabled:
+            disable()
+
+
+def _timed(name, method):
+    """Wraps a method to count its calls, time and False results."""
+    counter = _counters.setdefault(name, [0, 0, 0])
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        result = method(*args, **kwargs)
+        counter[1] += perf_counter_ns() - start
+        counter[0] += 1
+        if result is False:
+            counter[2] += 1
+        return result
+
+    return wrapper
+
+
+def _explained(call, wrapper, explain):
+    """Wraps a QuoridorGame move method to record why it returned False."""
+    @functools.wraps(wrapper)
+    def explained(game, *args, **kwargs):
+        result = wrapper(game, *args, **kwargs)
+        if result is False:
+            key = (call, explain(game, *args, **kwargs))
+            _rejections[key] = _rejections.get(key, 0) + 1
+        return result
+
+    return explained
+
+
+def _pawn_rejection(game, player, location):
+    """Returns why move_pawn turned the move down. A turned down move leaves the game as it was."""
+    if game.is_finished():
+        return 'game_over'
+    if player != game.get_turn():
+        return 'wrong_turn'
+
+    x, y = location
+    size = game.get_size()
+    if not (0 <= x < size and 0 <= y < size):
+        return 'off_board'
+
+    board = game._board
+    current = board.get_current_location(game.get_player(player).get_name())
+    pawns = [board.get_current_location(game.get_player(number).get_name())
+             for number in range(1, game.get_player_count() + 1)]
+    if (x, y) in pawns:
+        return 'occupied'
+
+    # a step to a free square next to the pawn can only be blocked by a fence
+    if abs(x - current[0]) + abs(y - current[1]) == 1:
+        return 'fence_blocked'
+
+    return 'not_reachable'
+
+
+def _fence_rejection(game, player, fence, location):
+    """Returns why place_fence turned the fence down. A turned down fence leaves the game as it was."""
+    if game.is_finished():
+        return 'game_over'
+    if player != game.get_turn():
+        return 'wrong_turn'
+    if game.get_player(player).get_pieces_left() == 0:
+        return 'no_fences_left'
+    if fence not in ('v', 'h'):
+        return 'bad_fence_type'
+
+    x, y = location
+    size = game.get_size()
+    low_x, low_y = (1, 0) if fence == 'v' else (0, 1)
+    if not (low_x <= x < size and low_y <= y < size):
+        return 'off_board'
+    if game._board.has_fence(fence, location):
+        return 'occupied'
+
+    return 'seals_path'
+
+
+def snapshot():
+    """
+    Returns the counts so far.
+    :return: Returns a dict with 'methods', mapping 'Class.method' to its calls, total nanoseconds and number of False
+    results, and 'rejections', mapping 'move_pawn' and 'place_fence' to the count of each rejection reason.
+    """
+    methods = {name: {'calls': calls, 'ns': ns, 'false': false}
+               for name, (calls, ns, false) in sorted(_counters.items()) if calls}
+    rejections = {}
+    for (call, reason), count in sorted(_rejections.items()):
+        rejections.setdefault(call, {})[reason] = count
+
+    return {'methods': methods, 'rejections': rejections}
+
+
+def to_prometheus(prefix='quoridor'):
+    """
+    Returns the counts in the Prometheus text exposition format.
+    :param prefix: Prefix of every metric name.
+    :return: Returns the text.
+    """
+    counts = snapshot()
+    lines = []
+
+    def family(name, help_text, samples):
+        lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+        lines.append('# TYPE %s_%s counter' % (prefix, name))
+        for labels, value in samples:
+            label_text = ','.join('%s="%s"' % pair for pair in labels)
+            lines.append('%s_%s{%s} %s' % (prefix, name, label_text, value))
+
+    methods = counts['methods']
+    family('calls_total', "Calls of each instrumented method.",
+           [((('method', name),), stats['calls']) for name, stats in methods.items()])
+    family('call_seconds_total', "Time spent in each instrumented method, including the methods it calls.",
+           [((('method', name),), repr(stats['ns'] / 1e9)) for name, stats in methods.items()])
+    family('false_results_total', "Calls of each instrumented method that returned False.",
+           [((('method', name),), stats['false']) for name, stats in methods.items()])
+    family('rejections_total', "Moves turned down by move_pawn and place_fence, by reason.",
+           [((('call', call), ('reason', reason)), count)
+            for call, reasons in counts['rejections'].items() for reason, count in reasons.items()])
+
+    return '\n'.join(lines) + '\n'
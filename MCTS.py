@@ -0,0 +1,359 @@
+# Description: A Monte Carlo tree search player for Quoridor that spreads its playouts over a pool of processes.
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from time import perf_counter
+from Quoridor import QuoridorGame
+
+
+class _Node:
+    """A position in the search tree, reached by move from its parent."""
+    __slots__ = ('move', 'parent', 'children', 'prior', 'visits', 'wins', 'mover')
+
+    def __init__(self, move, parent, prior, mover):
+        self.move = move
+        self.parent = parent
+        self.children = None
+        self.prior = prior
+        self.visits = 0
+        # playout results from the point of view of the player who made the move
+        self.wins = 0.0
+        self.mover = mover
+
+
+def rollout(game, rng, max_moves=40, fence_rate=0.2):
+    """
+    Plays a quick game from the current position and takes it back afterwards. Each turn places a random fence with
+    probability fence_rate, and otherwise moves the pawn to the square closest to its goal.
+    :param game: The QuoridorGame to play out.
+    :param rng: A random.Random used for the moves.
+    :param max_moves: Number of moves after which the position is scored instead of played to the end.
+    :param fence_rate: Chance of trying a random fence each turn.
+    :return: Returns the chance player 1 wins, from 0 to 1.
+    """
+    pushed = 0
+    while pushed < max_moves and not game.is_finished():
+        turn = game.get_turn()
+        moved = False
+        if rng.random() < fence_rate and game.get_player(turn).get_pieces_left():
+            cells = game.get_size() ** 2
+            moved = game.push(rng.randrange(cells, 3 * cells))
+
+        if not moved:
+            best = None
+            best_length = None
+            for move in game.legal_pawn_moves():
+                game.push(move)
+                length = game.shortest_path_length(turn) + rng.random()
+                game.pop()
+                if best is None or length < best_length:
+                    best, best_length = move, length
+
+            if best is None:
+                break
+            game.push(best)
+
+        pushed += 1
+
+    if game.is_finished():
+        value = 1.0 if game.is_winner(1) else 0.0
+    else:
+        lead = game.shortest_path_length(2) - game.shortest_path_length(1)
+        value = 1 / (1 + math.exp(-lead / 2))
+
+    for _ in range(pushed):
+        game.pop()
+
+    return value
+
+
+def _restore(snapshot):
+    """Returns a new game in the position of a snapshot."""
+    game = QuoridorGame()
+    game.restore(snapshot)
+    return game
+
+
+def _playout_task(snapshot, path, seed, max_moves, fence_rate):
+    """Worker task for tree parallelism: plays out the position reached by path from the root's snapshot."""
+    game = _restore(snapshot)
+    for move in path:
+        game.push(move)
+
+    return rollout(game, random.Random(seed), max_moves, fence_rate)
+
+
+def _root_task(snapshot, settings, playouts, time_ms, seed):
+    """Worker task for root parallelism: searches its own tree and returns the visits and wins of each root move."""
+    engine = MCTSEngine(workers=0, seed=seed, **settings)
+    root = engine._search(_restore(snapshot), playouts, time_ms)
+
+    return {child.move: (child.visits, child.wins) for child in root.children or ()}
+
+
+class MCTSEngine:
+    """
+        This class picks moves with Monte Carlo tree search. Children are selected by UCT, or by PUCT with priors that
+        favour pawn moves towards the goal, and leaves are scored by a short rollout. With workers the search runs either with root
+        parallelism, where every worker grows its own tree and the root visit counts are added up, or with tree
+        parallelism, where one tree is grown here and the rollouts run in the workers, with a virtual loss on the path
+        to every leaf still waiting for its result so that the next selections spread out.
+    """
+
+    def __init__(self, workers=0, selection='uct', parallelism='root', exploration=1.4, virtual_loss=1,
+                 max_moves=40, fence_rate=0.2, seed=None):
+        """
+        Creates an engine.
+        :param workers: Number of worker processes, 0 to run every playout in this process.
+        :param selection: 'uct' or 'puct'.
+        :param parallelism: 'root' or 'tree'.
+        :param exploration: The exploration constant of the selection formula.
+        :param virtual_loss: Visits added to the path of a leaf while its playout runs in tree parallelism.
+        :param max_moves: Length of a rollout before the position is scored.
+        :param fence_rate: Chance of a random fence on each rollout turn.
+        :param seed: Seed for the engine's random choices.
+        """
+        if selection not in ('uct', 'puct'):
+            raise ValueError("selection must be 'uct' or 'puct'")
+        if parallelism not in ('root', 'tree'):
+            raise ValueError("parallelism must be 'root' or 'tree'")
+
+        self._workers = workers
+        self._selection = selection
+        self._parallelism = parallelism
+        self._exploration = exploration
+        self._virtual_loss = virtual_loss
+        self._max_moves = max_moves
+        self._fence_rate = fence_rate
+        self._rng = random.Random(seed)
+        self._pool = None
+        self._info = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts the worker processes down."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def reseed(self, seed):
+        """Restarts the engine's random choices from a seed, as if it had been created with that seed."""
+        self._rng.seed(seed)
+
+    def get_info(self):
+        """
+        Returns details of the last search.
+        :return: Returns a dict with the number of playouts, playouts per second, time taken in milliseconds, number
+        of workers and the kind of parallelism.
+        """
+        return dict(self._info)
+
+    def best_move(self, game, playouts=None, time_ms=None):
+        """
+        Searches for the best move of the player whose turn it is. The game is left as it was.
+        :param game: The two player QuoridorGame to search, which must be on a BitBoard, and on a 9x9 one when workers
+        are used since positions are sent to them as snapshots.
+        :param playouts: Number of playouts to run, or None for no limit.
+        :param time_ms: Wall clock budget in milliseconds, or None for no limit. When neither limit is given 1000
+        playouts are run.
+        :return: Returns the move code of the most visited move, or None if the game is over or there are no legal
+        moves.
+        """
+        if game.get_player_count() != 2:
+            raise ValueError("MCTSEngine only plays two player games")
+        if self._workers and game.get_size() != 9:
+            raise ValueError("MCTSEngine workers only play 9x9 games")
+
+        if not game.legal_moves():
+            return None
+
+        if playouts is None and time_ms is None:
+            playouts = 1000
+
+        start = perf_counter()
+        if self._workers and self._parallelism == 'root':
+            stats = self._root_parallel(game, playouts, time_ms)
+        else:
+            root = self._search(game, playouts, time_ms)
+            stats = {child.move: (child.visits, child.wins) for child in root.children or ()}
+
+        if not stats:
+            return game.legal_moves()[0]
+
+        total = sum(visits for visits, wins in stats.values())
+        elapsed = perf_counter() - start
+        self._info = {
+            'playouts': total,
+            'playouts_per_second': total / elapsed if elapsed else 0.0,
+            'time_ms': elapsed * 1000,
+            'workers': self._workers,
+            'parallelism': self._parallelism,
+        }
+
+        return max(stats, key=lambda move: stats[move])
+
+    def _executor(self):
+        """Returns the process pool, starting it the first time."""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._workers)
+
+        return self._pool
+
+    def _root_parallel(self, game, playouts, time_ms):
+        """Runs an independent search in every worker and adds up their root statistics."""
+        snapshot = game.snapshot()
+        settings = {
+            'selection': self._selection,
+            'exploration': self._exploration,
+            'max_moves': self._max_moves,
+            'fence_rate': self._fence_rate,
+        }
+        share = None if playouts is None else max(1, playouts // self._workers)
+        futures = [self._executor().submit(_root_task, snapshot, settings, share, time_ms, self._rng.getrandbits(64))
+                   for _ in range(self._workers)]
+
+        stats = {}
+        for future in futures:
+            for move, (visits, wins) in future.result().items():
+                old_visits, old_wins = stats.get(move, (0, 0.0))
+                stats[move] = (old_visits + visits, old_wins + wins)
+
+        return stats
+
+    def _search(self, game, playouts, time_ms):
+        """Grows a tree from the game's position and returns its root, running the rollouts in the workers in tree
+        parallelism."""
+        deadline = None if time_ms is None else perf_counter() + time_ms / 1000
+        root = _Node(None, None, 1.0, 2 if game.get_turn() == 1 else 1)
+        parallel = self._workers and self._parallelism == 'tree'
+        snapshot = game.snapshot() if parallel else None
+        pending = {}
+        started = 0
+
+        while True:
+            out_of_budget = ((playouts is not None and started >= playouts) or
+                             (deadline is not None and perf_counter() > deadline))
+            if out_of_budget and not pending:
+                break
+
+            if not out_of_budget and (not parallel or len(pending) < 2 * self._workers):
+                started += 1
+                path, leaf = self._select(root, game)
+                value = None
+
+                if game.is_finished():
+                    value = 1.0 if game.is_winner(1) else 0.0
+                elif parallel:
+                    future = self._executor().submit(_playout_task, snapshot, path, self._rng.getrandbits(64),
+                                                     self._max_moves, self._fence_rate)
+                    pending[future] = leaf
+                    self._add_virtual_loss(leaf, self._virtual_loss)
+                else:
+                    value = rollout(game, self._rng, self._max_moves, self._fence_rate)
+
+                for _ in path:
+                    game.pop()
+
+                if value is not None:
+                    self._backpropagate(leaf, value)
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                leaf = pending.pop(future)
+                self._add_virtual_loss(leaf, -self._virtual_loss)
+                self._backpropagate(leaf, future.result())
+
+        return root
+
+    def _select(self, root, game):
+        """
+        Walks down the tree to a node that has not been played out yet, pushing its moves on the game, and expands it.
+        :return: Returns the list of moves pushed and the node reached.
+        """
+        node = root
+        path = []
+
+        while not game.is_finished():
+            if node.children is None:
+                self._expand(node, game)
+
+            if not node.children:
+                break
+
+            node = self._choose(node)
+            game.push(node.move)
+            path.append(node.move)
+
+            if node.visits == 0:
+                break
+
+        return path, node
+
+    def _expand(self, node, game):
+        """
+        Creates the children of a node. For PUCT a pawn move gets three times the prior of a fence, and twice that
+        again if it shortens the pawn's path.
+        """
+        moves = game.legal_moves()
+        self._rng.shuffle(moves)
+        mover = game.get_turn()
+        length = game.shortest_path_length(mover)
+        cells = game.get_size() ** 2
+        weights = []
+
+        for move in moves:
+            weight = 1.0
+            if move < cells:
+                weight = 3.0
+                game.push(move)
+                if game.is_finished() or game.shortest_path_length(mover) < length:
+                    weight = 6.0
+                game.pop()
+            weights.append(weight)
+
+        total = sum(weights)
+        node.children = [_Node(move, node, weight / total, mover) for move, weight in zip(moves, weights)]
+
+    def _choose(self, node):
+        """Returns the child to search next, by UCT or PUCT."""
+        exploration = self._exploration
+        parent_visits = max(node.visits, 1)
+
+        if self._selection == 'uct':
+            log_visits = math.log(parent_visits)
+            best = None
+            best_score = -1.0
+            for child in node.children:
+                if child.visits == 0:
+                    return child
+
+                score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best, best_score = child, score
+
+            return best
+
+        # children that have not been played out yet start from their parent's value
+        unvisited = 1.0 - node.wins / node.visits if node.visits else 0.5
+        root_visits = math.sqrt(parent_visits)
+        return max(node.children, key=lambda child: (child.wins / child.visits if child.visits else unvisited) +
+                   exploration * child.prior * root_visits / (1 + child.visits))
+
+    def _add_virtual_loss(self, node, amount):
+        """Counts amount extra visits without wins on the path from the root to node."""
+        while node is not None:
+            node.visits += amount
+            node = node.parent
+
+    def _backpropagate(self, node, value):
+        """Adds a playout result, the chance player 1 wins, to every node on the path from node to the root."""
+        while node is not None:
+            node.visits += 1
+            node.wins += value if node.mover == 1 else 1.0 - value
+            node = node.parent
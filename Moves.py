@@ -0,0 +1,53 @@
+# Description: Compact integer encoding for Quoridor moves. A move is a single number below 256:
+#   0 - 80     moves the pawn to square y * 9 + x
+#   81 - 161   places a vertical fence at 81 + y * 9 + x
+#   162 - 242  places a horizontal fence at 162 + y * 9 + x
+# Fence codes for the slots on the board edge are never produced, since those fences can't be placed. On a board of
+# another size the same layout is used with size in place of 9, so the codes of boards up to 9x9 fit in one byte.
+
+SIZE = 9
+CELLS = SIZE * SIZE
+VERTICAL = CELLS
+HORIZONTAL = 2 * CELLS
+
+
+def encode_pawn_move(location, size=SIZE):
+    """
+    Encodes a pawn move.
+    :param location: Tuple representing the square the pawn moves to.
+    :param size: Number of squares along a side of the board.
+    :return: Returns the move code.
+    """
+    return location[1] * size + location[0]
+
+
+def encode_fence(fence, location, size=SIZE):
+    """
+    Encodes a fence placement.
+    :param fence: String 'v' or 'h' representing the type of fence.
+    :param location: Tuple representing where the fence is placed.
+    :param size: Number of squares along a side of the board.
+    :return: Returns the move code.
+    """
+    offset = size * size if fence == 'v' else 2 * size * size
+    return offset + location[1] * size + location[0]
+
+
+def decode_move(move, size=SIZE):
+    """
+    Decodes a move code.
+    :param move: Integer move code.
+    :param size: Number of squares along a side of the board.
+    :return: Returns a tuple of the move type ('p' for a pawn move, 'v' or 'h' for a fence) and the location tuple.
+    """
+    cells = size * size
+    if move < cells:
+        kind = 'p'
+    elif move < 2 * cells:
+        kind = 'v'
+        move -= cells
+    else:
+        kind = 'h'
+        move -= 2 * cells
+
+    return kind, (move % size, move // size)
@@ -0,0 +1,192 @@
+# Description: Perft for Quoridor: counts the move sequences of a given length from a position, as chess engines do to
+# check and time their move generators. The count is one number to compare across versions of the rules engine, and
+# nodes per second is one number for how fast it generates moves.
+import argparse
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from Moves import decode_move
+from Quoridor import QuoridorGame
+
+# each entry is a key word and a data word holding the count above the depth byte
+_BYTES_PER_ENTRY = 16
+
+
+class PerftTable:
+    """
+        This class caches subtree counts by position key and depth in a preallocated array of 64 bit words, so its
+        memory use is fixed when it is created. Each key has one slot and a new count always replaces the old one.
+    """
+
+    def __init__(self, megabytes=16):
+        """
+        Creates an empty table.
+        :param megabytes: The most memory the table may use. The number of entries is rounded down to a power of two.
+        """
+        entries = 1
+        while entries * 2 * _BYTES_PER_ENTRY <= megabytes * 1024 * 1024:
+            entries *= 2
+
+        self._mask = entries - 1
+        self._table = array('Q', bytes(entries * _BYTES_PER_ENTRY))
+        self._hits = 0
+
+    def probe(self, key, depth):
+        """
+        Looks up the count of a subtree.
+        :param key: The position's Zobrist key.
+        :param depth: Depth of the subtree.
+        :return: Returns the count, or None if it isn't stored.
+        """
+        index = (key & self._mask) * 2
+        data = self._table[index + 1]
+        if self._table[index] != key or data & 0xFF != depth:
+            return None
+
+        self._hits += 1
+        return data >> 8
+
+    def store(self, key, depth, count):
+        """Stores the count of a subtree."""
+        index = (key & self._mask) * 2
+        self._table[index] = key
+        self._table[index + 1] = count << 8 | depth
+
+    def get_hits(self):
+        """Returns the number of probes that found a count."""
+        return self._hits
+
+
+def perft(game, depth, table=None):
+    """
+    Counts the sequences of depth legal moves from the game's position. Games that are won before the last move don't
+    count. The game is left as it was.
+    :param game: The QuoridorGame to count from, which must be on a BitBoard.
+    :param depth: Number of moves in each sequence, at least 0.
+    :param table: PerftTable to cache subtree counts in, or None to count every subtree.
+    :return: Returns the count.
+    """
+    if depth < 0:
+        raise ValueError("perft depth must be at least 0")
+    if depth == 0:
+        return 1
+
+    moves = game.legal_moves()
+    if depth == 1:
+        return len(moves)
+
+    if table is not None:
+        key = game.get_key()
+        count = table.probe(key, depth)
+        if count is not None:
+            return count
+
+    count = 0
+    for move in moves:
+        game.push(move)
+        count += perft(game, depth - 1, table)
+        game.pop()
+
+    if table is not None:
+        table.store(key, depth, count)
+
+    return count
+
+
+# the position worker processes count from, set once per worker
+_root = None
+
+
+def _set_root(game):
+    """Worker initializer: keeps the position to count from."""
+    global _root
+    _root = game
+
+
+def _count_move(move, depth, megabytes):
+    """Worker task: counts the subtree under one root move."""
+    _root.push(move)
+    try:
+        return perft(_root, depth - 1, PerftTable(megabytes) if megabytes else None)
+    finally:
+        _root.pop()
+
+
+def divide(game, depth, megabytes=0, workers=0):
+    """
+    Counts the sequences of depth legal moves from the game's position under each legal move.
+    :param game: The QuoridorGame to count from, which must be on a BitBoard.
+    :param depth: Number of moves in each sequence, at least 1.
+    :param megabytes: Size of the PerftTable, or 0 to count every subtree. Each worker has a table of its own.
+    :param workers: Number of worker processes the root moves are split between, 0 to count in this process.
+    :return: Returns a list of (move code, count) in legal_moves order, whose counts add up to perft(game, depth).
+    """
+    if depth < 1:
+        raise ValueError("divide depth must be at least 1")
+
+    moves = game.legal_moves()
+
+    if not workers:
+        table = PerftTable(megabytes) if megabytes else None
+        counts = []
+        for move in moves:
+            game.push(move)
+            counts.append(perft(game, depth - 1, table))
+            game.pop()
+        return list(zip(moves, counts))
+
+    with ProcessPoolExecutor(workers, initializer=_set_root, initargs=(game,)) as pool:
+        counts = pool.map(_count_move, moves, [depth] * len(moves), [megabytes] * len(moves))
+        return list(zip(moves, counts))
+
+
+def move_name(move, size=9):
+    """Returns a move code as text, 'p4,1' for a pawn move and 'v3,2' or 'h3,2' for a fence."""
+    kind, location = decode_move(move, size)
+    return '%s%d,%d' % (kind, location[0], location[1])
+
+
+def _depth(text):
+    """Argument type of the perft depth, which can't be negative."""
+    depth = int(text)
+    if depth < 0:
+        raise argparse.ArgumentTypeError("depth must be at least 0")
+
+    return depth
+
+
+def main(argv=None):
+    """Command line entry point, prints the count under each root move and the total."""
+    parser = argparse.ArgumentParser(description="Counts the legal move sequences from a Quoridor position.")
+    parser.add_argument('depth', type=_depth)
+    parser.add_argument('--moves', default='', help="comma separated move codes played before counting")
+    parser.add_argument('--size', type=int, default=9)
+    parser.add_argument('--players', type=int, default=2, choices=(2, 4))
+    parser.add_argument('--hash', type=int, default=0, metavar='MB', help="size of the subtree cache, 0 for none")
+    parser.add_argument('--workers', type=int, default=0, help="processes the root moves are split between")
+    parser.add_argument('--total', action='store_true', help="only print the total")
+    args = parser.parse_args(argv)
+
+    game, illegal = QuoridorGame.from_moves([int(move) for move in filter(None, args.moves.split(','))],
+                                            size=args.size, players=args.players)
+    if illegal is not None:
+        parser.error("move %d is illegal" % illegal)
+
+    start = perf_counter()
+    counts = divide(game, args.depth, args.hash, args.workers) if args.depth else []
+    seconds = perf_counter() - start
+    total = sum(count for _, count in counts) if args.depth else 1
+
+    if not args.total:
+        for move, count in counts:
+            print('%-8s %d' % (move_name(move, args.size), count))
+        print()
+    print('nodes %d' % total)
+    print('time %.3fs' % seconds)
+    print('nps %.0f' % (total / seconds if seconds else 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,11 +3,15 @@ class Player:
         This class represents a player of the game Quoridor. The QuoridorGame class will be composed of 2 Player objects
         to represent the two players playing the game.
     """
+    __slots__ = ('_name', '_pieces_left', '_winner')
 
-    def __init__(self, name):
-        """Instantiates a player object with the provided name input."""
+    def __init__(self, name, pieces=10):
+        """
+        Instantiates a player object with the provided name input.
+        :param pieces: Number of fences the player starts with.
+        """
         self._name = name
-        self._pieces_left = 10
+        self._pieces_left = pieces
         self._winner = False
 
     def get_pieces_left(self):
@@ -18,6 +22,14 @@ class Player:
         """Subtracts the number of total pieces by 1 after the player makes a move."""
         self._pieces_left -= 1
 
+    def set_pieces_left(self, pieces):
+        """
+        Sets the number of pieces left to play, used when a move is taken back.
+        :param pieces: Integer representing the number of pieces left.
+        :return: None
+        """
+        self._pieces_left = pieces
+
     def get_name(self):
         """Returns the player's name."""
         return self._name
@@ -2,22 +2,160 @@
 # Date: 8/7/2021
 # Description: This project contains functionality that allows for the playing of a game called Quoridor.
 from Player import Player
-from Board import Board
+from BitBoard import BitBoard
+from Moves import SIZE
+from Zobrist import TURN_KEYS
+from GameState import GameState
 
 
 class QuoridorGame:
     """
         This class represents Quoridor and includes functionality that allows for the game play. It is composed of 2
-        Player objects and a Board object to help organize.
+        Player objects, or 4 in the four player game, and a Board object to help organize.
+
+        In the four player game players 1 and 2 start and finish as in the two player game, player 3 starts on the
+        left edge and has to reach the right edge, and player 4 starts on the right edge and has to reach the left
+        edge. Players take turns in the order 1, 2, 3, 4, the fences are split evenly between them and the first player
+        to reach their goal edge wins.
     """
+    __slots__ = ('_players', '_board', '_size', '_fences', '_turn', '_state', '_history', '_turn_key')
 
-    def __init__(self):
-        """Initializes the start of the game"""
-        self._p1 = Player('P1')
-        self._p2 = Player('P2')
-        self._board = Board(self._p1.get_name(), self._p2.get_name())
+    def __init__(self, board_class=BitBoard, size=SIZE, fences=None, players=2):
+        """
+        Initializes the start of the game
+        :param board_class: The board implementation to play on. BitBoard is used by default, Board is the original
+        list based implementation with the same move_pawn and place_fence rules. Move codes, push and pop, legal move
+        lists, path lengths, keys and states need a BitBoard and raise ValueError on a Board.
+        :param size: Number of squares along a side of the board.
+        :param fences: Number of fences each player starts with, or None to split 20 fences between the players.
+        :param players: Number of players, 2 or 4.
+        """
+        if players not in (2, 4):
+            raise ValueError("Quoridor is played by 2 or 4 players")
+        if fences is None:
+            fences = 20 // players
+
+        self._players = tuple(Player('P%d' % number, fences) for number in range(1, players + 1))
+        names = [pawn.get_name() for pawn in self._players]
+        self._board = board_class(names[0], names[1], size, *names[2:])
+        self._size = size
+        self._fences = fences
         self._turn = 1
         self._state = "UNFINISHED"
+        self._history = []
+        # the side to move part of the Zobrist key, the board keeps the rest
+        self._turn_key = TURN_KEYS[0]
+
+    @classmethod
+    def from_moves(cls, moves, board_class=BitBoard, size=SIZE, fences=None, players=2):
+        """
+        Starts a game and replays a sequence of moves on it (see apply_moves).
+        :param moves: Iterable of move codes (see Moves.py), for example the bytes of a game record.
+        :param board_class: The board implementation to play on.
+        :param size: Number of squares along a side of the board.
+        :param fences: Number of fences each player starts with, or None to split 20 fences between the players.
+        :param players: Number of players, 2 or 4.
+        :return: Returns a tuple of the game and the index of the first illegal move, or None if every move was made.
+        """
+        game = cls(board_class, size, fences, players)
+        return game, game.apply_moves(moves)
+
+    @classmethod
+    def from_state(cls, state, fences=10):
+        """
+        Starts a game on a 9x9 BitBoard in the position of a GameState. The moves that led to it can't be taken back.
+        :param state: The GameState to start from.
+        :param fences: Number of fences each player started with.
+        :return: Returns the game.
+        """
+        game = cls(fences=fences)
+        game._load_state(state)
+        return game
+
+    def _load_state(self, state):
+        """Sets the game up in the position of a GameState and forgets the moves that could be taken back."""
+        self._check_state_game()
+
+        squares, vert_fences, horiz_fences, pieces_left, turn, winner = state.unpack()
+        pawns = self._players
+        self._board.set_position({pawns[0].get_name(): squares[0], pawns[1].get_name(): squares[1]},
+                                 vert_fences, horiz_fences,
+                                 {pawn.get_name(): self._fences - left for pawn, left in zip(pawns, pieces_left)})
+        for number, pawn in enumerate(pawns, 1):
+            pawn.set_pieces_left(pieces_left[number - 1])
+            pawn.set_winner_state(winner == number)
+
+        self._state = "FINISHED" if winner else "UNFINISHED"
+        self._turn = turn
+        self._turn_key = TURN_KEYS[turn - 1]
+        self._history = []
+
+    def _check_bit_board(self, method):
+        """Raises ValueError unless the game is on a BitBoard, which method needs."""
+        if not isinstance(self._board, BitBoard):
+            raise ValueError("%s needs a game on a BitBoard, not %s" % (method, type(self._board).__name__))
+
+    def _check_state_game(self):
+        """Raises ValueError unless the game is one a GameState can hold: a two player game on a 9x9 BitBoard."""
+        if self._size != SIZE or len(self._players) != 2:
+            raise ValueError("game states only hold 9x9 two player games")
+        if not isinstance(self._board, BitBoard):
+            raise ValueError("game states only hold games on a BitBoard, not %s" % type(self._board).__name__)
+
+    def snapshot(self):
+        """
+        Saves the position as bytes: the pawns, fences, fences left, winner, turn and state. The game must be a two
+        player game on a 9x9 BitBoard.
+        :return: Returns the bytes of the position's GameState record.
+        """
+        return self.get_state().to_bytes()
+
+    def restore(self, snapshot):
+        """
+        Puts the game back in a position saved with snapshot. The game must be a two player game on a 9x9 BitBoard,
+        and moves made before can no longer be taken back with pop.
+        :param snapshot: The bytes returned by snapshot.
+        :return: None
+        """
+        self._load_state(GameState(snapshot))
+
+    def clone(self):
+        """
+        Copies the game, including the moves that can be taken back with pop, without going through copy.deepcopy.
+        :return: Returns the copy.
+        """
+        game = QuoridorGame.__new__(QuoridorGame)
+        game._players = tuple(self._clone_player(pawn) for pawn in self._players)
+        game._board = self._board.clone()
+        game._size = self._size
+        game._fences = self._fences
+        game._turn = self._turn
+        game._state = self._state
+        # the undo records are tuples, so the copy can share them
+        game._history = list(self._history)
+        game._turn_key = self._turn_key
+        return game
+
+    @staticmethod
+    def _clone_player(pawn):
+        """Returns a copy of a Player object."""
+        player = Player(pawn.get_name(), 0)
+        player.set_pieces_left(pawn.get_pieces_left())
+        player.set_winner_state(pawn.get_winner_state())
+        return player
+
+    def get_state(self):
+        """
+        Returns the position as a compact GameState. The game must be a two player game on a 9x9 BitBoard.
+        :return: Returns the GameState.
+        """
+        self._check_state_game()
+
+        board = self._board
+        pawns = self._players
+        winner = 1 if pawns[0].get_winner_state() else 2 if pawns[1].get_winner_state() else 0
+        return GameState.pack(tuple(board._locations[pawn.get_name()] for pawn in pawns), *board.get_fences(),
+                              tuple(pawn.get_pieces_left() for pawn in pawns), self._turn, winner)
 
     def print_board(self):
         """returns the current state of the board"""
@@ -30,18 +168,20 @@ class QuoridorGame:
         :param player: Integer representing the player to retrieve.
         :return: Returns the player object based on the provided input.
         """
-        if player == 1:
-            return self._p1
-
-        elif player == 2:
-            return self._p2
+        if 1 <= player <= len(self._players):
+            return self._players[player - 1]
 
         return None
 
+    def get_player_count(self):
+        """Returns the number of players, 2 or 4."""
+        return len(self._players)
+
     def move_pawn(self, player, location):
         """
         This method allows a player to move or not move their pawn.
-        @param player: This is a numerical value 1 or 2 representing the player making the move.
+        @param player: This is a numerical value 1 or 2 (up to 4 in the four player game) representing the player making
+        the move.
         @param location: Needs to be a tuple value representing the square the player wants to move the piece.
         @return: False if the move is forbidden, blocked by a fence, or the game has already been won. True if the move
         was successful, or if the move makes the player win.
@@ -60,15 +200,17 @@ class QuoridorGame:
             if winning_state:
                 self._state = "FINISHED"
 
-            # if the move was successful, make it the other player's turn
-            self._turn = 2 if player == 1 else 1
+            # if the move was successful, make it the next player's turn
+            self._turn = player % len(self._players) + 1
+            self._turn_key = TURN_KEYS[player % len(self._players)]
             return True
 
         return False
 
     def place_fence(self, player, fence, location):
         """
-        @param player: This is a numerical value 1 or 2 representing the player making the move.
+        @param player: This is a numerical value 1 or 2 (up to 4 in the four player game) representing the player making
+        the move.
         @param fence: This is a string value 'v' or 'h' to represent the type of fence to be placed.
         @param location: This is a tuple value representing the square the player wants to place the fence.
         @return:
@@ -81,12 +223,154 @@ class QuoridorGame:
         result = self._board.place_fence(pawn, fence, location)
 
         if result:
-            # if the move was successful, make it the other player's turn
-            self._turn = 2 if player == 1 else 1
+            # if the move was successful, make it the next player's turn
+            self._turn = player % len(self._players) + 1
+            self._turn_key = TURN_KEYS[player % len(self._players)]
             return True
 
         return False
 
+    def apply_moves(self, moves):
+        """
+        Validates and makes a sequence of moves, each for the player whose turn it is, with the same rules as move_pawn
+        and place_fence but without their per call overhead. Replaying stops at the first move that is illegal or
+        comes after the game was won. Like move_pawn and place_fence, the moves can't be taken back with pop.
+        :param moves: Iterable of move codes (see Moves.py), for example the bytes of a game record.
+        :return: Returns the index of the first illegal move, or None if every move was made.
+        """
+        board = self._board
+        make_move = board.make_move
+        place_fence = board.place_fence
+        pawns = self._players
+        count = len(pawns)
+        size = self._size
+        cells = size * size
+        mover = self._turn - 1
+        finished = self._state == "FINISHED"
+        illegal = None
+
+        for index, move in enumerate(moves):
+            pawn = pawns[mover]
+            if finished or move < 0 or move >= 3 * cells:
+                illegal = index
+                break
+
+            if move < cells:
+                if not make_move(pawn, (move % size, move // size)):
+                    illegal = index
+                    break
+                finished = board.check_win(pawn)
+
+            elif not place_fence(pawn, 'v' if move < 2 * cells else 'h', (move % size, move % cells // size)):
+                illegal = index
+                break
+
+            mover = (mover + 1) % count
+
+        self._turn = mover + 1
+        self._turn_key = TURN_KEYS[mover]
+        if finished:
+            self._state = "FINISHED"
+
+        return illegal
+
+    def get_size(self):
+        """Returns the number of squares along a side of the board."""
+        return self._size
+
+    def get_turn(self):
+        """Returns the number of the player whose turn it is."""
+        return self._turn
+
+    def is_finished(self):
+        """Returns True if a player has won the game, False otherwise."""
+        return self._state == "FINISHED"
+
+    def shortest_path_length(self, player):
+        """
+        Returns the number of steps the player's pawn needs to reach its goal edge, ignoring the other pawns.
+        :param player: Integer representing the player.
+        :return: Returns the length of the shortest path.
+        """
+        self._check_bit_board('shortest_path_length')
+        return self._board.shortest_path_length(self.get_player(player))
+
+    def get_key(self):
+        """
+        Returns the 64 bit Zobrist key of the position: pawn squares, fences, fences left and the side to move.
+        :return: Returns the key as an integer.
+        """
+        self._check_bit_board('get_key')
+        return self._board.get_key() ^ self._turn_key
+
+    def push(self, move):
+        """
+        Makes a move given as a move code for the player whose turn it is, and remembers how to take it back.
+        :param move: Integer move code (see Moves.py).
+        :return: False if the move is not legal or the game has already been won, True otherwise.
+        """
+        self._check_bit_board('push')
+        if self._state == "FINISHED":
+            return False
+
+        pawn = self.get_player(self._turn)
+        winner = pawn.get_winner_state()
+        record = self._board.make(pawn, move)
+
+        if record is None:
+            return False
+
+        self._history.append((record, self._turn, winner, self._state))
+
+        if move < self._size * self._size and self._board.check_win(pawn):
+            self._state = "FINISHED"
+
+        turn = self._turn % len(self._players)
+        self._turn = turn + 1
+        self._turn_key = TURN_KEYS[turn]
+        return True
+
+    def pop(self):
+        """
+        Takes back the last move made with push. Moves made with move_pawn or place_fence can't be taken back.
+        :return: Returns the move code that was taken back, or None if there is nothing to take back.
+        """
+        if not self._history:
+            return None
+
+        record, turn, winner, state = self._history.pop()
+        pawn = self.get_player(turn)
+        self._board.unmake(pawn, record)
+        pawn.set_winner_state(winner)
+        self._turn = turn
+        self._turn_key = TURN_KEYS[turn - 1]
+        self._state = state
+
+        return record[0]
+
+    def legal_moves(self):
+        """
+        Lists every legal move for the player whose turn it is.
+        :return: Returns a list of move codes (see Moves.py), which is empty once the game is finished.
+        """
+        self._check_bit_board('legal_moves')
+        if self._state == "FINISHED":
+            return []
+
+        pawn = self.get_player(self._turn)
+        return self._board.legal_pawn_moves(pawn) + self._board.legal_fence_placements(pawn)
+
+    def legal_pawn_moves(self):
+        """
+        Lists the legal pawn moves for the player whose turn it is, which is cheaper than listing every move.
+        :return: Returns a list of pawn move codes, which is empty once the game is finished.
+        """
+        self._check_bit_board('legal_pawn_moves')
+        if self._state == "FINISHED":
+            return []
+
+        return self._board.legal_pawn_moves(self.get_player(self._turn))
+
     def is_winner(self, player):
         """
         Checks to see if the provided player has won!
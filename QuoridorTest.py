@@ -1,5 +1,35 @@
-import unittest, Player, Board
+import unittest, copy, random, Player, Board
 from Quoridor import QuoridorGame
+from BitBoard import BitBoard
+from GameState import GameState
+from Moves import decode_move, VERTICAL
+from Engine import QuoridorEngine
+from MCTS import MCTSEngine
+try:
+    import numpy
+    from BatchGame import BatchQuoridorGame
+    from BatchEvaluator import BatchEvaluator, encode
+    import SelfPlay
+except ImportError:
+    numpy = None
+import Tournament
+import Benchmark
+import Instrumentation
+import Fuzz
+import Perft
+import os, sys, tempfile, asyncio, json
+from concurrent.futures import ThreadPoolExecutor
+import Server
+from Server import GameServer
+from GameRecord import GameRecordWriter, GameRecordReader, read_games
+from TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER
+
+# a game with 11 fences each whose last move jumps P1 from (8, 6) over P2 and across the fence on top of (8, 5), into a
+# pocket with no way out to its goal row
+SEALING_JUMP = [13, 77, 185, 130, 95, 76, 161, 125, 4, 121, 216, 77, 3, 78, 205, 230, 12, 208, 11, 101, 220, 191, 206,
+                143, 215, 69, 12, 142, 232, 60, 13, 69, 22, 176, 31, 70, 22, 113, 120, 69, 146, 78, 23, 69, 24, 70, 33,
+                71, 24, 70, 33, 79, 34, 70, 25, 71, 24, 70, 23, 71, 24, 80, 33, 71, 34, 62, 35, 71, 34, 62, 35, 53, 26,
+                62, 35, 71, 34, 62, 35, 71, 34, 80, 35, 71, 34, 70, 33, 79, 42, 70, 51, 71, 52, 80, 53, 71, 62, 53, 44]
 
 
 class MyTestCase(unittest.TestCase):
@@ -254,8 +284,9 @@ class MyTestCase(unittest.TestCase):
         q.place_fence(1, 'h', (7, 1))
         q.place_fence(2, 'h', (1, 2))
 
-        q.place_fence(1, 'h', (8, 1))
-        q.place_fence(2, 'h', (0, 2))
+        # the rows are left open at one end, a fence that closes a pawn in is not allowed
+        q.place_fence(1, 'h', (8, 3))
+        q.place_fence(2, 'h', (0, 6))
 
         q.place_fence(1, 'h', (5, 5))
         q.place_fence(2, 'h', (6, 5))
@@ -542,5 +573,1211 @@ class MyTestCase(unittest.TestCase):
         self.assertFalse(wrong_right_diagonal_move)
 
 
+    def test_reference_board_same_results(self):
+        """Test that BitBoard and the list based Board accept and reject the same moves"""
+        rng = random.Random(1)
+        fast = QuoridorGame()
+        reference = QuoridorGame(Board.Board)
+
+        for _ in range(2000):
+            player = fast._turn
+            location = (rng.randint(0, 8), rng.randint(0, 8))
+            if rng.random() < 0.2:
+                fence = rng.choice('vh')
+                result = fast.place_fence(player, fence, location)
+                self.assertEqual(reference.place_fence(player, fence, location), result)
+            else:
+                result = fast.move_pawn(player, location)
+                self.assertEqual(reference.move_pawn(player, location), result)
+
+        self.assertEqual(reference._board.get_board(), fast._board.get_board())
+
+    def test_off_board_top_edge(self):
+        """Test that a pawn can't be moved above the first row"""
+        q = QuoridorGame()
+        result = q.move_pawn(1, (4, -1))
+
+        self.assertFalse(result)
+        self.assertEqual((4, 0), q._board.get_current_location('P1'))
+
+    def test_board_grid_follows_moves(self):
+        """Test that the grid returned by get_board is rebuilt from the pawn locations after a move"""
+        q = QuoridorGame(Board.Board)
+        before = q._board.get_board()
+        q.move_pawn(1, (4, 1))
+        after = q._board.get_board()
+
+        self.assertEqual('P1', before[0][4])
+        self.assertEqual(" ", after[0][4])
+        self.assertEqual('P1', after[1][4])
+        self.assertEqual((4, 1), q._board.get_current_location('P1'))
+
+    def test_legal_moves_match_trial_moves(self):
+        """Test that legal_moves lists exactly the moves move_pawn and place_fence accept"""
+        rng = random.Random(2)
+        q = QuoridorGame()
+
+        for _ in range(120):
+            player = q._turn
+            expected = []
+            for y in range(9):
+                for x in range(9):
+                    trial = copy.deepcopy(q)
+                    if trial.move_pawn(player, (x, y)):
+                        expected.append(('p', (x, y)))
+                    for fence in 'vh':
+                        trial = copy.deepcopy(q)
+                        if trial.place_fence(player, fence, (x, y)):
+                            expected.append((fence, (x, y)))
+
+            legal = [decode_move(move) for move in q.legal_moves()]
+            self.assertEqual(sorted(expected), sorted(legal))
+            if not legal:
+                break
+
+            pawn_moves = [move for move in legal if move[0] == 'p']
+            kind, location = rng.choice(pawn_moves if pawn_moves and rng.random() < 0.7 else legal)
+            if kind == 'p':
+                q.move_pawn(player, location)
+            else:
+                q.place_fence(player, kind, location)
+
+    def test_push_pop_restores_game(self):
+        """Test that popping every pushed move gives back the starting position"""
+        rng = random.Random(3)
+        q = QuoridorGame()
+        q.move_pawn(1, (4, 1))
+        # fills in the legal fence mask, so it is compared too
+        q.legal_moves()
+        start = copy.deepcopy(q)
+        pushed = []
+
+        while len(pushed) < 200:
+            legal = q.legal_moves()
+            if not legal:
+                break
+            move = rng.choice(legal)
+            self.assertTrue(q.push(move))
+            pushed.append(move)
+
+        for move in reversed(pushed):
+            self.assertEqual(move, q.pop())
+
+        self.assertIsNone(q.pop())
+        for before, after in ((start._board, q._board), *zip(start._players, q._players)):
+            for slot in before.__slots__:
+                self.assertEqual(getattr(before, slot), getattr(after, slot))
+        self.assertEqual((start._turn, start._state), (q._turn, q._state))
+
+    def test_push_out_of_range_codes(self):
+        """Test that move codes below 0 or past the last fence are turned down"""
+        q = QuoridorGame()
+        key = q.get_key()
+        for move in (-1, -68, -150, 243, 1000):
+            self.assertFalse(q.push(move))
+
+        self.assertEqual(key, q.get_key())
+        self.assertEqual((1, (4, 0)), (q.get_turn(), q._board.get_current_location('P1')))
+        self.assertIsNone(q.pop())
+
+    def test_pop_after_win(self):
+        """Test that taking back the winning move lets the game continue"""
+        q = QuoridorGame()
+        for y in range(1, 8):
+            q.move_pawn(1, (4, y))
+            q.move_pawn(2, (3 if y % 2 else 4, 8))
+
+        q.push(4 + 8 * 9)
+        self.assertTrue(q.is_winner(1))
+
+        q.pop()
+        self.assertFalse(q.is_winner(1))
+        self.assertTrue(q.move_pawn(1, (3, 7)))
+
+    def test_fence_cannot_seal_pawn(self):
+        """Test that a fence which cuts a pawn off from its goal row is not allowed"""
+        q = QuoridorGame()
+        for x in range(8):
+            q.place_fence(q._turn, 'h', (x, 4))
+
+        self.assertFalse(q.place_fence(1, 'h', (8, 4)))
+        self.assertEqual(6, q.get_player(1).get_pieces_left())
+        self.assertTrue(q.place_fence(1, 'v', (8, 4)))
+
+        reference = QuoridorGame(Board.Board)
+        for x in range(8):
+            reference.place_fence(reference._turn, 'h', (x, 4))
+        self.assertFalse(reference.place_fence(1, 'h', (8, 4)))
+
+    def test_jump_cannot_seal_pawn(self):
+        """Test that a jump across a fence into a pocket cut off from the goal row is not allowed"""
+        for board_class in (BitBoard, Board.Board):
+            q, illegal = QuoridorGame.from_moves(SEALING_JUMP, board_class, fences=11)
+            self.assertEqual(len(SEALING_JUMP) - 1, illegal)
+            self.assertEqual((8, 6), q._board.get_current_location('P1'))
+
+        q, _ = QuoridorGame.from_moves(SEALING_JUMP[:-1], fences=11)
+        self.assertNotIn(SEALING_JUMP[-1], q.legal_pawn_moves())
+        self.assertFalse(q.push(SEALING_JUMP[-1]))
+        self.assertEqual(2, q.shortest_path_length(1))
+
+    def test_shortest_path_length(self):
+        """Test that the path lengths follow fences placed and taken back"""
+        rng = random.Random(4)
+        q = QuoridorGame()
+        board = q._board
+        self.assertEqual(8, board.shortest_path_length(q.get_player(1)))
+
+        for _ in range(60):
+            legal = q.legal_moves()
+            if not legal:
+                break
+            q.push(rng.choice(legal))
+            if rng.random() < 0.3:
+                q.pop()
+
+            for pawn, goal in board._goals.items():
+                self.assertEqual(board._distance_map(goal), board._distances[pawn])
+
+    def test_zobrist_key_follows_moves(self):
+        """Test that the incrementally updated key matches a key computed from scratch"""
+        rng = random.Random(5)
+        q = QuoridorGame()
+        keys = [q.get_key()]
+
+        for _ in range(80):
+            legal = q.legal_moves()
+            if not legal:
+                break
+            q.push(rng.choice(legal))
+            keys.append(q.get_key())
+            self.assertEqual(q._board.compute_key(), q._board.get_key())
+
+        while q.pop() is not None:
+            keys.pop()
+            self.assertEqual(keys[-1], q.get_key())
+
+    def test_zobrist_key_transposition(self):
+        """Test that the same position reached in a different order has the same key"""
+        first = QuoridorGame()
+        first.place_fence(1, 'h', (2, 3))
+        first.place_fence(2, 'v', (5, 5))
+        first.move_pawn(1, (4, 1))
+
+        second = QuoridorGame()
+        second.move_pawn(1, (4, 1))
+        second.place_fence(2, 'v', (5, 5))
+        second.place_fence(1, 'h', (2, 3))
+
+        self.assertEqual(first.get_key(), second.get_key())
+        self.assertNotEqual(QuoridorGame().get_key(), first.get_key())
+
+    def test_apply_moves(self):
+        """Test that replaying move codes matches playing them one call at a time"""
+        for moves in Benchmark.random_games(5, 11):
+            for board_class in (Board.Board, BitBoard):
+                game, illegal = QuoridorGame.from_moves(moves, board_class)
+                expected = QuoridorGame(board_class)
+                for move in moves:
+                    kind, location = decode_move(move)
+                    if kind == 'p':
+                        expected.move_pawn(expected.get_turn(), location)
+                    else:
+                        expected.place_fence(expected.get_turn(), kind, location)
+
+                self.assertIsNone(illegal)
+                self.assertEqual(expected.get_turn(), game.get_turn())
+                self.assertEqual(expected.is_finished(), game.is_finished())
+                self.assertEqual(expected.get_player(1).get_pieces_left(), game.get_player(1).get_pieces_left())
+                self.assertEqual(expected._board.get_board(), game._board.get_board())
+                if board_class is BitBoard:
+                    self.assertEqual(expected.get_key(), game.get_key())
+
+    def test_game_state_round_trip(self):
+        """Test that a game rebuilt from its compact state plays on the same as the original"""
+        for moves in Benchmark.random_games(5, 13):
+            for length in (0, len(moves) // 2, len(moves)):
+                game, illegal = QuoridorGame.from_moves(moves[:length])
+                state = game.get_state()
+                copy_game = QuoridorGame.from_state(GameState(state.to_bytes()))
+
+                self.assertEqual(28, len(state.to_bytes()))
+                self.assertEqual(state, copy_game.get_state())
+                self.assertEqual(game.get_key(), copy_game.get_key())
+                self.assertEqual(game.is_finished(), copy_game.is_finished())
+                self.assertEqual(game.legal_moves(), copy_game.legal_moves())
+                self.assertEqual(game._board.get_board(), copy_game._board.get_board())
+                self.assertEqual(game._board.get_current_location('P2'), state.get_location(2))
+
+    def test_snapshot_restore_and_clone(self):
+        """Test that snapshots and clones carry the whole position"""
+        moves = Benchmark.random_games(1, 17)[0]
+        game, illegal = QuoridorGame.from_moves(moves)
+        self.assertTrue(game.is_finished())
+
+        restored = QuoridorGame()
+        restored.move_pawn(1, (4, 1))
+        restored.restore(game.snapshot())
+        self.assertEqual(game.get_state(), restored.get_state())
+        self.assertEqual(game.get_key(), restored.get_key())
+        self.assertEqual(game.is_winner(1), restored.is_winner(1))
+        self.assertEqual(game.is_winner(2), restored.is_winner(2))
+        self.assertIsNone(restored.pop())
+
+        # a clone can take back moves and doesn't share them with the original
+        game = QuoridorGame()
+        for move in moves[:10]:
+            game.push(move)
+        clone = game.clone()
+        self.assertEqual(game.get_key(), clone.get_key())
+        clone.pop()
+        other = clone.legal_moves()[-1]
+        clone.push(other)
+        self.assertNotEqual(game.get_key(), clone.get_key())
+
+        self.assertEqual(moves[9], game.pop())
+        self.assertEqual(other, clone.pop())
+        self.assertEqual(game.get_state(), clone.get_state())
+        self.assertEqual(game.get_key(), clone.get_key())
+
+    def test_snapshot_needs_bit_board(self):
+        """Test that states of a game on the list based Board are turned down with a clear error"""
+        game = QuoridorGame(Board.Board)
+        snapshot = QuoridorGame().snapshot()
+        for call, args in ((game.snapshot, ()), (game.get_state, ()), (game.restore, (snapshot,))):
+            with self.assertRaisesRegex(ValueError, 'BitBoard'):
+                call(*args)
+
+        self.assertEqual((4, 0), game._board.get_current_location('P1'))
+        self.assertTrue(game.clone().move_pawn(1, (4, 1)))
+
+    def test_move_codes_need_bit_board(self):
+        """Test that the move code methods turn a game on the list based Board down with a clear error"""
+        game = QuoridorGame(Board.Board)
+        for call, args in ((game.push, (13,)), (game.legal_moves, ()), (game.legal_pawn_moves, ()),
+                           (game.shortest_path_length, (1,)), (game.get_key, ())):
+            with self.assertRaisesRegex(ValueError, 'BitBoard'):
+                call(*args)
+
+        self.assertIsNone(game.pop())
+        self.assertTrue(game.move_pawn(1, (4, 1)))
+
+    def test_apply_moves_stops_at_illegal_move(self):
+        """Test that replaying stops at the first illegal move"""
+        game = QuoridorGame()
+        # P1 moves down, P2 moves left, then P1 tries to move to the square it is on
+        self.assertEqual(2, game.apply_moves([13, 75, 13]))
+        self.assertEqual(1, game.get_turn())
+        self.assertEqual((4, 1), game._board.get_current_location('P1'))
+        self.assertEqual(1, game.apply_moves([14, 300]))
+        self.assertEqual(0, QuoridorGame().apply_moves([4]))
+
+
+class LegalFenceTest(unittest.TestCase):
+    def brute_force(self, board):
+        """Tests every free slot for a seal"""
+        geo = board.get_geometry()
+        vert, horiz = board.get_fences()
+        mask = 0
+        for sq in range(geo.cells):
+            if geo.vert_slots >> sq & 1 and not vert >> sq & 1 and not board._seals('v', sq):
+                mask |= 1 << sq
+            if geo.horiz_slots >> sq & 1 and not horiz >> sq & 1 and not board._seals('h', sq):
+                mask |= 1 << (geo.cells + sq)
+        return mask
+
+    def test_mask_matches_every_slot_tested(self):
+        for size, players, seed in ((9, 2, 1), (9, 2, 2), (5, 4, 3), (7, 2, 4)):
+            rng = random.Random(seed)
+            game = QuoridorGame(size=size, fences=size * 2, players=players)
+            board = game._board
+            while game.legal_moves():
+                self.assertEqual(self.brute_force(board), board.legal_fence_mask())
+                fences = [move for move in game.legal_moves() if move >= size * size]
+                game.push(rng.choice(fences if fences and rng.random() < 0.7 else game.legal_moves()))
+                if rng.random() < 0.2:
+                    game.pop()
+                    self.assertEqual(self.brute_force(board), board.legal_fence_mask())
+
+    def test_sealing_fence_is_turned_down(self):
+        game = QuoridorGame(size=5)
+        board = game._board
+        # walls P2's side off except for the gap at x = 4
+        for player, location in ((1, (0, 3)), (2, (1, 3)), (1, (2, 3)), (2, (3, 3))):
+            self.assertTrue(game.place_fence(player, 'h', location))
+
+        cells = 25
+        self.assertFalse(board.legal_fence_mask() >> (cells + 3 * 5 + 4) & 1)
+        self.assertNotIn(2 * cells + 3 * 5 + 4, game.legal_moves())
+        self.assertFalse(game.place_fence(1, 'h', (4, 3)))
+        self.assertEqual(8, game.get_player(1).get_pieces_left())
+
+
+    def test_pawn_already_cut_off(self):
+        """Test that a position set up with a pawn in a sealed pocket lists its moves instead of hanging"""
+        game, _ = QuoridorGame.from_moves(SEALING_JUMP[:-1], fences=11)
+        squares, vert, horiz, pieces_left, _, _ = game.get_state().unpack()
+        game.restore(GameState.pack((SEALING_JUMP[-1], squares[1]), vert, horiz, pieces_left, 2, 0).to_bytes())
+        board = game._board
+        self.assertEqual(board.get_geometry().inf, game.shortest_path_length(1))
+
+        # every fence keeps P1 cut off, so none can be placed
+        self.assertEqual(self.brute_force(board), board.legal_fence_mask())
+        self.assertEqual(0, board.legal_fence_mask())
+        self.assertEqual(sorted(game.legal_pawn_moves()), sorted(game.legal_moves()))
+
+
+class BoardSizeTest(unittest.TestCase):
+    def play_random(self, size, fences, seed):
+        """Plays a random game on both boards, checking they agree, and returns the BitBoard game"""
+        rng = random.Random(seed)
+        game = QuoridorGame(size=size, fences=fences)
+        reference = QuoridorGame(board_class=Board.Board, size=size, fences=fences)
+        cells = size * size
+        while not game.is_finished():
+            # any move code, legal or not, gets the same answer from both boards
+            turn = game.get_turn()
+            move = rng.choice(game.legal_moves()) if rng.random() < 0.7 else rng.randrange(3 * cells)
+            kind, location = decode_move(move, size)
+            if kind == 'p':
+                expected = reference.move_pawn(turn, location)
+            else:
+                expected = reference.place_fence(turn, kind, location)
+            self.assertEqual(expected, game.push(move))
+        self.assertTrue(reference.is_winner(game.get_turn() ^ 3))
+        return game
+
+    def test_small_and_large_boards(self):
+        for size, fences in ((5, 3), (7, 6), (13, 20), (17, 30)):
+            with self.subTest(size=size):
+                game = self.play_random(size, fences, size)
+                self.assertEqual(size, game.get_size())
+                self.assertTrue(game.is_finished())
+                key = game.get_key()
+                while game.pop() is not None:
+                    pass
+                self.assertEqual(QuoridorGame(size=size, fences=fences).get_key(), game.get_key())
+                self.assertNotEqual(key, game.get_key())
+                self.assertEqual(fences, game.get_player(1).get_pieces_left())
+
+    def test_pawns_start_in_the_middle(self):
+        game = QuoridorGame(size=5)
+        self.assertEqual((2, 0), game._board.get_current_location('P1'))
+        self.assertEqual((2, 4), game._board.get_current_location('P2'))
+        self.assertFalse(game.move_pawn(1, (2, 5)))
+        self.assertTrue(game.place_fence(1, 'h', (2, 4)))
+        self.assertFalse(game.place_fence(2, 'v', (5, 0)))
+
+    def test_nine_by_nine_only_features(self):
+        game = QuoridorGame(size=5)
+        self.assertRaises(ValueError, game.get_state)
+        self.assertRaises(ValueError, QuoridorEngine(1).best_move, QuoridorGame(size=11), 1)
+        self.assertIn(QuoridorEngine(1).best_move(game, depth=2), game.legal_moves())
+
+
+class FourPlayerTest(unittest.TestCase):
+    def test_start_and_turn_order(self):
+        game = QuoridorGame(players=4)
+        self.assertEqual(4, game.get_player_count())
+        self.assertEqual([(4, 0), (4, 8), (0, 4), (8, 4)],
+                         [game._board.get_current_location('P%d' % player) for player in range(1, 5)])
+        self.assertEqual([5] * 4, [game.get_player(player).get_pieces_left() for player in range(1, 5)])
+
+        keys = set()
+        for player, location in ((1, (4, 1)), (2, (4, 7)), (3, (1, 4)), (4, (7, 4))):
+            self.assertFalse(game.move_pawn(player % 4 + 1, location))
+            keys.add(game.get_key())
+            self.assertTrue(game.move_pawn(player, location))
+        self.assertEqual(1, game.get_turn())
+        self.assertEqual(4, len(keys))
+        self.assertEqual(1, game.shortest_path_length(4) - 6)
+        self.assertRaises(ValueError, game.get_state)
+        self.assertRaises(ValueError, QuoridorGame, players=3)
+
+    def test_jump_onto_a_pawn(self):
+        for board_class in (BitBoard, Board.Board):
+            game = QuoridorGame(board_class, size=5, players=4)
+            for player, kind, location in ((1, 'p', (2, 1)), (2, 'p', (2, 3)), (3, 'p', (1, 2)), (4, 'p', (3, 2)),
+                                           (1, 'p', (2, 2)), (2, 'h', (0, 4)), (3, 'p', (1, 1)), (4, 'h', (4, 4)),
+                                           (1, 'v', (1, 0)), (2, 'h', (1, 4)), (3, 'p', (2, 1)), (4, 'h', (3, 1)),
+                                           (1, 'v', (4, 0))):
+                if kind == 'p':
+                    self.assertTrue(game.move_pawn(player, location))
+                else:
+                    self.assertTrue(game.place_fence(player, kind, location))
+
+            # P3, P1 and P2 stand in a column, so P2 can't jump P1 onto P3
+            self.assertFalse(game.clone().move_pawn(2, (2, 1)))
+            if board_class is BitBoard:
+                self.assertEqual([22, 16, 18], game.legal_pawn_moves())
+
+    def test_boards_agree_and_side_players_win(self):
+        winners = set()
+        for seed in range(12):
+            rng = random.Random(seed)
+            game = QuoridorGame(size=5, players=4)
+            reference = QuoridorGame(Board.Board, size=5, players=4)
+            while game.legal_moves():
+                turn = game.get_turn()
+                move = rng.choice(game.legal_moves()) if rng.random() < 0.8 else rng.randrange(75)
+                kind, location = decode_move(move, 5)
+                if kind == 'p':
+                    expected = reference.move_pawn(turn, location)
+                else:
+                    expected = reference.place_fence(turn, kind, location)
+                self.assertEqual(expected, game.push(move))
+
+            if not game.is_finished():
+                # a pawn boxed in by the others with no fences left has no move
+                continue
+            winner = (game.get_turn() - 2) % 4 + 1
+            self.assertTrue(game.is_winner(winner))
+            self.assertTrue(reference.is_winner(winner))
+            self.assertEqual(0, game.shortest_path_length(winner))
+            winners.add(winner)
+
+            while game.pop() is not None:
+                pass
+            self.assertEqual(QuoridorGame(size=5, players=4).get_key(), game.get_key())
+        self.assertTrue(winners & {3, 4})
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_store_and_probe(self):
+        table = TranspositionTable(1)
+        table.store(12345, 170, LOWER, 6, -250)
+
+        self.assertEqual((170, LOWER, 6, -250), table.probe(12345))
+        self.assertIsNone(table.probe(54321))
+        self.assertEqual(1, table.get_stats()['hits'])
+        self.assertEqual(1, table.get_stats()['misses'])
+
+    def test_memory_cap(self):
+        table = TranspositionTable(2)
+        self.assertLessEqual(table.get_stats()['bytes'], 2 * 1024 * 1024)
+        self.assertGreater(table.get_stats()['bytes'], 1024 * 1024)
+
+    def test_depth_preferred_replacement(self):
+        table = TranspositionTable(1)
+        buckets = table.get_stats()['buckets']
+        deep, shallow, newer = 7, 7 + buckets, 7 + 2 * buckets
+
+        table.store(deep, 1, EXACT, 9, 10)
+        table.store(shallow, 2, EXACT, 2, 20)
+        table.store(newer, 3, UPPER, 1, 30)
+
+        self.assertEqual(1, table.probe(deep)[0])
+        self.assertIsNone(table.probe(shallow))
+        self.assertEqual(3, table.probe(newer)[0])
+        self.assertEqual(1, table.get_stats()['collisions'])
+
+        table.new_search()
+        table.store(shallow, 2, EXACT, 2, 20)
+        self.assertEqual(2, table.probe(shallow)[0])
+        self.assertIsNone(table.probe(deep))
+
+        table.clear()
+        self.assertIsNone(table.probe(shallow))
+
+
+class EngineTest(unittest.TestCase):
+    def test_takes_winning_move(self):
+        q = QuoridorGame()
+        for y in range(1, 8):
+            q.move_pawn(1, (4, y))
+            q.move_pawn(2, (3 if y % 2 else 4, 8))
+
+        engine = QuoridorEngine(1)
+        self.assertEqual(4 + 8 * 9, engine.best_move(q, depth=3))
+
+    def test_search_leaves_game_unchanged(self):
+        q = QuoridorGame()
+        q.move_pawn(1, (4, 1))
+        q.place_fence(2, 'h', (4, 2))
+        key = q.get_key()
+
+        QuoridorEngine(1).best_move(q, depth=2)
+
+        self.assertEqual(key, q.get_key())
+        self.assertEqual([], q._history)
+        self.assertEqual(9, q.get_player(2).get_pieces_left())
+
+    def test_time_budget(self):
+        engine = QuoridorEngine(1)
+        move = engine.best_move(QuoridorGame(), time_ms=100)
+
+        self.assertIn(move, QuoridorGame().legal_moves())
+        self.assertLess(engine.get_info()['time_ms'], 200)
+
+    def test_clear_empties_the_table_in_place(self):
+        engine = QuoridorEngine(table_megabytes=1)
+        engine.best_move(QuoridorGame(), depth=2)
+        table = engine._table._table
+        self.assertTrue(any(table))
+
+        engine.clear()
+        self.assertIs(table, engine._table._table)
+        self.assertFalse(any(table))
+        self.assertEqual(0, engine._table.get_stats()['stores'])
+
+
+class MCTSTest(unittest.TestCase):
+    def test_takes_winning_move(self):
+        q = QuoridorGame()
+        for y in range(1, 8):
+            q.move_pawn(1, (4, y))
+            q.move_pawn(2, (3 if y % 2 else 4, 8))
+
+        engine = MCTSEngine(selection='puct')
+        self.assertEqual(4 + 8 * 9, engine.best_move(q, playouts=300))
+
+    def test_search_leaves_game_unchanged(self):
+        q = QuoridorGame()
+        key = q.get_key()
+        engine = MCTSEngine()
+        move = engine.best_move(q, playouts=50)
+
+        self.assertIn(move, q.legal_moves())
+        self.assertEqual(key, q.get_key())
+        self.assertEqual(50, engine.get_info()['playouts'])
+
+    def test_process_pool(self):
+        q = QuoridorGame()
+        for parallelism in ('root', 'tree'):
+            with MCTSEngine(workers=2, parallelism=parallelism) as engine:
+                move = engine.best_move(q, playouts=40)
+
+            self.assertIn(move, q.legal_moves())
+            self.assertGreater(engine.get_info()['playouts_per_second'], 0)
+
+
+@unittest.skipIf(numpy is None, "needs numpy")
+class BatchGameTest(unittest.TestCase):
+    def test_matches_quoridor_game(self):
+        """Test that every batched move is accepted or rejected as QuoridorGame does"""
+        rng = numpy.random.default_rng(6)
+        batch = BatchQuoridorGame(32)
+        games = [QuoridorGame() for _ in range(32)]
+
+        for _ in range(150):
+            legal = batch.legal_pawn_moves()
+            for index, game in enumerate(games):
+                self.assertEqual(sorted(game.legal_pawn_moves()), list(numpy.nonzero(legal[index])[0]))
+
+            actions = batch.sample_actions(rng, 0.4)
+            made = batch.step(actions)
+            for index, game in enumerate(games):
+                self.assertEqual(game.push(int(actions[index])), made[index])
+
+        for index, game in enumerate(games):
+            self.assertEqual(game._board.get_current_location('P2'), tuple(batch.get_pawns()[index, 1]))
+            self.assertEqual(game.is_winner(1), batch.get_winner()[index] == 1)
+            self.assertEqual(game.get_player(1).get_pieces_left(), batch.get_fences_left()[index, 0])
+
+    def test_jump_cannot_seal_pawn(self):
+        batch = BatchQuoridorGame(1, fences=11)
+        made = [batch.step([move])[0] for move in SEALING_JUMP]
+
+        self.assertEqual([True] * (len(SEALING_JUMP) - 1) + [False], made)
+
+    def test_reset(self):
+        batch = BatchQuoridorGame(4)
+        batch.step([4 + 9, VERTICAL + 10, 4 + 9, 4 + 9])
+        batch.reset(numpy.array([True, False, False, False]))
+
+        self.assertEqual([1, 2, 2, 2], list(batch.get_turn()))
+        self.assertEqual([10, 9, 10, 10], list(batch.get_fences_left()[:, 0]))
+
+
+@unittest.skipIf(numpy is None, "needs numpy")
+class BatchEvaluatorTest(unittest.TestCase):
+    def positions(self):
+        """Every position of a few random games"""
+        positions = []
+        for moves in Benchmark.random_games(8, 11):
+            game = QuoridorGame()
+            for move in moves:
+                game.push(move)
+                positions.append(game.clone())
+        return positions
+
+    def test_matches_engine_evaluate(self):
+        positions = self.positions()
+        records = encode(positions)
+        self.assertEqual((len(positions), 28), records.shape)
+
+        scores = BatchEvaluator().evaluate(records)
+        engine = QuoridorEngine(1)
+        for game, score in zip(positions, scores):
+            if not game.is_finished():
+                self.assertEqual(engine.evaluate(game), score)
+            else:
+                self.assertEqual(-100000, score)
+
+        features = BatchEvaluator().features(records)
+        for game, row in zip(positions, features):
+            self.assertEqual(game.shortest_path_length(2) - game.shortest_path_length(1), row[0])
+
+    def test_weights_and_point_of_view(self):
+        game = QuoridorGame()
+        game.move_pawn(1, (4, 1))
+        game.place_fence(2, 'h', (4, 1))
+        records = encode([game, game.get_state(), game.snapshot()])
+
+        evaluator = BatchEvaluator(path_weight=0, fence_weight=1, tempo_weight=5, progress_weight=2)
+        self.assertEqual([8.0, 8.0, 8.0], evaluator.evaluate(records, player=1).tolist())
+        self.assertEqual([-8.0] * 3, evaluator.evaluate(records, player=2).tolist())
+        self.assertEqual([8.0] * 3, evaluator.evaluate(records).tolist())
+        self.assertEqual(5, evaluator.get_weights()['tempo'])
+
+
+@unittest.skipIf(numpy is None, "needs numpy")
+class SelfPlayTest(unittest.TestCase):
+    def test_planes_of_start_position(self):
+        game = QuoridorGame()
+        game.place_fence(1, 'h', (4, 1))
+        planes = SelfPlay.planes(encode([QuoridorGame(), game]))
+        self.assertEqual((2, 7, 9, 9), planes.shape)
+
+        self.assertEqual(1, planes[0, 0, 0, 4])
+        self.assertEqual(1, planes[0, 1, 8, 4])
+        self.assertEqual([1, 1, 0, 0, 810, 810, 81], planes[0].sum(axis=(1, 2)).tolist())
+        self.assertEqual(1, planes[1, 2, 1, 4])
+        self.assertEqual([1, 1, 1, 0, 729, 810, 0], planes[1].sum(axis=(1, 2)).tolist())
+
+    def test_shards(self):
+        with tempfile.TemporaryDirectory() as directory:
+            results = []
+            with SelfPlay.ShardWriter(directory, shard_size=30) as writer:
+                written = SelfPlay.self_play(writer, {'engine': 'greedy'}, {'engine': 'random'}, games=3, seed=4,
+                                             on_game=lambda moves, winner: results.append((moves, winner)))
+            self.assertEqual(sum(moves for moves, _ in results), written)
+
+            shards = list(SelfPlay.read_shards(directory))
+            self.assertEqual(-(-written // 30), len(shards))
+            self.assertTrue(all(len(shard['policy']) == 30 for shard in shards[:-1]))
+            self.assertIsInstance(shards[0]['planes'], numpy.memmap)
+
+            # every position of the first game, replayed from its policy targets
+            game = QuoridorGame()
+            moves, winner = results[0]
+            values = numpy.concatenate([shard['value'] for shard in shards])[:moves]
+            policy = numpy.concatenate([shard['policy'] for shard in shards])[:moves]
+            for index, move in enumerate(policy.tolist()):
+                stored = shards[index // 30]['planes'][index % 30]
+                self.assertEqual(SelfPlay.planes(encode([game]))[0].tolist(), stored.tolist())
+                self.assertEqual(1 if game.get_turn() == winner else -1, values[index])
+                self.assertTrue(game.push(move))
+            self.assertTrue(game.is_finished())
+            del shards
+
+            # a writer killed between an array and its header leaves extra bytes behind, which are dropped on resume
+            last = SelfPlay.shard_paths(directory, -(-written // 30) - 1)
+            with open(last['value'], 'ab') as file:
+                file.write(b'\x01\x01\x01')
+            with SelfPlay.ShardWriter(directory, shard_size=30) as writer:
+                more = SelfPlay.self_play(writer, {'engine': 'random'}, games=1, seed=9)
+            self.assertEqual(written + more, sum(len(shard['value']) for shard in SelfPlay.read_shards(directory)))
+            self.assertEqual(written + more, sum(len(shard['planes']) for shard in SelfPlay.read_shards(directory)))
+
+
+class TournamentTest(unittest.TestCase):
+    def test_elo(self):
+        results = Tournament.Results()
+        for score in (1, 1, 1, 0):
+            results.add(score)
+
+        elo, error = results.elo()
+        self.assertAlmostEqual(190.85, elo, 2)
+        self.assertGreater(error, 0)
+
+    def test_sprt_stops_early(self):
+        seen = []
+        summary = Tournament.tournament({'engine': 'greedy'}, {'engine': 'random'}, games=200,
+                                        on_result=lambda result, running: seen.append(result))
+
+        self.assertEqual('H1', summary['verdict'])
+        self.assertLess(summary['games'], 200)
+        self.assertEqual(summary['games'], len(seen))
+
+    def test_process_pool(self):
+        summary = Tournament.tournament({'engine': 'random'}, {'engine': 'greedy'}, games=200, workers=2)
+
+        self.assertEqual('H0', summary['verdict'])
+
+    def test_engine_workers_are_shut_down(self):
+        closed = []
+        close = MCTSEngine.close
+
+        def record_close(engine):
+            closed.append(engine._pool is not None)
+            close(engine)
+
+        MCTSEngine.close = record_close
+        try:
+            config = {'engine': 'mcts', 'workers': 1, 'playouts': 8}
+            Tournament.play_game(config, {'engine': 'random'}, True, max_moves=2)
+            Tournament.play_game(config, {'engine': 'random'}, False, max_moves=2)
+            if numpy is not None:
+                SelfPlay.play_game(config, config, max_moves=2)
+
+            # the pools are kept from game to game and shut down with the players, one engine for each side
+            self.assertEqual([], closed)
+            Tournament.close_players()
+        finally:
+            MCTSEngine.close = close
+            Tournament.close_players()
+
+        self.assertEqual([True] * (1 if numpy is None else 2), closed)
+
+    def test_worker_players_are_closed_when_the_pool_shuts_down(self):
+        # each worker keeps an MCTS player with a pool of its own, which must not stop the workers from exiting
+        config = {'engine': 'mcts', 'workers': 1, 'playouts': 8}
+        summary = Tournament.tournament(config, {'engine': 'random'}, games=4, workers=2, max_moves=4)
+
+        self.assertEqual(4, summary['games'])
+
+    def test_players_are_reused_between_games(self):
+        config = {'engine': 'alphabeta', 'depth': 2, 'table_megabytes': 1}
+        try:
+            first = Tournament.play_game(config, {'engine': 'random'}, True, seed=3, max_moves=6)
+            player = Tournament.get_player(config, 3, 1)
+            self.assertIs(player, Tournament.get_player(config, 3, 1))
+            self.assertIsNot(player, Tournament.get_player(config, 3, 2))
+
+            # a reset player plays the same game again as a newly built one would
+            self.assertEqual(first, Tournament.play_game(config, {'engine': 'random'}, True, seed=3, max_moves=6))
+        finally:
+            Tournament.close_players()
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_random_games_are_seeded(self):
+        self.assertEqual(Benchmark.random_games(3, 7), Benchmark.random_games(3, 7))
+        self.assertNotEqual(Benchmark.random_games(3, 7), Benchmark.random_games(3, 8))
+
+    def test_run_and_compare(self):
+        current = Benchmark.run(games=3, limit=10, rounds=1)
+
+        for board in ('Board', 'BitBoard'):
+            for name in ('make_move.vertical', 'place_fence.00_fences', 'check_win', 'get_current_location', 'game'):
+                self.assertIn(board + '.' + name, current['results'])
+
+        rows = Benchmark.compare(current, current)
+        self.assertEqual(len(current['results']), len(rows))
+        self.assertFalse(any(regressed for name, before, after, ratio, regressed in rows))
+
+
+class GameRecordTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.qgr')
+        os.close(handle)
+        self.games = Benchmark.random_games(6, 3)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip_and_append(self):
+        with GameRecordWriter(self.path) as writer:
+            for moves in self.games[:4]:
+                writer.write(moves, 1)
+        with GameRecordWriter(self.path, append=True) as writer:
+            for moves in self.games[4:]:
+                writer.write(moves, 2)
+
+        self.assertEqual([(bytes(moves), 1) for moves in self.games[:4]] +
+                         [(bytes(moves), 2) for moves in self.games[4:]], list(read_games(self.path)))
+        with GameRecordReader(self.path) as reader:
+            self.assertEqual(6, len(reader))
+            self.assertEqual((bytes(self.games[4]), 2), reader[4])
+            self.assertEqual((bytes(self.games[5]), 2), reader[-1])
+            with self.assertRaises(IndexError):
+                reader[6]
+
+        # every move takes one byte
+        size = os.path.getsize(self.path)
+        self.assertEqual(16 + 8 + 6 * (3 + 8) + sum(len(moves) for moves in self.games), size)
+
+    def test_unclosed_file_is_scanned(self):
+        writer = GameRecordWriter(self.path)
+        for moves in self.games:
+            writer.write(moves)
+        writer._file.flush()
+
+        self.assertEqual([(bytes(moves), 0) for moves in self.games], list(read_games(self.path)))
+        writer.close()
+
+    def test_append_reads_index_only(self):
+        with GameRecordWriter(self.path) as writer:
+            for moves in self.games[:3]:
+                writer.write(moves, 1)
+
+        # the games themselves are never read, so garbled move bytes are carried over as they are
+        with open(self.path, 'r+b') as file:
+            file.seek(16 + 3)
+            file.write(b'\xff')
+        with GameRecordWriter(self.path, append=True) as writer:
+            self.assertEqual(3, len(writer))
+            writer.write(self.games[3], 2)
+
+        games = list(read_games(self.path))
+        self.assertEqual(255, games[0][0][0])
+        self.assertEqual([(bytes(moves), 1) for moves in self.games[1:3]] + [(bytes(self.games[3]), 2)], games[1:])
+
+    def test_empty_file(self):
+        with self.assertRaisesRegex(ValueError, 'not a game record file'):
+            GameRecordReader(self.path)
+        with GameRecordWriter(self.path, append=True) as writer:
+            writer.write(self.games[0])
+        self.assertEqual([(bytes(self.games[0]), 0)], list(read_games(self.path)))
+
+        with open(self.path, 'wb') as file:
+            file.write(b'QGRF')
+        with self.assertRaisesRegex(ValueError, 'not a game record file'):
+            GameRecordReader(self.path)
+        with self.assertRaisesRegex(ValueError, 'not a game record file'):
+            GameRecordWriter(self.path, append=True)
+
+    def test_invalid_moves(self):
+        with GameRecordWriter(self.path) as writer:
+            with self.assertRaises(ValueError):
+                writer.write([4, 250])
+            with self.assertRaises(ValueError):
+                writer.write([4], 3)
+
+
+class ServerTest(unittest.TestCase):
+    def run_with_server(self, test, **settings):
+        async def run():
+            with ThreadPoolExecutor(1) as executor:
+                server = GameServer(executor=executor, **settings)
+                await server.start()
+                try:
+                    await test(server)
+                finally:
+                    await server.close()
+
+        asyncio.run(run())
+
+    async def connect(self, server):
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.get_port())
+
+        async def request(**message):
+            writer.write(json.dumps(message).encode() + b'\n')
+            return await receive()
+
+        async def receive():
+            return json.loads(await asyncio.wait_for(reader.readline(), 5))
+
+        return request, receive, writer
+
+    def test_two_players(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            other, other_receive, other_writer = await self.connect(server)
+
+            created = await request(op='create', id=1)
+            self.assertEqual({'ok': True, 'session': 1, 'player': 1, 'id': 1}, created)
+            self.assertEqual(2, (await other(op='join', session=1))['player'])
+            self.assertFalse((await other(op='move', session=1, pawn=[4, 7]))['ok'])
+
+            reply = await request(op='move', session=1, pawn=[4, 1])
+            self.assertTrue(reply['ok'])
+            self.assertEqual(2, reply['state']['turn'])
+            event = await other_receive()
+            self.assertEqual(('moved', 1, 4 + 9), (event['event'], event['player'], event['move']))
+
+            reply = await other(op='move', session=1, fence='h', at=[4, 1])
+            self.assertEqual([10, 9], reply['state']['fences_left'])
+            self.assertEqual({'v': [], 'h': [[4, 1]]}, reply['state']['fences'])
+            self.assertEqual('moved', (await receive())['event'])
+
+            for session in ([1], {'id': 1}, '1', True):
+                reply = await request(op='state', session=session)
+                self.assertEqual({'ok': False, 'error': "session must be a session id"}, reply)
+            writer.close()
+            other_writer.close()
+
+        self.run_with_server(test)
+
+    def test_idle_sessions_are_parked(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            other, other_receive, other_writer = await self.connect(server)
+            session = server._sessions[(await request(op='create'))['session']]
+            await other(op='join', session=session.id)
+
+            # between requests the game is kept as its state, and rebuilt for the next move
+            await request(op='move', session=session.id, pawn=[4, 1])
+            await other_receive()
+            await other(op='move', session=session.id, fence='h', at=[4, 1])
+            await receive()
+            self.assertIsNone(session._game)
+            self.assertIsInstance(session._state, GameState)
+
+            reply = await request(op='move', session=session.id, pawn=[3, 1])
+            self.assertEqual({'1': [3, 1], '2': [4, 8]}, reply['state']['pawns'])
+            self.assertEqual([10, 9], reply['state']['fences_left'])
+            self.assertEqual(reply['state'], (await request(op='state', session=session.id))['state'])
+            self.assertIsNone(session._game)
+
+            # four player games have no state to be parked as
+            four = server._sessions[(await request(op='create', players=4))['session']]
+            self.assertIsNotNone(four._game)
+            writer.close()
+            other_writer.close()
+
+        self.run_with_server(test)
+
+    def test_four_players(self):
+        async def test(server):
+            clients = [await self.connect(server) for _ in range(4)]
+            request, receive, writer = clients[0]
+            self.assertFalse((await request(op='create', players=4, bot={'engine': 'greedy'}))['ok'])
+            self.assertFalse((await request(op='create', players=3))['ok'])
+
+            session = (await request(op='create', players=4))['session']
+            self.assertEqual([2, 3, 4], [(await other(op='join', session=session))['player']
+                                         for other, _, _ in clients[1:]])
+
+            reply = await request(op='move', session=session, pawn=[4, 1])
+            self.assertEqual(2, reply['state']['turn'])
+            self.assertEqual([5, 5, 5, 5], reply['state']['fences_left'])
+            for _, other_receive, _ in clients[1:]:
+                event = await other_receive()
+                self.assertEqual(('moved', 1), (event['event'], event['player']))
+
+            reply = await clients[2][0](op='move', session=session, pawn=[1, 4])
+            self.assertFalse(reply['ok'])
+            self.assertEqual([0, 4], reply['state']['pawns']['3'])
+            for _, _, other_writer in clients:
+                other_writer.close()
+
+        self.run_with_server(test)
+
+    def test_bot_answers(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            session = (await request(op='create', bot={'engine': 'greedy'}))['session']
+
+            # the move is acknowledged before the bot answers, and the answer comes as an event
+            reply = await request(op='move', session=session, pawn=[4, 1])
+            self.assertEqual(2, reply['state']['turn'])
+            event = await receive()
+            self.assertEqual(('moved', 2, 4 + 7 * 9), (event['event'], event['player'], event['move']))
+            self.assertEqual(1, event['state']['turn'])
+            self.assertEqual([4, 7], event['state']['pawns']['2'])
+            writer.close()
+
+        self.run_with_server(test)
+
+    def test_bad_requests_get_error_replies(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            for bot in ({'engine': 'nonsense'}, {'engine': 'mcts', 'workers': 64},
+                        {'engine': 'alphabeta', 'table_megabytes': 100000}, {'engine': 'mcts', 'playouts': 1.5},
+                        {'engine': 'mcts', 'selection': 'best'}, ['greedy']):
+                reply = await request(op='create', bot=bot)
+                self.assertFalse(reply['ok'])
+            for players in (4.0, '4', True, 3):
+                self.assertEqual({'ok': False, 'error': "players must be 2 or 4"},
+                                 await request(op='create', players=players))
+            self.assertTrue((await request(op='create', bot={'engine': 'mcts', 'fence_rate': 0.5}))['ok'])
+
+            # a request that fails in an unexpected way is answered, and the connection stays open
+            create = server._create
+            server._create = None
+            self.assertEqual({'ok': False, 'error': "request failed", 'id': 3}, await request(op='create', id=3))
+            server._create = create
+            self.assertTrue((await request(op='create'))['ok'])
+            writer.close()
+
+        self.run_with_server(test)
+
+    def test_failed_bot_is_reported(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            session = (await request(op='create', bot={'engine': 'greedy'}))['session']
+            server._sessions[session].bot = json.dumps({'engine': 'nonsense'})
+
+            self.assertTrue((await request(op='move', session=session, pawn=[4, 1]))['ok'])
+            event = await receive()
+            self.assertEqual(('error', session, 2), (event['event'], event['session'], event['state']['turn']))
+            self.assertIn('nonsense', event['error'])
+            writer.close()
+
+        self.run_with_server(test)
+
+    def test_bot_players_are_limited(self):
+        snapshot = QuoridorGame().snapshot()
+        Server._bot_players.clear()
+        for time_ms in range(1, Server.MAX_BOT_PLAYERS + 5):
+            config = json.dumps({'depth': 1, 'engine': 'alphabeta', 'table_megabytes': 1, 'time_ms': time_ms})
+            self.assertIn(Server._bot_move(config, snapshot, 0), QuoridorGame().legal_moves())
+
+        self.assertEqual(Server.MAX_BOT_PLAYERS, len(Server._bot_players))
+        self.assertNotIn('"time_ms": 1}', ''.join(Server._bot_players))
+        Server._bot_players.clear()
+
+    def test_idle_sessions_are_evicted(self):
+        async def test(server):
+            request, receive, writer = await self.connect(server)
+            session = (await request(op='create'))['session']
+
+            self.assertEqual({'event': 'evicted', 'session': session}, await receive())
+            self.assertEqual(0, server.get_session_count())
+            self.assertFalse((await request(op='state', session=session))['ok'])
+            writer.close()
+
+        self.run_with_server(test, idle_timeout=0.1)
+
+
+class ColumnThreeBitBoard(BitBoard):
+    """A BitBoard with a planted bug: it turns down vertical fences in column 3."""
+
+    def place_fence(self, player, fence, location):
+        if fence == 'v' and location[0] == 3:
+            return False
+        return super().place_fence(player, fence, location)
+
+
+class FuzzTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_boards_agree(self):
+        self.assertIsNone(Fuzz.fuzz(150, seed=1))
+        self.assertIsNone(Fuzz.fuzz(150, seed=2, size=5, players=4))
+
+    def test_divergence_is_minimized(self):
+        reproducer = Fuzz.fuzz(500, candidate=ColumnThreeBitBoard, output=self.path)
+        self.assertEqual(1, len(reproducer['steps']))
+        self.assertEqual('v', reproducer['steps'][0][0])
+        self.assertEqual(3, reproducer['steps'][0][1])
+        self.assertEqual('QuoridorTest:ColumnThreeBitBoard', reproducer['candidate'])
+
+        self.assertEqual(0, Fuzz.replay(self.path)['step'])
+        self.assertEqual(reproducer['sequence'],
+                         Fuzz.fuzz(500, candidate=ColumnThreeBitBoard, workers=2, batch=10)['sequence'])
+
+
+class PerftTest(unittest.TestCase):
+    # P1 stands on (2, 2) over P2 on (2, 3), with a fence behind P2 that opens the diagonal moves
+    MOVES = [7, 17, 12, 72]
+
+    def brute_force(self, game, depth):
+        """Counts by trying every move code on the reference Board"""
+        if depth == 0:
+            return 1
+
+        count = 0
+        for move in range(75):
+            child = game.clone()
+            kind, location = decode_move(move, 5)
+            if kind == 'p':
+                made = child.move_pawn(child.get_turn(), location)
+            else:
+                made = child.place_fence(child.get_turn(), kind, location)
+            if made:
+                count += self.brute_force(child, depth - 1)
+        return count
+
+    def test_matches_reference_board(self):
+        game, illegal = QuoridorGame.from_moves(self.MOVES, size=5)
+        reference, _ = QuoridorGame.from_moves(self.MOVES, Board.Board, size=5)
+        self.assertIsNone(illegal)
+        self.assertEqual([7, 11, 13, 22, 16, 18], game.legal_pawn_moves())
+        for depth in (1, 2):
+            self.assertEqual(self.brute_force(reference, depth), Perft.perft(game, depth))
+
+    def test_divide_hash_and_workers_agree(self):
+        game = QuoridorGame()
+        self.assertEqual(147, Perft.perft(game, 1))
+        self.assertEqual(21462, Perft.perft(game, 2))
+
+        game, _ = QuoridorGame.from_moves(self.MOVES, size=5)
+        key = game.get_key()
+        total = Perft.perft(game, 3)
+        table = Perft.PerftTable(1)
+        self.assertEqual(total, Perft.perft(game, 3, table))
+        self.assertEqual(total, Perft.perft(game, 3, table))
+        self.assertGreater(table.get_hits(), 0)
+
+        counts = Perft.divide(game, 3)
+        self.assertEqual(total, sum(count for _, count in counts))
+        self.assertEqual(game.legal_moves(), [move for move, _ in counts])
+        self.assertEqual(counts, Perft.divide(game, 3, megabytes=1, workers=2))
+        self.assertEqual(key, game.get_key())
+
+    def test_depth_out_of_range(self):
+        game = QuoridorGame()
+        self.assertEqual(1, Perft.perft(game, 0))
+        self.assertRaises(ValueError, Perft.perft, game, -1)
+        self.assertRaises(ValueError, Perft.divide, game, 0)
+        self.assertRaises(ValueError, Perft.divide, game, -2)
+        with self.assertRaises(SystemExit), open(os.devnull, 'w') as devnull:
+            stderr, sys.stderr = sys.stderr, devnull
+            try:
+                Perft.main(['--', '-1'])
+            finally:
+                sys.stderr = stderr
+
+
+class InstrumentationTest(unittest.TestCase):
+    def tearDown(self):
+        Instrumentation.disable()
+        Instrumentation.reset()
+
+    def test_disabled_costs_nothing(self):
+        original = QuoridorGame.move_pawn
+        with Instrumentation.instrumented():
+            self.assertIsNot(original, QuoridorGame.move_pawn)
+        self.assertIs(original, QuoridorGame.move_pawn)
+        self.assertIs(original, QuoridorGame.__dict__['move_pawn'])
+
+    def test_counts_and_reasons(self):
+        Instrumentation.reset()
+        Instrumentation.enable()
+        q = QuoridorGame(Board.Board)
+        q.move_pawn(2, (4, 7))
+        q.move_pawn(1, (4, 1))
+        q.move_pawn(2, (9, 8))
+        q.place_fence(2, 'h', (4, 8))
+        q.move_pawn(1, (4, 2))
+        q.move_pawn(2, (4, 7))
+        q.place_fence(2, 'h', (4, 8))
+        q.place_fence(2, 'v', (0, 3))
+        Instrumentation.disable()
+        q.move_pawn(2, (4, 8))
+
+        counts = Instrumentation.snapshot()
+        self.assertEqual({'wrong_turn': 1, 'off_board': 1, 'fence_blocked': 1},
+                         counts['rejections']['move_pawn'])
+        self.assertEqual({'occupied': 1, 'off_board': 1}, counts['rejections']['place_fence'])
+        self.assertEqual(5, counts['methods']['QuoridorGame.move_pawn']['calls'])
+        self.assertEqual(3, counts['methods']['QuoridorGame.move_pawn']['false'])
+        self.assertEqual(3, counts['methods']['Board.make_vertical_moves']['calls'])
+        self.assertNotIn('BitBoard.make_move', counts['methods'])
+
+        text = Instrumentation.to_prometheus()
+        self.assertIn('quoridor_calls_total{method="QuoridorGame.move_pawn"} 5', text)
+        self.assertIn('quoridor_rejections_total{call="move_pawn",reason="fence_blocked"} 1', text)
+
+    def test_keyword_arguments(self):
+        with Instrumentation.instrumented():
+            q = QuoridorGame()
+            self.assertFalse(q.move_pawn(player=2, location=(4, 7)))
+            self.assertTrue(q.move_pawn(player=1, location=(4, 1)))
+            self.assertFalse(q.place_fence(2, fence='h', location=(4, 0)))
+
+        counts = Instrumentation.snapshot()
+        self.assertEqual({'wrong_turn': 1}, counts['rejections']['move_pawn'])
+        self.assertEqual({'off_board': 1}, counts['rejections']['place_fence'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,320 @@
+# Description: Self-play training data. Games between two players are turned into fixed shape feature planes with the
+# move played and the result as policy and value targets, and written to sharded .npy files that grow as games finish
+# and can be opened with np.load(mmap_mode='r') at any time. Needs numpy.
+import argparse
+import os
+import random
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from BatchEvaluator import fence_arrays
+from GameState import RECORD_SIZE
+from Moves import SIZE
+from Quoridor import QuoridorGame
+from Tournament import close_players, get_player, parse_player, start_worker
+
+# feature planes of a position, each 9x9 and indexed [y, x]
+PLANES = ('p1_pawn', 'p2_pawn', 'horizontal_fences', 'vertical_fences', 'p1_fences_left', 'p2_fences_left',
+          'p1_to_move')
+
+# arrays of a shard: dtype and shape of one position's entry
+ARRAYS = {
+    'planes': (np.dtype(np.uint8), (len(PLANES), SIZE, SIZE)),
+    'policy': (np.dtype('<i2'), ()),
+    'value': (np.dtype(np.int8), ()),
+}
+
+# every header is padded to this many bytes, so the position count can be rewritten in place as the file grows
+_HEADER_BYTES = 128
+
+
+def planes(records):
+    """
+    Turns positions into feature planes.
+    :param records: (n, 28) uint8 array of GameState records.
+    :return: Returns an (n, 7, 9, 9) uint8 array with the planes in PLANES order: 1 on each pawn's square, 1 on each
+    square with a horizontal fence on its top edge or a vertical fence on its left edge, the fences each player has
+    left on every square, and 1 on every square while it is player 1's turn.
+    """
+    records = np.asarray(records, dtype=np.uint8)
+    count = len(records)
+    rows = np.arange(count)
+    result = np.zeros((count, len(PLANES), SIZE, SIZE), dtype=np.uint8)
+
+    vert, horiz = fence_arrays(records)
+    for player in (0, 1):
+        ys, xs = np.divmod(records[:, player].astype(np.intp), SIZE)
+        result[rows, player, ys, xs] = 1
+        result[:, 4 + player] = records[:, RECORD_SIZE - 4 + player, None, None]
+    result[:, 2] = horiz
+    result[:, 3] = vert
+    result[:, 6] = (records[:, RECORD_SIZE - 2] == 1)[:, None, None]
+    return result
+
+
+def play_game(config_a, config_b, seed=0, max_moves=200):
+    """
+    Plays one self-play game, with the first player as P1.
+    :param config_a: Player or player config of P1 (see Tournament.make_player). Players of configs are kept for the
+    next game by Tournament.get_player.
+    :param config_b: Player or player config of P2.
+    :param seed: Seed for the players' random choices.
+    :param max_moves: Number of moves after which the game is a draw.
+    :return: Returns a tuple of the state records of every position a move was played from, joined into one bytes
+    object, the moves played from them and the winner (1, 2 or 0 for a draw).
+    """
+    players = {1: get_player(config_a, seed, 1), 2: get_player(config_b, seed + 1, 2)}
+    game = QuoridorGame()
+    records = []
+    moves = []
+    winner = 0
+
+    while len(moves) < max_moves:
+        move = players[game.get_turn()](game)
+        state = game.snapshot()
+        if move is None or not game.push(move):
+            break
+
+        records.append(state)
+        moves.append(move)
+        if game.is_finished():
+            winner = 2 if game.get_turn() == 1 else 1
+            break
+
+    return b''.join(records), moves, winner
+
+
+def targets(records, moves, winner):
+    """
+    Turns a played game into training arrays.
+    :param records: The joined state records returned by play_game.
+    :param moves: The moves returned by play_game.
+    :param winner: The winner returned by play_game.
+    :return: Returns a dict of the 'planes', the 'policy' target, which is the move code played, and the 'value'
+    target, which is 1 if the player to move went on to win, -1 if they lost and 0 for a draw.
+    """
+    records = np.frombuffer(records, dtype=np.uint8).reshape(-1, RECORD_SIZE)
+    turn = records[:, RECORD_SIZE - 2]
+    value = np.zeros(len(records), dtype=np.int8)
+    if winner:
+        value[:] = np.where(turn == winner, 1, -1)
+
+    return {'planes': planes(records), 'policy': np.array(moves, dtype='<i2'), 'value': value}
+
+
+class _NpyFile:
+    """A .npy file opened for appending, whose header is rewritten with the new length after every append."""
+
+    def __init__(self, path, dtype, shape):
+        self._path = path
+        self._dtype = dtype
+        self._shape = shape
+        self._entry_bytes = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        self._count = 0
+
+        if os.path.exists(path):
+            self._file = open(path, 'r+b')
+            version = np.lib.format.read_magic(self._file)
+            header_shape, _, header_dtype = np.lib.format.read_array_header_1_0(self._file)
+            if (version != (1, 0) or self._file.tell() != _HEADER_BYTES or header_dtype != dtype
+                    or header_shape[1:] != shape):
+                self._file.close()
+                raise ValueError("%s was not written by ShardWriter" % path)
+            self._count = header_shape[0]
+        else:
+            self._file = open(path, 'w+b')
+            self._write_header()
+
+    def get_count(self):
+        """Returns the number of entries in the file."""
+        return self._count
+
+    def truncate(self, count):
+        """Drops the entries after the first count, and any bytes written after the last header update."""
+        self._count = count
+        self._file.truncate(_HEADER_BYTES + count * self._entry_bytes)
+        self._write_header()
+
+    def append(self, array):
+        """Writes the entries of an array to the end of the file, then the header that counts them."""
+        self._file.seek(_HEADER_BYTES + self._count * self._entry_bytes)
+        self._file.write(np.ascontiguousarray(array, dtype=self._dtype).tobytes())
+        self._count += len(array)
+        self._file.flush()
+        self._write_header()
+
+    def _write_header(self):
+        text = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            np.lib.format.dtype_to_descr(self._dtype), (self._count,) + self._shape)
+        text = text.ljust(_HEADER_BYTES - 11) + '\n'
+        self._file.seek(0)
+        self._file.write(np.lib.format.magic(1, 0) + struct.pack('<H', len(text)) + text.encode('latin1'))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def shard_paths(directory, index):
+    """Returns the path of each array of a shard, by array name."""
+    return {name: os.path.join(directory, '%s-%05d.npy' % (name, index)) for name in ARRAYS}
+
+
+class ShardWriter:
+    """
+        This class appends training positions to numbered shards in a directory. A shard is one .npy file per array in
+        ARRAYS, for example planes-00003.npy, policy-00003.npy and value-00003.npy, holding the same positions in the
+        same order. Each write is flushed and the headers updated, so readers see every position written so far, and
+        a new shard is started once a shard holds shard_size positions.
+    """
+
+    def __init__(self, directory, shard_size=65536):
+        """
+        Opens a directory for writing, carrying on from the last shard in it if there is one. Positions written after
+        the last complete header update, for example by a writer that was killed, are dropped.
+        :param directory: Directory of the shards, created if needed.
+        :param shard_size: Most positions in a shard.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._shard_size = shard_size
+        self._index = 0
+        while os.path.exists(shard_paths(directory, self._index + 1)['planes']):
+            self._index += 1
+        self._files = None
+        self._open()
+
+    def _open(self):
+        """Opens the current shard and trims its arrays to the positions all of them hold."""
+        paths = shard_paths(self._directory, self._index)
+        self._files = {name: _NpyFile(paths[name], *ARRAYS[name]) for name in ARRAYS}
+        count = min(npy.get_count() for npy in self._files.values())
+        for npy in self._files.values():
+            npy.truncate(count)
+
+    def write(self, arrays):
+        """
+        Appends positions.
+        :param arrays: Dict of an array for each name in ARRAYS, all of the same length, as returned by targets.
+        :return: None
+        """
+        total = len(arrays['planes'])
+        start = 0
+        while start < total:
+            room = self._shard_size - self._files['planes'].get_count()
+            if room <= 0:
+                self.close()
+                self._index += 1
+                self._open()
+                continue
+
+            for name, npy in self._files.items():
+                npy.append(arrays[name][start:start + room])
+            start += room
+
+    def close(self):
+        """Closes the current shard."""
+        for npy in self._files.values():
+            npy.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_shards(directory):
+    """
+    Opens every shard in a directory without reading it into memory.
+    :param directory: Directory written by ShardWriter.
+    :return: Yields a dict of read only memory mapped arrays for each shard, by array name, in shard order.
+    """
+    index = 0
+    while os.path.exists(shard_paths(directory, index)['planes']):
+        yield {name: np.load(path, mmap_mode='r') for name, path in shard_paths(directory, index).items()}
+        index += 1
+
+
+def self_play(writer, config_a, config_b=None, games=100, workers=0, seed=0, max_moves=200, on_game=None):
+    """
+    Plays games and writes every position of each one as soon as it ends.
+    :param writer: ShardWriter to write to.
+    :param config_a: Player or player config of P1 (see Tournament.make_player). Players must be picklable when
+    workers are used.
+    :param config_b: Player or player config of P2, or None to play config_a against itself.
+    :param games: Number of games.
+    :param workers: Number of worker processes, 0 to play every game in this process.
+    :param seed: Base seed, game i uses seed + 2 * i.
+    :param max_moves: Number of moves after which a game is a draw.
+    :param on_game: Called with the number of moves and the winner after every game.
+    :return: Returns the number of positions written.
+    """
+    if config_b is None:
+        config_b = config_a
+    written = 0
+
+    def record(result):
+        nonlocal written
+        records, moves, winner = result
+        if moves:
+            writer.write(targets(records, moves, winner))
+        written += len(moves)
+        if on_game is not None:
+            on_game(len(moves), winner)
+
+    if not workers:
+        try:
+            for index in range(games):
+                record(play_game(config_a, config_b, seed + 2 * index, max_moves))
+        finally:
+            close_players()
+        return written
+
+    pool = ProcessPoolExecutor(workers, initializer=start_worker)
+    pending = set()
+    started = 0
+    try:
+        while started < games or pending:
+            while started < games and len(pending) < 2 * workers:
+                pending.add(pool.submit(play_game, config_a, config_b, seed + 2 * started, max_moves))
+                started += 1
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(future.result())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    return written
+
+
+def main(argv=None):
+    """Command line entry point, prints one line per game and the number of positions written."""
+    parser = argparse.ArgumentParser(description="Writes Quoridor self-play positions to sharded .npy files.")
+    parser.add_argument('directory', help="directory of the shards, appended to if it has some already")
+    parser.add_argument('--player', default='mcts:playouts=200', help="player config, for example 'greedy'")
+    parser.add_argument('--opponent', help="player config of P2, the same as --player when left out")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--shard-size', type=int, default=65536, help="most positions per shard")
+    parser.add_argument('--max-moves', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=None, help="base seed, random when left out")
+    args = parser.parse_args(argv)
+
+    seed = args.seed if args.seed is not None else random.getrandbits(32)
+    opponent = parse_player(args.opponent) if args.opponent else None
+
+    def show(moves, winner):
+        print('%d moves, winner %s' % (moves, winner or 'none'), flush=True)
+
+    with ShardWriter(args.directory, args.shard_size) as writer:
+        written = self_play(writer, parse_player(args.player), opponent, args.games, args.workers, seed,
+                            args.max_moves, show)
+    print('%d positions written' % written)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
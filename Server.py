@@ -0,0 +1,498 @@
+# Description: An asyncio TCP server that hosts many QuoridorGame sessions on one event loop. Clients send one JSON
+# object per line and get one JSON object per line back:
+#   {"op": "create", "bot": {"engine": "alphabeta", "depth": 2}}   starts a session, the bot config is optional
+#   {"op": "create", "players": 4}                                 starts a four player session, without bots
+#   {"op": "join", "session": 7}                                   takes a free seat of a session
+#   {"op": "move", "session": 7, "pawn": [4, 1]}                   move_pawn for the client's seat
+#   {"op": "move", "session": 7, "fence": "h", "at": [4, 4]}       place_fence for the client's seat
+#   {"op": "state", "session": 7}                                  returns the position
+#   {"op": "leave", "session": 7}                                  gives up the seat
+# Every reply has "ok" and echoes the request's "id" if it had one. Moves are also sent to the other seats as
+# {"event": "moved", ...}, and a bot's moves to every seat once the move it answers has been acknowledged, or
+# {"event": "error", ...} if the bot fails. Sessions idle for too long are closed with {"event": "evicted", ...}.
+# Bots are checked against BOT_SETTINGS when the session is created.
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+from BitBoard import bits
+from Moves import decode_move, encode_fence, encode_pawn_move
+from Quoridor import QuoridorGame
+
+# longest request line accepted from a client
+MAX_LINE = 64 * 1024
+
+# engines a bot can play and the settings a client may give each one: the (lowest, highest) value of a number, or the
+# allowed choices of a string
+BOT_SETTINGS = {
+    'random': {},
+    'greedy': {},
+    'alphabeta': {'depth': (1, 4), 'time_ms': (1, 10000), 'table_megabytes': (1, 64), 'path_weight': (-1000, 1000),
+                  'fence_weight': (-1000, 1000)},
+    'mcts': {'playouts': (1, 20000), 'time_ms': (1, 10000), 'selection': ('uct', 'puct'), 'exploration': (0, 10),
+             'max_moves': (1, 200), 'fence_rate': (0, 1)},
+}
+
+# settings that may be fractions, the others have to be whole numbers
+_FRACTIONS = ('exploration', 'fence_rate')
+
+# most bot players a worker process keeps between moves
+MAX_BOT_PLAYERS = 16
+
+# players built in a worker process, kept between bot moves so engines keep their tables, oldest first
+_bot_players = {}
+
+
+def check_bot(bot):
+    """
+    Checks a bot config sent by a client against BOT_SETTINGS.
+    :param bot: The config, a dict naming an 'engine' and its settings.
+    :return: Returns None if the config is allowed, otherwise the reason it isn't.
+    """
+    if not isinstance(bot, dict):
+        return "bot must be a player config"
+
+    settings = dict(bot)
+    engine = settings.pop('engine', None)
+    if not isinstance(engine, str) or engine not in BOT_SETTINGS:
+        return "bot engine must be one of %s" % ', '.join(sorted(BOT_SETTINGS))
+
+    allowed = BOT_SETTINGS[engine]
+    for name, value in settings.items():
+        rule = allowed.get(name)
+        if rule is None:
+            return "%s bots don't take %r" % (engine, name)
+
+        if isinstance(rule[0], str):
+            if value not in rule:
+                return "%s must be one of %s" % (name, ', '.join(rule))
+        elif (type(value) is not int and not (name in _FRACTIONS and type(value) is float)
+              or not rule[0] <= value <= rule[1]):
+            return "%s must be a number from %s to %s" % (name, rule[0], rule[1])
+
+    return None
+
+
+def _bot_move(config_json, snapshot, seed):
+    """Executor task: returns the move code the configured bot plays in the position of a game snapshot."""
+    from Tournament import close_player, make_player
+    player = _bot_players.get(config_json)
+    if player is None:
+        if len(_bot_players) >= MAX_BOT_PLAYERS:
+            close_player(_bot_players.pop(next(iter(_bot_players))))
+        player = _bot_players[config_json] = make_player(json.loads(config_json), seed)
+
+    game = QuoridorGame()
+    game.restore(snapshot)
+    return player(game)
+
+
+class _Client:
+    """A connection, with the queue of messages waiting to be written to it."""
+    __slots__ = ('writer', 'outbox', 'seats', 'closed')
+
+    def __init__(self, writer, max_pending):
+        self.writer = writer
+        self.outbox = asyncio.Queue(max_pending)
+        # (session id, player) of every seat the client holds
+        self.seats = set()
+        self.closed = False
+
+
+class _Session:
+    """
+        A game and the clients or bot sitting at it. Between requests a two player game is parked as a GameState, and
+        the live game is rebuilt from it the next time it is played on or shown.
+    """
+    __slots__ = ('id', '_game', '_state', 'lock', 'seats', 'bot', 'bot_task', 'last_active')
+
+    def __init__(self, session_id, bot, players=2):
+        self.id = session_id
+        self._game = QuoridorGame(players=players)
+        self._state = None
+        self.lock = asyncio.Lock()
+        self.seats = dict.fromkeys(range(1, players + 1))
+        # the bot plays player 2, as a JSON string so worker processes can cache it
+        self.bot = None if bot is None else json.dumps(bot, sort_keys=True)
+        # the task searching and making the bot's move, while it has one
+        self.bot_task = None
+        self.last_active = monotonic()
+
+    @property
+    def game(self):
+        """The live game, rebuilt from the parked state if the session is parked."""
+        if self._game is None:
+            self._game = QuoridorGame.from_state(self._state)
+            self._state = None
+        return self._game
+
+    def park(self):
+        """Swaps a two player game for its GameState while nobody is making a move or waiting for the bot's."""
+        if (self._game is not None and self._game.get_player_count() == 2 and not self.lock.locked()
+                and self.bot_task is None):
+            self._state = self._game.get_state()
+            self._game = None
+
+
+class GameServer:
+    """
+        This class serves Quoridor sessions over TCP. Each session has a lock so moves are made one at a time. Bot
+        moves are searched in an executor by a task of their own, started once the move they answer has been
+        acknowledged and not holding the session's lock during the search, so they hold up neither the event loop nor
+        the session. Two player sessions are parked as GameStates between requests. Every client has a bounded queue
+        of outgoing messages, which is written by its own task; a client that falls max_pending messages behind is
+        disconnected rather than letting the queue grow.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, idle_timeout=300.0, max_pending=64, max_sessions=100000,
+                 executor=None):
+        """
+        Creates a server, which starts listening when start is awaited.
+        :param host: Address to listen on.
+        :param port: Port to listen on, 0 to pick a free one.
+        :param idle_timeout: Seconds without a move or request after which a session is closed.
+        :param max_pending: Most messages queued for a client before it is disconnected as too slow.
+        :param max_sessions: Most sessions open at once.
+        :param executor: Executor for bot moves, a process pool is started when a bot first moves if None.
+        """
+        self._host = host
+        self._port = port
+        self._idle_timeout = idle_timeout
+        self._max_pending = max_pending
+        self._max_sessions = max_sessions
+        self._executor = executor
+        self._own_executor = executor is None
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._rng = random.Random()
+        self._server = None
+        self._sweeper = None
+        self._clients = set()
+
+    async def start(self):
+        """Starts listening and sweeping idle sessions."""
+        self._server = await asyncio.start_server(self._handle, self._host, self._port, limit=MAX_LINE)
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    def get_port(self):
+        """Returns the port the server is listening on."""
+        return self._server.sockets[0].getsockname()[1]
+
+    def get_session_count(self):
+        """Returns the number of open sessions."""
+        return len(self._sessions)
+
+    async def serve_forever(self):
+        """Starts the server if needed and serves until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stops listening, disconnects every client and shuts down the executor the server started."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in self._sessions.values():
+            if session.bot_task is not None:
+                session.bot_task.cancel()
+        for client in list(self._clients):
+            self._disconnect(client)
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def _handle(self, reader, writer):
+        """Reads a client's requests one line at a time and queues the replies."""
+        client = _Client(writer, self._max_pending)
+        self._clients.add(client)
+        sender = asyncio.create_task(self._write(client))
+
+        try:
+            while not client.closed:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    self._send(client, {'ok': False, 'error': "requests must be JSON objects"})
+                    continue
+
+                try:
+                    reply = await self._dispatch(client, request)
+                except Exception:
+                    # a request the checks above missed costs the client one reply, not its connection
+                    reply = {'ok': False, 'error': "request failed"}
+                if 'id' in request:
+                    reply['id'] = request['id']
+                self._send(client, reply)
+        finally:
+            self._disconnect(client)
+            await sender
+
+    async def _write(self, client):
+        """Writes a client's queued messages, waiting for the socket to drain after each one."""
+        try:
+            while True:
+                message = await client.outbox.get()
+                if message is None:
+                    break
+                client.writer.write(message)
+                await client.writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            client.closed = True
+            client.writer.close()
+
+    def _send(self, client, message):
+        """Queues a message for a client, disconnecting it if its queue is full."""
+        if client is None or client.closed:
+            return
+
+        try:
+            client.outbox.put_nowait(json.dumps(message).encode() + b'\n')
+        except asyncio.QueueFull:
+            self._disconnect(client)
+
+    def _disconnect(self, client):
+        """Closes a client's connection and frees its seats."""
+        if client not in self._clients:
+            return
+
+        self._clients.discard(client)
+        client.closed = True
+        for session_id, player in client.seats:
+            session = self._sessions.get(session_id)
+            if session is not None and session.seats[player] is client:
+                session.seats[player] = None
+        client.seats.clear()
+
+        # wakes the writer task even if the queue is full
+        while True:
+            try:
+                client.outbox.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                client.outbox.get_nowait()
+
+    async def _dispatch(self, client, request):
+        """Carries out a request and returns the reply."""
+        op = request.get('op')
+        if op == 'create':
+            return self._create(client, request.get('bot'), request.get('players', 2))
+
+        session_id = request.get('session')
+        if not isinstance(session_id, int) or isinstance(session_id, bool):
+            return {'ok': False, 'error': "session must be a session id"}
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            return {'ok': False, 'error': "no such session"}
+        session.last_active = monotonic()
+
+        try:
+            return await self._session_op(client, session, op, request)
+        finally:
+            session.park()
+
+    async def _session_op(self, client, session, op, request):
+        """Carries out a request on a session."""
+        if op == 'join':
+            return self._join(client, session)
+        if op == 'state':
+            return {'ok': True, 'session': session.id, 'state': _state(session.game)}
+        if op == 'leave':
+            for player in session.seats:
+                if session.seats[player] is client:
+                    session.seats[player] = None
+                    client.seats.discard((session.id, player))
+            return {'ok': True, 'session': session.id}
+        if op == 'move':
+            return await self._move(client, session, request)
+
+        return {'ok': False, 'error': "unknown op %r" % op}
+
+    def _create(self, client, bot, players):
+        """Starts a session with the client as player 1."""
+        if len(self._sessions) >= self._max_sessions:
+            return {'ok': False, 'error': "too many sessions"}
+        if type(players) is not int or players not in (2, 4):
+            return {'ok': False, 'error': "players must be 2 or 4"}
+        if bot is not None and check_bot(bot) is not None:
+            return {'ok': False, 'error': check_bot(bot)}
+        if bot is not None and players != 2:
+            return {'ok': False, 'error': "bots only play two player sessions"}
+
+        session = _Session(next(self._ids), bot, players)
+        self._sessions[session.id] = session
+        session.seats[1] = client
+        client.seats.add((session.id, 1))
+        session.park()
+        return {'ok': True, 'session': session.id, 'player': 1}
+
+    def _join(self, client, session):
+        """Seats the client in the first free seat after player 1, or as player 1 if that seat was given up."""
+        for player in sorted(session.seats, key=lambda seat: seat == 1):
+            if session.seats[player] is None and not (player == 2 and session.bot is not None):
+                session.seats[player] = client
+                client.seats.add((session.id, player))
+                return {'ok': True, 'session': session.id, 'player': player}
+
+        return {'ok': False, 'error': "session is full"}
+
+    async def _move(self, client, session, request):
+        """Makes the client's move through move_pawn or place_fence, then starts the bot's answer."""
+        players = [player for player, seated in session.seats.items() if seated is client]
+        if not players:
+            return {'ok': False, 'error': "not seated in this session"}
+
+        try:
+            if 'pawn' in request:
+                kind, location = 'p', tuple(request['pawn'])
+            else:
+                kind, location = request['fence'], tuple(request['at'])
+            if kind not in ('p', 'v', 'h') or len(location) != 2 or not all(isinstance(n, int) for n in location):
+                raise ValueError
+        except (KeyError, TypeError, ValueError):
+            return {'ok': False, 'error': "a move needs 'pawn': [x, y] or 'fence': 'v' | 'h' and 'at': [x, y]"}
+
+        async with session.lock:
+            game = session.game
+            player = game.get_turn() if game.get_turn() in players else players[0]
+            if kind == 'p':
+                made = game.move_pawn(player, location)
+            else:
+                made = game.place_fence(player, kind, location)
+
+            if not made:
+                return {'ok': False, 'error': "illegal move", 'state': _state(game)}
+
+            move = encode_pawn_move(location) if kind == 'p' else encode_fence(kind, location)
+            self._announce(session, player, move, skip=client)
+            reply = {'ok': True, 'session': session.id, 'move': move, 'state': _state(game)}
+
+            # the task first runs once the reply has been queued, and its move reaches every seat as an event
+            if session.bot is not None and not game.is_finished():
+                session.bot_task = asyncio.create_task(self._bot_turn(session))
+
+            return reply
+
+    async def _bot_turn(self, session):
+        """Searches the bot's move in the executor, without holding the session's lock, and makes it."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor()
+
+        try:
+            async with session.lock:
+                key = session.game.get_key()
+                snapshot = session.game.snapshot()
+
+            loop = asyncio.get_running_loop()
+            try:
+                move = await loop.run_in_executor(self._executor, _bot_move, session.bot, snapshot,
+                                                  self._rng.getrandbits(32))
+            except Exception as error:
+                self._announce_error(session, "bot failed to move: %s" % error)
+                return
+
+            async with session.lock:
+                # only the bot can move while it is its turn, so the position can't have changed
+                game = session.game
+                if move is None or game.get_key() != key:
+                    return
+
+                kind, location = decode_move(move)
+                turn = game.get_turn()
+                made = game.move_pawn(turn, location) if kind == 'p' else game.place_fence(turn, kind, location)
+                if made:
+                    session.last_active = monotonic()
+                    self._announce(session, turn, move)
+        finally:
+            session.bot_task = None
+            session.park()
+
+    def _announce(self, session, player, move, skip=None):
+        """Sends a move to the clients seated at the session."""
+        message = {'event': 'moved', 'session': session.id, 'player': player, 'move': move,
+                   'state': _state(session.game)}
+        for client in set(session.seats.values()):
+            if client is not skip:
+                self._send(client, message)
+
+    def _announce_error(self, session, error):
+        """Sends an error about the session to the clients seated at it."""
+        message = {'event': 'error', 'session': session.id, 'error': error, 'state': _state(session.game)}
+        for client in set(session.seats.values()):
+            self._send(client, message)
+
+    async def _sweep(self):
+        """Closes sessions that have been idle for longer than the idle timeout."""
+        while True:
+            await asyncio.sleep(min(self._idle_timeout / 2, 30.0))
+            cutoff = monotonic() - self._idle_timeout
+            for session in [session for session in self._sessions.values() if session.last_active < cutoff]:
+                if session.lock.locked() or session.bot_task is not None:
+                    continue
+                del self._sessions[session.id]
+                for player, client in session.seats.items():
+                    if client is not None:
+                        client.seats.discard((session.id, player))
+                        self._send(client, {'event': 'evicted', 'session': session.id})
+
+
+def _state(game):
+    """Returns the position of a game as a JSON friendly dict, with fences as [x, y] as place_fence takes them."""
+    board = game._board
+    geo = board.get_geometry()
+    vert, horiz = board.get_fences()
+    players = range(1, game.get_player_count() + 1)
+    return {
+        'turn': game.get_turn(),
+        'finished': game.is_finished(),
+        'winner': next((player for player in players if game.is_winner(player)), None),
+        'pawns': {str(player): list(board.get_current_location('P%d' % player)) for player in players},
+        'fences_left': [game.get_player(player).get_pieces_left() for player in players],
+        'fences': {'v': [list(geo.coords[sq]) for sq in bits(vert)], 'h': [list(geo.coords[sq]) for sq in bits(horiz)]},
+    }
+
+
+def main(argv=None):
+    """Command line entry point, serves until interrupted."""
+    parser = argparse.ArgumentParser(description="Serves Quoridor games over TCP, one JSON object per line.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--idle-timeout', type=float, default=300.0)
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--bot-workers', type=int, default=None, help="processes for bot moves")
+    args = parser.parse_args(argv)
+
+    executor = ProcessPoolExecutor(args.bot_workers) if args.bot_workers else None
+    server = GameServer(args.host, args.port, args.idle_timeout, args.max_pending, executor=executor)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+# Description: Plays two players against each other over many games, spread over a process pool, and stops as soon as
+# a sequential probability ratio test (SPRT) can tell whether the first player is stronger.
+import argparse
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing.util import Finalize
+from Quoridor import QuoridorGame
+
+# most players get_player keeps built in one process
+MAX_PLAYERS = 8
+
+# players built from configs by get_player, by side and config, oldest first
+_players = {}
+
+
+def make_player(config, seed=None):
+    """
+    Builds a player from a config. A player is a callable that takes a QuoridorGame and returns a move code.
+    :param config: A callable, which is returned as it is, or a dict naming an 'engine' and its settings:
+        {'engine': 'random'} plays a random legal move,
+        {'engine': 'greedy'} moves the pawn along its shortest path,
+        {'engine': 'alphabeta', 'depth': ..., 'time_ms': ...} uses QuoridorEngine,
+        {'engine': 'mcts', 'playouts': ..., 'time_ms': ..., 'selection': ...} uses MCTSEngine.
+    :param seed: Seed for the player's random choices.
+    :return: Returns the player. A player built from a config has a reset(seed) attribute, which makes it play as a
+    newly built player with that seed would, for example by clearing an alphabeta engine's transposition table. Pass
+    players built from a config to close_player once they are done with.
+    """
+    if callable(config):
+        return config
+
+    settings = dict(config)
+    engine = settings.pop('engine')
+    rng = random.Random(seed)
+
+    if engine == 'random':
+        def random_move(game):
+            return rng.choice(game.legal_moves())
+
+        random_move.reset = rng.seed
+        return random_move
+
+    if engine == 'greedy':
+        def greedy(game):
+            turn = game.get_turn()
+            best = None
+            best_length = None
+            for move in game.legal_pawn_moves():
+                game.push(move)
+                length = -1 if game.is_finished() else game.shortest_path_length(turn)
+                game.pop()
+                if best is None or length < best_length:
+                    best, best_length = move, length
+            return best
+
+        greedy.reset = lambda seed: None
+        return greedy
+
+    if engine == 'alphabeta':
+        from Engine import QuoridorEngine
+        depth = settings.pop('depth', None)
+        time_ms = settings.pop('time_ms', None)
+        searcher = QuoridorEngine(**settings)
+
+        def alphabeta(game):
+            return searcher.best_move(game, time_ms=time_ms, depth=depth)
+
+        alphabeta.reset = lambda seed: searcher.clear()
+        return alphabeta
+
+    if engine == 'mcts':
+        from MCTS import MCTSEngine
+        playouts = settings.pop('playouts', None)
+        time_ms = settings.pop('time_ms', None)
+        searcher = MCTSEngine(seed=seed, **settings)
+
+        def mcts(game):
+            return searcher.best_move(game, playouts=playouts, time_ms=time_ms)
+
+        # the engine's worker processes, if it has any, are shut down by close_player
+        mcts.reset = searcher.reseed
+        mcts.close = searcher.close
+        return mcts
+
+    raise ValueError("unknown engine %r" % engine)
+
+
+def close_player(player):
+    """Frees what a player built by make_player holds on to, such as the worker processes of an MCTS engine."""
+    close = getattr(player, 'close', None)
+    if close is not None:
+        close()
+
+
+def get_player(config, seed=None, side=0):
+    """
+    Returns a player for a config, built once per process and reset for every later game, so that engines keep their
+    transposition tables and worker processes from game to game. The oldest player is closed once more than
+    MAX_PLAYERS are kept.
+    :param config: A callable, which is returned as it is, or a player config (see make_player).
+    :param seed: Seed for the player's random choices in the coming game.
+    :param side: Keeps players of the same config apart when they play each other, for example 1 or 2.
+    :return: Returns the player, which is closed by close_players.
+    """
+    if callable(config):
+        return config
+
+    key = (side, json.dumps(config, sort_keys=True, default=repr))
+    player = _players.pop(key, None)
+    if player is None:
+        player = make_player(config, seed)
+        if len(_players) >= MAX_PLAYERS:
+            close_player(_players.pop(next(iter(_players))))
+    else:
+        player.reset(seed)
+
+    _players[key] = player
+    return player
+
+
+def close_players():
+    """Closes every player kept by get_player."""
+    while _players:
+        close_player(_players.popitem()[1])
+
+
+def start_worker():
+    """Process pool initializer that closes the worker's players when the worker exits."""
+    # before the queues of the engines' own pools are closed, which happens at priority 10
+    Finalize(None, _close_worker_players, args=(os.getpid(),), exitpriority=20)
+
+
+def _close_worker_players(pid):
+    # processes forked from the worker, such as an MCTS engine's workers, inherit this finalizer but must not close
+    # their copies of the worker's players
+    if os.getpid() == pid:
+        close_players()
+
+
+def play_game(config_a, config_b, a_first, seed=0, max_moves=200):
+    """
+    Plays one game between two players.
+    :param config_a: Player or player config of the first player (see make_player). Players of configs are kept for
+    the next game by get_player.
+    :param config_b: Player or player config of the second player.
+    :param a_first: True if the first player plays P1 and moves first.
+    :param seed: Seed for the players' random choices.
+    :param max_moves: Number of moves after which the game is a draw.
+    :return: Returns a dict with the first player's score (1, 0.5 or 0), the number of moves and the winner (1, 2 or
+    None). A player that returns an illegal move loses.
+    """
+    players = {1: get_player(config_a, seed, 1), 2: get_player(config_b, seed + 1, 2)}
+    if not a_first:
+        players = {1: players[2], 2: players[1]}
+
+    game = QuoridorGame()
+    winner = None
+    moves = 0
+
+    while moves < max_moves:
+        turn = game.get_turn()
+        move = players[turn](game)
+        if move is None:
+            break
+
+        if not game.push(move):
+            winner = 2 if turn == 1 else 1
+            break
+
+        moves += 1
+        if game.is_finished():
+            winner = turn
+            break
+
+    if winner is None:
+        score = 0.5
+    else:
+        score = 1.0 if (winner == 1) == a_first else 0.0
+
+    return {'score': score, 'moves': moves, 'winner': winner}
+
+
+def expected_score(elo):
+    """Returns the expected score of a player that is elo points stronger than its opponent."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score):
+    """Returns the Elo difference that gives the expected score, or +/- infinity for a score of 1 or 0."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+
+    return -400 * math.log10(1 / score - 1)
+
+
+class Results:
+    """
+        This class keeps the running totals of a match from the first player's point of view, and computes the Elo
+        difference with a 95% error bar and the log likelihood ratio of the SPRT.
+    """
+
+    def __init__(self, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+        """
+        Starts an empty match.
+        :param elo0: Elo difference of the hypothesis that the first player is not stronger.
+        :param elo1: Elo difference of the hypothesis that the first player is stronger.
+        :param alpha: Chance of accepting elo1 when elo0 is true.
+        :param beta: Chance of accepting elo0 when elo1 is true.
+        """
+        self._elo0 = elo0
+        self._elo1 = elo1
+        self._lower = math.log(beta / (1 - alpha))
+        self._upper = math.log((1 - beta) / alpha)
+        self._wins = 0
+        self._losses = 0
+        self._draws = 0
+
+    def add(self, score):
+        """Adds one game's score for the first player."""
+        if score == 1:
+            self._wins += 1
+        elif score == 0:
+            self._losses += 1
+        else:
+            self._draws += 1
+
+    def games(self):
+        """Returns the number of games played."""
+        return self._wins + self._losses + self._draws
+
+    def _mean_and_variance(self, wins, losses, draws):
+        """Returns the mean score per game and its variance."""
+        games = wins + losses + draws
+        mean = (wins + 0.5 * draws) / games
+        variance = (wins * (1 - mean) ** 2 + losses * mean ** 2 + draws * (0.5 - mean) ** 2) / games
+        return mean, variance
+
+    def elo(self):
+        """
+        Returns the Elo difference and the half width of its 95% confidence interval.
+        :return: Returns a tuple of (elo, error). Both are infinite or nan while every game has had the same result.
+        """
+        if not self.games():
+            return 0.0, math.inf
+
+        mean, variance = self._mean_and_variance(self._wins, self._losses, self._draws)
+        margin = 1.96 * math.sqrt(variance / self.games())
+        return score_to_elo(mean), (score_to_elo(mean + margin) - score_to_elo(mean - margin)) / 2
+
+    def llr(self):
+        """
+        Returns the log likelihood ratio of elo1 against elo0, using the normal approximation. Half a win and half a
+        loss are added to the totals so that the variance is never zero and the first few games can't decide the test.
+        """
+        if not self.games():
+            return 0.0
+
+        mean, variance = self._mean_and_variance(self._wins + 0.5, self._losses + 0.5, self._draws)
+        s0 = expected_score(self._elo0)
+        s1 = expected_score(self._elo1)
+        return (self.games() + 1) * ((mean - s0) ** 2 - (mean - s1) ** 2) / (2 * variance)
+
+    def verdict(self):
+        """Returns 'H1' once the first player is shown to be elo1 stronger, 'H0' once it is shown not to be, else None."""
+        llr = self.llr()
+        if llr >= self._upper:
+            return 'H1'
+        if llr <= self._lower:
+            return 'H0'
+
+        return None
+
+    def summary(self):
+        """Returns the totals, Elo and SPRT state as a dict."""
+        elo, error = self.elo()
+        return {
+            'games': self.games(),
+            'wins': self._wins,
+            'losses': self._losses,
+            'draws': self._draws,
+            'elo': elo,
+            'elo_error': error,
+            'llr': self.llr(),
+            'bounds': (self._lower, self._upper),
+            'verdict': self.verdict(),
+        }
+
+
+def tournament(config_a, config_b, games=1000, workers=0, elo0=0, elo1=10, alpha=0.05, beta=0.05, max_moves=200,
+               seed=0, on_result=None):
+    """
+    Plays up to games games between two players, alternating who moves first, and stops early once the SPRT reaches a
+    verdict.
+    :param config_a: Player or player config of the first player (see make_player). Players must be picklable when
+    workers are used.
+    :param config_b: Player or player config of the second player.
+    :param games: Most games to play.
+    :param workers: Number of worker processes, 0 to play every game in this process.
+    :param elo0: Elo difference of the null hypothesis.
+    :param elo1: Elo difference of the alternative hypothesis.
+    :param alpha: False positive rate of the SPRT.
+    :param beta: False negative rate of the SPRT.
+    :param max_moves: Number of moves after which a game is a draw.
+    :param seed: Base seed, game i uses seed + 2 * i.
+    :param on_result: Called with the game's result dict and the running summary after every game.
+    :return: Returns the final summary dict (see Results.summary).
+    """
+    results = Results(elo0, elo1, alpha, beta)
+
+    def record(result):
+        results.add(result['score'])
+        if on_result is not None:
+            on_result(result, results.summary())
+        return results.verdict() is not None
+
+    if not workers:
+        try:
+            for index in range(games):
+                if record(play_game(config_a, config_b, index % 2 == 0, seed + 2 * index, max_moves)):
+                    break
+        finally:
+            close_players()
+        return results.summary()
+
+    pool = ProcessPoolExecutor(workers, initializer=start_worker)
+    pending = set()
+    started = 0
+    try:
+        while started < games or pending:
+            while started < games and len(pending) < 2 * workers:
+                pending.add(pool.submit(play_game, config_a, config_b, started % 2 == 0, seed + 2 * started,
+                                        max_moves))
+                started += 1
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(record(future.result()) for future in done):
+                break
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    return results.summary()
+
+
+def parse_player(text):
+    """Turns 'engine' or 'engine:key=value,key=value' into a player config."""
+    engine, _, options = text.partition(':')
+    config = {'engine': engine}
+    for option in filter(None, options.split(',')):
+        key, _, value = option.partition('=')
+        try:
+            config[key] = int(value)
+        except ValueError:
+            try:
+                config[key] = float(value)
+            except ValueError:
+                config[key] = value
+
+    return config
+
+
+def main(argv=None):
+    """Command line entry point, prints one JSON line per game and the final summary."""
+    parser = argparse.ArgumentParser(description="Plays two Quoridor players against each other with SPRT stopping.")
+    parser.add_argument('player_a', help="first player, for example 'alphabeta:depth=2' or 'mcts:playouts=200'")
+    parser.add_argument('player_b', help="second player, for example 'greedy' or 'random'")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--elo0', type=float, default=0)
+    parser.add_argument('--elo1', type=float, default=10)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--max-moves', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    def show(result, summary):
+        print(json.dumps({'result': result, 'elo': summary['elo'], 'llr': summary['llr']}), flush=True)
+
+    summary = tournament(parse_player(args.player_a), parse_player(args.player_b), args.games, args.workers,
+                         args.elo0, args.elo1, args.alpha, args.beta, args.max_moves, args.seed, show)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
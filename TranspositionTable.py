@@ -0,0 +1,121 @@
+# Description: A fixed size transposition table for Quoridor search, keyed by QuoridorGame.get_key().
+from array import array
+
+# bound types of a stored score, 0 marks an empty entry
+EXACT = 1
+LOWER = 2
+UPPER = 3
+
+# move stored when a position has no best move
+NO_MOVE = 255
+
+# each entry is a key word and a data word, each bucket holds a depth-preferred and an always-replace entry
+_WORDS_PER_BUCKET = 4
+_BYTES_PER_BUCKET = _WORDS_PER_BUCKET * 8
+_SCORE_OFFSET = 1 << 31
+
+# words zeroed per slice by clear, so clearing never allocates a second full size table
+_CLEAR_WORDS = 1 << 16
+
+
+class TranspositionTable:
+    """
+        This class stores search results by position key in a preallocated array of 64 bit words, so its memory use is
+        fixed when it is created. An entry's data word packs the best move (bits 0-7), the depth (8-15), the bound type
+        (16-17), the search age (18-23) and the score (24-55). The first entry of a bucket keeps the deepest result of the
+        current search and the second entry takes everything else.
+    """
+
+    def __init__(self, megabytes=16):
+        """
+        Creates an empty table.
+        :param megabytes: The most memory the table may use. The number of buckets is rounded down to a power of two.
+        """
+        buckets = 1
+        while buckets * 2 * _BYTES_PER_BUCKET <= megabytes * 1024 * 1024:
+            buckets *= 2
+
+        self._mask = buckets - 1
+        self._table = array('Q', bytes(buckets * _BYTES_PER_BUCKET))
+        self._age = 0
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
+        self._stores = 0
+
+    def probe(self, key):
+        """
+        Looks a position up.
+        :param key: Integer Zobrist key of the position.
+        :return: Returns a tuple of (move, bound, depth, score) if the position is stored, None otherwise.
+        """
+        table = self._table
+        index = (key & self._mask) * _WORDS_PER_BUCKET
+
+        for slot in (index, index + 2):
+            data = table[slot + 1]
+            if data and table[slot] == key:
+                self._hits += 1
+                return data & 0xFF, data >> 16 & 0x3, data >> 8 & 0xFF, (data >> 24) - _SCORE_OFFSET
+
+        self._misses += 1
+        if table[index + 1] or table[index + 3]:
+            self._collisions += 1
+
+        return None
+
+    def store(self, key, move, bound, depth, score):
+        """
+        Stores a search result.
+        :param key: Integer Zobrist key of the position.
+        :param move: Integer move code of the best move, or NO_MOVE.
+        :param bound: EXACT, LOWER or UPPER.
+        :param depth: Integer depth the position was searched to, 0 to 255.
+        :param score: Integer score, which must fit in 32 bits.
+        :return: None
+        """
+        table = self._table
+        index = (key & self._mask) * _WORDS_PER_BUCKET
+        data = move | depth << 8 | bound << 16 | self._age << 18 | (score + _SCORE_OFFSET) << 24
+
+        # the depth-preferred entry is replaced by the same position, a deeper search or anything from an older search
+        old = table[index + 1]
+        if not old or table[index] == key or depth >= old >> 8 & 0xFF or old >> 18 & 0x3F != self._age:
+            table[index] = key
+            table[index + 1] = data
+        else:
+            table[index + 2] = key
+            table[index + 3] = data
+
+        self._stores += 1
+
+    def new_search(self):
+        """Starts a new search, so that entries left over from earlier searches are replaced first."""
+        self._age = (self._age + 1) & 0x3F
+
+    def clear(self):
+        """Empties the table in place and resets the counters."""
+        table = self._table
+        zeros = array('Q', bytes(min(len(table), _CLEAR_WORDS) * 8))
+        for start in range(0, len(table), len(zeros)):
+            table[start:start + len(zeros)] = zeros
+        self._age = 0
+        self._hits = 0
+        self._misses = 0
+        self._collisions = 0
+        self._stores = 0
+
+    def get_stats(self):
+        """
+        Returns the table counters.
+        :return: Returns a dict with the number of hits, misses, collisions (misses on a bucket holding other
+        positions) and stores, and the size of the table in buckets and bytes.
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'collisions': self._collisions,
+            'stores': self._stores,
+            'buckets': self._mask + 1,
+            'bytes': len(self._table) * 8,
+        }
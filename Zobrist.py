@@ -0,0 +1,62 @@
+# Description: Random keys for Zobrist hashing of Quoridor positions. A position's key is the XOR of the keys of
+# everything in it, so a move updates the key by XORing out what it removed and XORing in what it added.
+import random
+from Moves import SIZE, CELLS, HORIZONTAL
+
+# a fixed seed gives every process the same keys, so keys can be shared between workers and stored on disk
+_random = random.Random(20210807)
+
+
+def _keys(count):
+    """Returns a list of random 64 bit keys."""
+    return [_random.getrandbits(64) for _ in range(count)]
+
+
+# keys for each pawn standing on each square, indexed by player order and square; players 3 and 4 of the four player
+# game get theirs below, after the two player keys
+PAWN_KEYS = [_keys(CELLS), _keys(CELLS)]
+
+# keys for each fence, indexed by its move code
+FENCE_KEYS = _keys(HORIZONTAL + CELLS)
+
+# keys for the number of fences each player has placed, which stands for the fences they have left; placing none
+# hashes to 0 so a new board only needs its pawn keys
+PLACED_KEYS = [[0] + _keys(2 * CELLS), [0] + _keys(2 * CELLS)]
+
+# XORed in while it is player 2's turn
+TURN_KEY = _random.getrandbits(64)
+
+PAWN_KEYS += [_keys(CELLS), _keys(CELLS)]
+PLACED_KEYS += [[0] + _keys(2 * CELLS), [0] + _keys(2 * CELLS)]
+
+# key XORed in while it is each player's turn, indexed by player number - 1
+TURN_KEYS = (0, TURN_KEY, _random.getrandbits(64), _random.getrandbits(64))
+
+# key tables of the other board sizes, by size
+_SIZED_KEYS = {SIZE: (PAWN_KEYS, FENCE_KEYS, PLACED_KEYS)}
+
+
+def keys_for(size):
+    """
+    Returns the key tables of a board size, laid out like PAWN_KEYS, FENCE_KEYS and PLACED_KEYS, which are the tables
+    of the 9x9 board. Other sizes draw their keys from a seed of their own, so they are the same in every process too.
+    :param size: Number of squares along a side of the board.
+    :return: Returns a tuple of the pawn, fence and placed keys.
+    """
+    tables = _SIZED_KEYS.get(size)
+    if tables is None:
+        rng = random.Random(20210807 + size * 1000003)
+        cells = size * size
+
+        def keys(count):
+            return [rng.getrandbits(64) for _ in range(count)]
+
+        tables = _SIZED_KEYS[size] = (
+            [keys(cells), keys(cells)],
+            keys(3 * cells),
+            [[0] + keys(2 * cells), [0] + keys(2 * cells)],
+        )
+        tables[0].extend([keys(cells), keys(cells)])
+        tables[2].extend([[0] + keys(2 * cells), [0] + keys(2 * cells)])
+
+    return tables